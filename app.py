@@ -1,13 +1,13 @@
 import streamlit as st
 import math
 import io
-import requests
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-import plotly.express as px
-from streamlit_lottie import st_lottie
+import importlib
+import lottie_cache
+import instrumentation
+
+# numpy, pandas, matplotlib, plotly and the engine modules are imported inside
+# the functions that use them, so a worker only pays for what the selected
+# page needs (see MODULE_DEPENDENCIES / load_module_ui).
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -27,72 +27,196 @@ MODULES = {
     "Grain Size (mm to Φ)": "grain_size_to_phi"
 }
 
+# Heavy imports each module needs, loaded the first time it is selected.
+MODULE_DEPENDENCIES = {
+    "qfl_mia_tool": ("numpy", "pandas", "plotly.graph_objects", "plotly.express", "asset_cache",
+                     "qfl_engine", "provenance", "ternary_density", "result_cache", "table_io", "session_store",
+                     "batch_analysis", "incremental", "uncertainty", "grouping", "plotly.subplots", "jobs",
+                     "report_export"),
+    "stereonet_plotter": ("numpy", "pandas", "matplotlib.pyplot", "stereonet", "figure_export", "result_cache", "jobs",
+                          "fabric"),
+    "true_dip_calculator": (),
+    "porosity_calculator": (),
+    "strat_thickness_estimator": (),
+    "slope_gradient": ("numpy", "matplotlib", "dem_slope", "jobs"),
+    "grain_size_to_phi": (),
+}
+HOME_DEPENDENCIES = ("streamlit_lottie",)
+
+# Uploads at least this large are processed by a background job instead of in the script thread.
+BACKGROUND_UPLOAD_BYTES = 5 * 1024 * 1024
+# Pole density for at least this many planes is counted by a background job.
+BACKGROUND_DENSITY_POLES = 20_000
+
 if "selected_module" not in st.session_state:
     st.session_state.selected_module = None
-if 'processed_data' not in st.session_state:
-    st.session_state.processed_data = None
+if 'processed_key' not in st.session_state:
+    st.session_state.processed_key = None
+if 'stream_summary' not in st.session_state:
+    st.session_state.stream_summary = None
+if 'processed_summary' not in st.session_state:
+    st.session_state.processed_summary = None
 
 # --- HELPER FUNCTIONS ---
 
-def load_lottie_url(url: str):
-    """Fetches a Lottie JSON animation from a URL with error handling."""
+@st.cache_resource
+def get_result_cache():
+    """Process-wide cache of processed QFL datasets, shared by all sessions."""
+    import result_cache
+    return result_cache.ResultCache()
+
+def get_processed_frame(key):
+    """Full processed frame for `key`: from the shared cache, else rebuilt from this session's compact copy.
+
+    A rebuilt frame is not written back to the shared cache; only frames
+    straight from process_frame() go there.
+    """
+    df = get_result_cache().get(key)
+    if df is None and 'result_store' in st.session_state:
+        df = st.session_state.result_store.get(key)
+    return df
+
+@st.cache_resource
+def get_job_runner():
+    """Process-wide background job runner (thread and process pools), shared by all sessions."""
+    import jobs
+    return jobs.JobRunner()
+
+def session_owner():
+    """Stable ID of this browser session, used to give each session its own job quota."""
+    if 'session_owner' not in st.session_state:
+        import uuid
+        st.session_state.session_owner = uuid.uuid4().hex
+    return st.session_state.session_owner
+
+def submit_job(slot, name, func, *args, key=None):
+    """Starts func(job, *args) in the background and keeps the Job in st.session_state[slot] (None if refused)."""
+    import jobs
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.RequestException as e:
-        st.warning(f"Could not load animation: {e}")
-        return None
-
-def create_download_button(fig, filename: str):
-    """Generates a download button for a Matplotlib figure."""
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches='tight', dpi=300)
-    st.download_button(
-        label="📥 Download Plot as PNG",
-        data=buf.getvalue(),
-        file_name=filename,
-        mime="image/png"
-    )
+        job = get_job_runner().submit(name, func, *args, owner=session_owner(), key=key)
+    except jobs.JobLimitError as e:
+        st.error(str(e))
+        job = None
+    st.session_state[slot] = job
+    return job
+
+@st.fragment(run_every=1.0)
+def job_status(slot):
+    """Progress bar and Cancel button for the unfinished job in st.session_state[slot].
+
+    Only this fragment reruns while the job works; the whole page reruns once it has finished
+    so the caller can pick up the result.
+    """
+    job = st.session_state.get(slot)
+    if job is None:
+        return
+    if job.done:
+        st.rerun(scope="app")
+    text = job.message or "Waiting for a worker..."
+    st.progress(job.progress, text=f"{text} ({job.elapsed:.0f} s)")
+    if st.button("✖ Cancel", key=f"{slot}_cancel", disabled=job.cancel_requested):
+        job.cancel()
+        st.rerun(scope="app")
+
+def load_lottie_url(url: str):
+    """Returns a Lottie JSON animation from the local cache (or bundled fallback); refreshes happen in the background."""
+    return lottie_cache.load_lottie(url)
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide cache of Matplotlib figures and their rendered PNG/SVG/PDF bytes, keyed by plot parameters."""
+    import result_cache
+    import figure_export
+    return result_cache.ResultCache(max_bytes=figure_export.CACHE_MAX_BYTES)
+
+def cached_figure(params, build):
+    """Returns (key, figure) for plot `params`, calling `build()` only if the figure is not cached."""
+    import matplotlib.pyplot as plt
+    import figure_export
+    cache = get_figure_cache()
+    key = figure_export.figure_key(*params)
+    fig = cache.get(key)
+    if fig is None:
+        fig = build()
+        plt.close(fig)  # detach from pyplot; the figure stays usable for rendering
+        cache.put(key, fig, size=figure_export.figure_nbytes(fig))
+    return key, fig
+
+def show_figure(key, fig):
+    """Displays a cached figure; the screen-resolution PNG is rendered once per plot."""
+    import figure_export
+    with instrumentation.span("figure.display"):
+        png = get_figure_cache().artifact(key, ('display',),
+                                          lambda: figure_export.render(fig, "png", figure_export.DISPLAY_DPI))
+        st.image(png, use_container_width=True)
+
+def create_download_button(fig, filename: str, key: str):
+    """Format/resolution pickers plus a download button for a Matplotlib figure.
+
+    The export is rendered only when the button is clicked (on Streamlit's download thread)
+    and cached under the figure's `key`, so repeat downloads are free.
+    """
+    import figure_export
+    cache = get_figure_cache()
+    base = filename.rsplit('.', 1)[0]
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        fmt = st.selectbox("Format", list(figure_export.FORMATS),
+                           format_func=lambda f: figure_export.FORMATS[f]['label'], key=f"{base}_fig_format")
+    with col2:
+        dpi = st.selectbox("Resolution (dpi)", figure_export.DPI_CHOICES,
+                           index=figure_export.DPI_CHOICES.index(figure_export.DEFAULT_DPI),
+                           key=f"{base}_fig_dpi", disabled=fmt not in figure_export.RASTER_FORMATS)
+    info = figure_export.FORMATS[fmt]
+
+    def build():
+        with instrumentation.span("download.render", fmt=fmt, dpi=dpi, file=filename):
+            return figure_export.render(fig, fmt, dpi)
+    with col3:
+        st.download_button(
+            label=f"📥 Download Plot as {info['label']}",
+            data=lambda: cache.artifact(key, figure_export.export_name(fmt, dpi), build),
+            file_name=base + info['extension'],
+            mime=info['mime'],
+            key=f"{base}_fig_download",
+            use_container_width=True
+        )
+
+def create_table_download(df, base_name: str, key: str, build=None):
+    """Format picker plus a download button whose bytes are only produced when it is clicked.
+
+    `build(fmt)` returns the encoded bytes (e.g. from a cache); defaults to table_io.write_table(df, fmt).
+    """
+    import table_io
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fmt = st.selectbox("Format", list(table_io.FORMATS), format_func=lambda f: table_io.FORMATS[f]['label'],
+                           key=f"{key}_format")
+    info = table_io.FORMATS[fmt]
+    build = build or (lambda f: table_io.write_table(df, f))
+    with col2:
+        st.download_button(
+            label=f"📥 Download Results as {info['label']}",
+            data=lambda: build(fmt),
+            file_name=base_name + info['extension'],
+            mime=info['mime'],
+            key=key,
+            use_container_width=True
+        )
 
 # --- QFL & MIA Tool Functions ---
 
-def create_qfl_mia_plot(df):
-    """Creates an interactive QFL ternary plot with Dickinson (1983) provenance fields."""
-   
+def build_qfl_base_figure():
+    """Validated plain-dict spec of the Dickinson (1983) fields and the ternary layout, without any samples."""
+    import plotly.graph_objects as go
+    import provenance
     fig = go.Figure()
-
-    # Add Dickinson (1983) Provenance Fields
-    fields = {
-        'Craton Interior': {'a': [1, 0.85, 0.95], 'b': [0, 0.15, 0], 'c': [0, 0, 0.05]},
-        'Transitional Craton': {'a': [0.85, 0.60, 0.70, 0.95], 'b': [0.15, 0.40, 0.15, 0], 'c': [0, 0, 0.15, 0.05]},
-        'Basement Uplift': {'a': [0.60, 0.70, 0.25, 0], 'b': [0.40, 0.15, 0.75, 1], 'c': [0, 0.15, 0, 0]},
-        'Recycled Orogen': {'a': [0.75, 0.65, 0.55, 0.80], 'b': [0, 0.10, 0, 0], 'c': [0.25, 0.25, 0.45, 0.20]},
-        'Transitional Arc': {'a': [0.55, 0.65, 0.15, 0], 'b': [0, 0.10, 0.60, 0.45], 'c': [0.45, 0.25, 0.25, 0.55]},
-        'Dissected Arc': {'a': [0.25, 0.70, 0.15, 0], 'b': [0.75, 0.15, 0.60, 0.45], 'c': [0, 0.15, 0.25, 0.55]},
-    }
-    colors = {
-        'Craton Interior': 'rgba(255, 228, 181, 0.6)', 'Transitional Craton': 'rgba(240, 230, 140, 0.6)',
-        'Basement Uplift': 'rgba(218, 112, 214, 0.6)', 'Recycled Orogen': 'rgba(173, 216, 230, 0.6)',
-        'Transitional Arc': 'rgba(144, 238, 144, 0.6)', 'Dissected Arc': 'rgba(255, 182, 193, 0.6)',
-    }
-
-    for name, coords in fields.items():
+    for name, coords in provenance.DICKINSON_FIELDS.items():
         fig.add_trace(go.Scatterternary({
             'mode': 'lines', 'a': coords['a'], 'b': coords['b'], 'c': coords['c'],
-            'fill': 'toself', 'fillcolor': colors[name], 'line': {'color': 'rgba(0,0,0,0.3)', 'width': 1},
+            'fill': 'toself', 'fillcolor': provenance.FIELD_COLORS[name], 'line': {'color': 'rgba(0,0,0,0.3)', 'width': 1},
             'name': name, 'hoverinfo': 'name'
         }))
-
-    # Add the user's data points
-    fig.add_trace(go.Scatterternary({
-        'mode': 'markers',
-        'a': df['Q_norm'], 'b': df['F_norm'], 'c': df['L_norm'],
-        'marker': {'symbol': 'circle', 'color': 'black', 'size': 8, 'line': {'width': 1, 'color': 'white'}},
-        'name': 'Your Samples',
-        'hovertemplate': '<b>Sample</b><br>Q: %{a:.1%}<br>F: %{b:.1%}<br>L: %{c:.1%}<extra></extra>'
-    }))
-
     fig.update_layout({
         'ternary': {
             'sum': 1,
@@ -104,10 +228,411 @@ def create_qfl_mia_plot(df):
         'showlegend': True,
         'legend': {'x': 1.1, 'y': 0.5}
     })
+    return fig.to_dict()
+
+def create_qfl_mia_plot(df, density_threshold=None, divisions=None, regions=None, region_label=None):
+    """Creates an interactive QFL ternary plot with Dickinson (1983) provenance fields.
+
+    Above `density_threshold` samples, points are binned server-side and drawn as a density layer.
+    `regions` are (q, f, l) arrays of closed outlines, one row per sample (see uncertainty.confidence_region).
+    The field polygons and layout are built once per process (asset_cache); only the sample traces are new.
+    """
+    import numpy as np
+    import plotly.graph_objects as go
+    import asset_cache
+    import ternary_density
+    if density_threshold is None:
+        density_threshold = ternary_density.DENSITY_THRESHOLD
+    if divisions is None:
+        divisions = ternary_density.DEFAULT_DIVISIONS
+
+    base = asset_cache.shared('qfl_base_figure', build_qfl_base_figure)
+    traces = []
+
+    # Add the user's data points, or per-cell counts when there are too many to ship individually
+    if ternary_density.use_density(len(df), density_threshold):
+        i, j, k, counts = ternary_density.bin_counts(df['Q_norm'], df['F_norm'], df['L_norm'], divisions)
+        traces.append(go.Scatterternary({
+            'mode': 'markers',
+            'a': i / divisions, 'b': j / divisions, 'c': k / divisions,
+            'marker': {'symbol': 'hexagon', 'size': max(4, 400 // divisions), 'color': counts, 'colorscale': 'Viridis',
+                       'colorbar': {'title': 'Samples', 'x': 1.0}, 'line': {'width': 0}},
+            'customdata': counts,
+            'name': f'Your Samples (density, n={int(counts.sum()):,})',
+            'hovertemplate': 'Q: %{a:.0%}<br>F: %{b:.0%}<br>L: %{c:.0%}<br>Samples: %{customdata:,}<extra></extra>'
+        }))
+    else:
+        traces.append(go.Scatterternary({
+            'mode': 'markers',
+            'a': df['Q_norm'], 'b': df['F_norm'], 'c': df['L_norm'],
+            'marker': {'symbol': 'circle', 'color': 'black', 'size': 8, 'line': {'width': 1, 'color': 'white'}},
+            'name': 'Your Samples',
+            'hovertemplate': '<b>Sample</b><br>Q: %{a:.1%}<br>F: %{b:.1%}<br>L: %{c:.1%}<extra></extra>'
+        }))
+
+    if regions is not None:
+        # One trace for all outlines; NaN breaks the line between samples.
+        a, b, c = (np.column_stack([r, np.full(len(r), np.nan)]).ravel() for r in regions)
+        traces.append(go.Scatterternary({
+            'mode': 'lines', 'a': a, 'b': b, 'c': c,
+            'line': {'color': 'rgba(200,30,30,0.7)', 'width': 1},
+            'name': region_label or 'Confidence regions', 'hoverinfo': 'skip'
+        }))
+
+    # The base spec is already validated: build the figure in one pass instead of add_trace/update_layout.
+    return go.Figure(data=[*base['data'], *traces], layout=base['layout'], skip_invalid=True)
+
+def create_mia_bar_chart(df):
+    """Creates the per-sample MIA bar chart."""
+    import plotly.express as px
+    mia_fig = px.bar(df, y='MIA', title="Maturity Index of Arenites (MIA)",
+                     labels={'index': 'Sample', 'MIA': 'MIA (%)'},
+                     text=df['MIA'].map('{:.1f}%'.format))
+    mia_fig.update_layout(yaxis_range=[0,100])
+    return mia_fig
+
+def process_qfl_input(df_input, engine_input_type):
+    """Runs the QFL/MIA engine and provenance classification on a raw input table."""
+    import qfl_engine
+    import provenance
+    df_processed = qfl_engine.process_frame(df_input, engine_input_type)
+    with instrumentation.span("qfl.provenance", rows=len(df_processed)):
+        df_processed['Provenance'] = provenance.classify_frame(df_processed)
+    return df_processed
+
+def process_upload_job(job, cache, raw, filename, input_type, key):
+    """Background job: parses and processes an upload in a worker process, then publishes it to the shared cache."""
+    import batch_analysis
+    job.report(0.05, f"Processing {filename} in a worker process...")
+    with instrumentation.span("qfl.background_process", bytes=len(raw)):
+        df = job.run_in_process(batch_analysis.process_table, filename, raw, input_type)
+    df.attrs.pop("input_rows", None)
+    cache.put(key, df)
+    return df
+
+def stream_upload_job(job, raw, filename, input_type):
+    """Background job: streams an upload chunk by chunk, reporting the fraction of bytes consumed."""
+    import table_io
+    import qfl_engine
+    source = io.BytesIO(raw)
+    rows = 0
+
+    def on_chunk(frame):
+        nonlocal rows
+        rows += len(frame)
+        job.report(source.tell() / max(len(raw), 1), f"Streamed {rows:,} samples")
+    fmt = table_io.detect_format(filename)
+    with instrumentation.span("qfl.stream", fmt=fmt, bytes=len(raw)):
+        return qfl_engine.stream_table(source, input_type, fmt, on_chunk=on_chunk).as_dict()
+
+def collect_qfl_job():
+    """Picks up a finished background QFL job into session state, or shows the progress of a running one."""
+    import jobs
+    import qfl_engine
+    import session_store
+    job = st.session_state.get('qfl_job')
+    if job is None:
+        return
+    if not job.done:
+        job_status('qfl_job')
+        return
+    st.session_state.qfl_job = None
+    if job.status == jobs.CANCELLED:
+        st.info("Processing was cancelled.")
+    elif job.status == jobs.FAILED:
+        if isinstance(job.exception, qfl_engine.MissingColumnsError):
+            st.error(f"Missing required columns: {', '.join(job.exception.missing)}")
+        else:
+            st.error(f"An error occurred during processing: {job.error}")
+    elif job.name == "qfl.stream":
+        st.session_state.stream_summary = job.result
+        st.success(f"✅ Upload streamed in {job.elapsed:.1f} s.")
+    else:
+        key, input_type = job.key
+        if 'result_store' not in st.session_state:
+            st.session_state.result_store = session_store.SessionStore()
+        st.session_state.result_store.put(key, job.result, input_type)
+        st.session_state.processed_key = key
+        st.session_state.processed_summary = None
+        st.success(f"✅ Data processed in {job.elapsed:.1f} s. View results below.")
+
+def display_stream_summary(summary):
+    """Shows the running totals produced by a streamed (large file) upload."""
+    st.subheader("2. Analysis Summary (streamed)")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Samples", f"{summary['rows']:,}")
+    col2.metric("Total Q", f"{summary['total_q']:,.2f}")
+    col3.metric("Total F", f"{summary['total_f']:,.2f}")
+    col4.metric("Total L", f"{summary['total_l']:,.2f}")
+    st.metric(label="Average Maturity Index (MIA)", value=f"{summary['average_mia']:.2f}%")
+    if summary['dropped_rows']:
+        st.warning(f"{summary['dropped_rows']:,} rows with missing or non-numeric values were skipped.")
+    st.markdown("#### MIA Category Counts")
+    st.bar_chart(summary['category_counts'])
+
+def multi_file_batch_section(engine_input_type):
+    """Many files (or .zip archives) analyzed on the shared process pool: per-file summaries plus one combined table."""
+    with st.expander("📦 Multi-file Batch (one file per well/formation, or a .zip)", expanded=False):
+        import table_io
+        import batch_analysis
+        runner = get_job_runner()
+        with st.form("multi_file_batch_form"):
+            files = st.file_uploader("Upload tables or zip archives", type=table_io.UPLOAD_TYPES + ["zip"],
+                                     accept_multiple_files=True)
+            max_workers = st.number_input("Worker processes", min_value=1, max_value=runner.max_processes,
+                                          value=runner.max_processes,
+                                          help="Files processed at once on the shared worker pool.")
+            run = st.form_submit_button("🚀 Process All Files")
+
+        if run:
+            if not files:
+                st.error("Please upload at least one file.")
+                return
+            progress = st.progress(0.0, text="Starting workers...")
+
+            def on_result(done, total, row):
+                progress.progress(done / total, text=f"{done}/{total} files — {row['Source']}")
+            with instrumentation.span("qfl.multi_file_batch", files=len(files), workers=max_workers):
+                summary, combined = batch_analysis.analyze_files(files, engine_input_type, max_workers=max_workers,
+                                                                 on_result=on_result, executor=runner.process_pool())
+            progress.empty()
+            st.session_state.multi_file_batch = (summary, combined)
+
+        result = st.session_state.get('multi_file_batch')
+        if result is None:
+            return
+        summary, combined = result
+        failed = summary['Error'].notna()
+        if failed.any():
+            st.warning(f"{failed.sum():,} of {len(summary):,} files could not be processed (see the Error column).")
+        st.markdown("#### Per-file Summary")
+        st.dataframe(summary, hide_index=True, use_container_width=True)
+        create_table_download(summary, "geolab_batch_summary", key="multi_file_summary")
+        st.markdown(f"#### Combined Results ({len(combined):,} samples)")
+        st.dataframe(combined.head(1000), hide_index=True, use_container_width=True)
+        if len(combined) > 1000:
+            st.caption("Showing the first 1,000 rows; download for the full table.")
+        create_table_download(combined, "geolab_batch_combined", key="multi_file_combined")
+
+def uncertainty_section(df_processed, key):
+    """Monte Carlo counting-error intervals for Q/F/L and MIA, with confidence regions on the ternary plot."""
+    import pandas as pd
+    import qfl_engine
+    import uncertainty
+    st.markdown("#### Counting Uncertainty (Monte Carlo)")
+    with st.form("uncertainty_form"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            method = st.selectbox("Resampling", uncertainty.METHODS,
+                                  format_func=lambda m: {"multinomial": "Multinomial (resample counts)",
+                                                         "dirichlet": "Dirichlet (posterior)"}[m])
+        with col2:
+            replicates = st.number_input("Replicates", min_value=100, max_value=20000,
+                                         value=uncertainty.DEFAULT_REPLICATES, step=500)
+        with col3:
+            total_points = st.number_input("Points counted per sample", min_value=0, value=0, step=50,
+                                           help="0 = the Q/F/L values are raw point counts. Otherwise they are scaled to this many points.")
+        with col4:
+            level = st.selectbox("Confidence level", [0.68, 0.90, 0.95, 0.99], index=2, format_func="{:.0%}".format)
+        run = st.form_submit_button("🎲 Run Simulation")
+    if run:
+        st.session_state.uncertainty_params = (method, int(replicates), int(total_points), level)
+    params = st.session_state.get('uncertainty_params')
+    if not params:
+        st.caption("Point-counted compositions carry counting error; resample them to see how large it is.")
+        return
+    method, replicates, total_points, level = params
+
+    def simulate():
+        with instrumentation.span("qfl.uncertainty", rows=len(df_processed), replicates=replicates, method=method):
+            return uncertainty.simulate(df_processed['Q'], df_processed['F'], df_processed['L'], replicates=replicates,
+                                        method=method, level=level, total_points=total_points or None)
+    with st.spinner(f"Drawing {replicates:,} replicates for {len(df_processed):,} samples..."):
+        result = get_result_cache().artifact(key, ('uncertainty',) + params, simulate)
+    result = result.set_axis(df_processed.index)  # cached objects are shared; don't mutate
+
+    id_cols = [c for c in df_processed.columns
+               if c not in qfl_engine.RESULT_COLUMNS + qfl_engine.MINERAL_COLUMNS + qfl_engine.QFL_COLUMNS + ['Provenance']]
+    bounds = [c for c in result.columns if c.endswith(('_lo', '_hi'))] + ['MIA_std']
+    table = pd.concat([df_processed[id_cols + ['Q_norm', 'F_norm', 'L_norm', 'MIA']], result[bounds]], axis=1)
+    st.dataframe(table.style.format("{:.3f}", subset=[c for c in table.columns if c not in id_cols]),
+                 use_container_width=True)
+
+    if len(result) <= uncertainty.MAX_REGIONS:
+        regions = uncertainty.confidence_region(result, level)
+        st.plotly_chart(create_qfl_mia_plot(df_processed, regions=regions, region_label=f"{level:.0%} confidence regions"),
+                        use_container_width=True)
+    else:
+        st.info(f"Confidence regions are drawn for up to {uncertainty.MAX_REGIONS:,} samples; the intervals above cover all of them.")
+    create_table_download(table, "geolab_uncertainty", key="uncertainty_results")
+
+def create_group_ternary_panels(df, grouping, max_panels=12, columns=4, max_points=2000):
+    """Small-multiple QFL ternaries, one per group (largest groups first), with each group's compositional mean."""
+    import numpy as np
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    table = grouping.table
+    order = np.argsort(-table['Samples'].to_numpy(), kind='stable')[:max_panels]
+    rows = max(1, math.ceil(len(order) / columns))
+    fig = make_subplots(rows=rows, cols=columns, specs=[[{'type': 'ternary'}] * columns] * rows,
+                        subplot_titles=[f"{table.index[i]} (n={table['Samples'].iloc[i]:,})" for i in order],
+                        horizontal_spacing=0.06, vertical_spacing=0.12)
+    q, f, l = (df[c].to_numpy() for c in ('Q_norm', 'F_norm', 'L_norm'))
+    rng = np.random.default_rng(0)
+    for panel, group in enumerate(order):
+        members = np.flatnonzero(grouping.codes == group)
+        if len(members) > max_points:
+            # A panel this small cannot show more; a fixed-seed subsample keeps reruns identical.
+            members = np.sort(rng.choice(members, max_points, replace=False))
+        row, col = divmod(panel, columns)
+        fig.add_trace(go.Scatterternary({
+            'mode': 'markers', 'a': q[members], 'b': f[members], 'c': l[members],
+            'marker': {'color': 'black', 'size': 4, 'opacity': 0.6}, 'showlegend': False,
+            'hovertemplate': 'Q: %{a:.1%}<br>F: %{b:.1%}<br>L: %{c:.1%}<extra></extra>'
+        }), row=row + 1, col=col + 1)
+        fig.add_trace(go.Scatterternary({
+            'mode': 'markers',
+            'a': [table['Comp. Mean Q'].iloc[group]], 'b': [table['Comp. Mean F'].iloc[group]],
+            'c': [table['Comp. Mean L'].iloc[group]],
+            'marker': {'symbol': 'star', 'color': 'crimson', 'size': 12, 'line': {'width': 1, 'color': 'white'}},
+            'name': 'Compositional mean', 'showlegend': panel == 0, 'legendgroup': 'mean',
+            'hovertemplate': 'Compositional mean<br>Q: %{a:.1%}<br>F: %{b:.1%}<br>L: %{c:.1%}<extra></extra>'
+        }), row=row + 1, col=col + 1)
+    axis = {'min': 0, 'showticklabels': False, 'ticks': ''}
+    fig.update_ternaries(aaxis={**axis, 'title': 'Q'}, baxis={**axis, 'title': 'F'}, caxis={**axis, 'title': 'L'}, sum=1)
+    fig.update_layout(height=260 * rows, margin={'t': 40, 'b': 20}, legend={'orientation': 'h', 'y': -0.05})
     return fig
 
+def group_summary_section(df_processed, key):
+    """Per-group totals, MIA statistics and compositional means for any key column, plus small ternary panels."""
+    import pandas as pd
+    import qfl_engine
+    import grouping
+    cache = get_result_cache()
+    st.markdown("#### Group Summary")
+    key_columns = grouping.key_columns(df_processed)
+    if not key_columns:
+        st.info("Add an ID column (e.g. Sample, Well, Formation or Depth) to the input table to group samples.")
+        return
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        column = st.selectbox("Group by column", key_columns, key="group_column")
+    numeric = pd.api.types.is_numeric_dtype(df_processed[column])
+    modes = [grouping.BINS, grouping.COLUMN] if numeric else [grouping.COLUMN, grouping.PREFIX]
+    with col2:
+        mode = st.selectbox("Grouping", modes, key=f"group_mode_{numeric}",
+                            format_func={grouping.COLUMN: "Each value", grouping.PREFIX: "Sample prefix (W1-S03 → W1)",
+                                         grouping.BINS: "Fixed-width bins"}.get)
+    bin_width = None
+    with col3:
+        if mode == grouping.BINS:
+            bin_width = st.number_input("Bin width", min_value=0.0, value=10.0, step=1.0, format="%g", key="group_bin_width")
+    if mode == grouping.BINS and not bin_width:
+        st.warning("Bin width must be greater than zero.")
+        return
+
+    def build():
+        with instrumentation.span("qfl.group_summary", rows=len(df_processed), mode=mode) as s:
+            result = grouping.summarize_groups(df_processed, column, mode, bin_width)
+            s.set(groups=len(result.labels))
+        return result
+    # Aggregates are cached per grouping, so switching back to an earlier key is a cache hit.
+    groups = cache.artifact(key, ('groups', column, mode, bin_width), build)
+    table = groups.table
+    missing = int((groups.codes < 0).sum())
+    st.caption(f"{len(table):,} groups" + (f"; {missing:,} samples without a {column} value are left out." if missing else "."))
+    counts = [c for c in table.columns if c == 'Samples' or c.startswith(('MIA ', 'Provenance ')) or c == 'Comp. Mean Samples']
+    st.dataframe(table.style.format("{:.3f}", subset=[c for c in table.columns
+                                                     if c not in counts and c != 'Dominant Provenance']),
+                 use_container_width=True)
+    create_table_download(table.reset_index(), "geolab_group_summary", key="group_summary")
+
+    if len(table) > 1:
+        st.markdown("#### MIA Categories by Group")
+        st.bar_chart(table[[f"MIA {name}" for name in qfl_engine.MIA_CATEGORIES]].head(50))
+    with st.expander("🔺 Per-group QFL panels", expanded=False):
+        max_panels = st.slider("Panels (largest groups first)", 1, 24, 12, key="group_panels")
+        panels = cache.artifact(key, ('group_panels', column, mode, bin_width, max_panels),
+                                lambda: create_group_ternary_panels(df_processed, groups, max_panels))
+        st.plotly_chart(panels, use_container_width=True)
+    group_report_section(df_processed, groups, (key, column, mode, bin_width))
+
+def group_report_job(job, df_processed, groups, path, fmt, dpi, workers, sample_column, executor):
+    """Background job: renders every group's report into the archive at `path` on the shared process pool."""
+    import report_export
+    job.report(0.0, "Rendering group reports")
+    with instrumentation.span("qfl.group_report", groups=len(groups.labels), format=fmt, workers=workers) as s:
+        info = report_export.export_reports(df_processed, groups, path, fmt=fmt, dpi=dpi, workers=workers,
+                                            sample_column=sample_column, executor=executor,
+                                            on_progress=lambda fraction: job.report(fraction, "Rendering group reports"))
+        s.set(seconds=info["seconds"])
+    return info
+
+def group_report_section(df_processed, groups, report_key):
+    """Per-group figures and tables exported as one ZIP or multi-page PDF by a background job."""
+    import os
+    import shutil
+    import tempfile
+    import jobs
+    import report_export
+    with st.expander("📦 Export per-group reports", expanded=False):
+        st.markdown("A QFL ternary plot, an MIA chart and a summary table for every group, largest groups first. "
+                    "ZIP reports are rendered in parallel worker processes; PDF reports have one page per group.")
+        col1, col2 = st.columns(2)
+        with col1:
+            fmt = st.radio("Format", list(report_export.FORMATS), horizontal=True, key="group_report_format",
+                           format_func=lambda f: report_export.FORMATS[f]["label"])
+        with col2:
+            dpi = st.selectbox("Resolution (DPI, ZIP only)", report_export.DPI_CHOICES, key="group_report_dpi",
+                               disabled=fmt != report_export.ZIP)
+        if st.button("📦 Build report", key="group_report_build"):
+            previous = st.session_state.get('group_report_dir')
+            if previous:
+                shutil.rmtree(previous, ignore_errors=True)
+            workdir = tempfile.mkdtemp(prefix="geolab_report_")
+            st.session_state.group_report_dir = workdir
+            path = os.path.join(workdir, "geolab_group_reports" + report_export.FORMATS[fmt]["extension"])
+            sample_column = next((c for c in df_processed.columns if str(c).lower() in ("sample", "sample_id", "id")), None)
+            runner = get_job_runner()
+            submit_job('group_report_job', "qfl.group_report", group_report_job, df_processed, groups, path, fmt, dpi,
+                       runner.max_processes, sample_column, runner.process_pool(), key=(report_key, fmt, dpi, path))
+
+        job = st.session_state.get('group_report_job')
+        if job is None:
+            return
+        if not job.done:
+            job_status('group_report_job')
+            return
+        if job.status != jobs.DONE:
+            st.error(job.error or "Report export was cancelled.")
+            return
+        job_key, job_fmt, _, path = job.key
+        if job_key != report_key:
+            st.info("The grouping has changed since the report was built; build it again to export the current groups.")
+            return
+        if not os.path.exists(path):
+            st.info("The report of this session has been cleaned up; build it again.")
+            return
+        info = job.result
+        st.success(f"✅ {info['groups']:,} groups in {info['seconds']:.1f} s "
+                   f"({os.path.getsize(path) / 2 ** 20:.1f} MB).")
+        def read():
+            with open(path, "rb") as fh:
+                return fh.read()
+        st.download_button(f"📥 Download report ({report_export.FORMATS[job_fmt]['extension']})", data=read,
+                           file_name=os.path.basename(path), mime=report_export.FORMATS[job_fmt]["mime"],
+                           key="group_report_download")
+
 def qfl_mia_tool_ui():
     """UI for the comprehensive QFL & MIA Analysis tool."""
+    import pandas as pd
+    import table_io
+    import qfl_engine
+    import provenance
+    import ternary_density
+    import result_cache
+    import session_store
+    import incremental
     st.header("💎 QFL & MIA Analysis Tool")
     with st.expander("📘 How to Use This Tool", expanded=False):
         st.markdown("""
@@ -143,149 +668,427 @@ def qfl_mia_tool_ui():
         with col1:
             df_input = st.data_editor(sample_data, num_rows="dynamic", use_container_width=True)
         with col2:
-            uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
-            if uploaded_file:
-                df_input = pd.read_csv(uploaded_file)
+            uploaded_file = st.file_uploader("Upload CSV / Parquet / Arrow", type=table_io.UPLOAD_TYPES)
+            stream_upload = st.checkbox("Large file mode (stream in chunks, summary only)",
+                                        help="Reads the upload in fixed-size chunks so memory stays bounded. Only totals and MIA statistics are kept.")
 
         submitted = st.form_submit_button("🚀 Process Data")
 
+    engine_input_type = qfl_engine.FULL_MINERAL if input_type == "🔬 Full Mineral Data" else qfl_engine.DIRECT_QFL
+    multi_file_batch_section(engine_input_type)
+
     # --- PROCESSING AND DISPLAY LOGIC ---
     if submitted:
-        df = df_input.copy()
-        df.columns = [c.strip().lower() for c in df.columns]
-       
+        # A new submit supersedes whatever this session still has running in the background.
+        if st.session_state.get('qfl_job') is not None:
+            st.session_state.qfl_job.cancel()
+            st.session_state.qfl_job = None
         try:
-            if input_type == "🔬 Full Mineral Data":
-                rename_map = {"feldspar": "k", "mica": "p", "lithic fragment": "lv"}
-                df = df.rename(columns=rename_map)
-                expected_cols = ["qm", "qp", "k", "p", "lm", "ls", "lv"]
-                if not all(col in df.columns for col in expected_cols):
-                    missing = [col for col in expected_cols if col not in df.columns]
-                    st.error(f"Missing required columns for Full Mineral Data analysis: {', '.join(missing)}")
-                    return
-               
-                for col in expected_cols: df[col] = pd.to_numeric(df[col], errors='coerce')
-                df = df.dropna(subset=expected_cols)
-               
-                df["Q"] = df["qm"] + df["qp"]
-                df["F"] = df["k"] + df["p"]
-                df["L"] = df["lm"] + df["ls"] + df["lv"]
-            else: # Direct Q-F-L
-                expected_cols = ["q", "f", "l"]
-                if not all(col in df.columns for col in expected_cols):
-                    missing = [col for col in expected_cols if col not in df.columns]
-                    st.error(f"Missing required columns for Direct Q-F-L analysis: {', '.join(missing)}")
-                    return
-                for col in expected_cols: df[col] = pd.to_numeric(df[col], errors='coerce')
-                df = df.dropna(subset=expected_cols)
-
-            # Normalize QFL for plotting
-            qfl_sum = df[['Q', 'F', 'L']].sum(axis=1)
-            df['Q_norm'] = df['Q'] / qfl_sum
-            df['F_norm'] = df['F'] / qfl_sum
-            df['L_norm'] = df['L'] / qfl_sum
-           
-            # Calculate MIA (Maturity Index of Arenites)
-            df['MIA'] = (df['Q'] / (df['Q'] + df['F'])) * 100
-            df['MIA'] = df['MIA'].fillna(0)
-
-            st.session_state.processed_data = df
-            st.success("✅ Data processed successfully! View results below.")
-
+            st.session_state.stream_summary = None
+            df_processed = None
+            if uploaded_file and stream_upload:
+                # Streaming is for very large files: always in the background, with progress.
+                st.session_state.processed_key = None
+                submit_job('qfl_job', "qfl.stream", stream_upload_job, uploaded_file.getvalue(), uploaded_file.name,
+                           engine_input_type)
+            elif uploaded_file:
+                cache = get_result_cache()
+                raw = uploaded_file.getvalue()
+                key = result_cache.dataset_key(raw, engine_input_type)
+                if len(raw) >= BACKGROUND_UPLOAD_BYTES and key not in cache:
+                    # Large uploads are processed off the script thread; collect_qfl_job() stores the result.
+                    st.session_state.processed_key = None
+                    submit_job('qfl_job', "qfl.process_upload", process_upload_job, cache, raw, uploaded_file.name,
+                               engine_input_type, key=(key, engine_input_type))
+                else:
+                    def parse_and_process():
+                        with instrumentation.span("qfl.parse_upload", bytes=len(raw)) as s:
+                            df_raw = table_io.read_table(io.BytesIO(raw), filename=uploaded_file.name)
+                            s.set(rows=len(df_raw))
+                        return process_qfl_input(df_raw, engine_input_type)
+                    df_processed = cache.get_or_compute(key, parse_and_process)
+                    st.session_state.processed_summary = None
+            else:
+                # Manual entry: only rows edited since the last submit are recomputed.
+                cache = get_result_cache()
+                if 'editor_processor' not in st.session_state:
+                    st.session_state.editor_processor = incremental.IncrementalProcessor(process_qfl_input)
+                processor = st.session_state.editor_processor
+                with instrumentation.span("qfl.incremental", rows=len(df_input)) as s:
+                    df_processed = processor.update(df_input, engine_input_type)
+                    s.set(**processor.last_update)
+                key = result_cache.dataset_key(df_input, engine_input_type)
+                cache.put(key, df_processed)
+                st.session_state.processed_summary = processor.summary.as_dict()
+            if df_processed is not None:
+                if 'result_store' not in st.session_state:
+                    st.session_state.result_store = session_store.SessionStore()
+                st.session_state.result_store.put(key, df_processed, engine_input_type)
+                st.session_state.processed_key = key
+                st.success("✅ Data processed successfully! View results below.")
+        except qfl_engine.MissingColumnsError as e:
+            label = "Full Mineral Data" if engine_input_type == qfl_engine.FULL_MINERAL else "Direct Q-F-L"
+            st.error(f"Missing required columns for {label} analysis: {', '.join(e.missing)}")
+            return
         except Exception as e:
             st.error(f"An error occurred during processing: {e}")
-            st.session_state.processed_data = None
+            st.session_state.processed_key = None
+
+    collect_qfl_job()
+    if st.session_state.stream_summary is not None:
+        display_stream_summary(st.session_state.stream_summary)
 
-    if st.session_state.processed_data is not None:
-        df_processed = st.session_state.processed_data
+    key = st.session_state.processed_key
+    df_processed = get_processed_frame(key) if key is not None else None
+    if df_processed is not None:
+        cache = get_result_cache()
         st.subheader("2. Analysis Results")
        
-        tab1, tab2, tab3, tab4 = st.tabs(["📊 Results Table", "📈 QFL Provenance Plot", "🔬 MIA Analysis", "📥 Download"])
+        tab1, tab2, tab3, tab6, tab5, tab4 = st.tabs(["📊 Results Table", "📈 QFL Provenance Plot", "🔬 MIA Analysis",
+                                                      "🧮 Groups", "🎲 Uncertainty", "📥 Download"])
 
         with tab1:
             st.markdown("#### Processed Data Table")
-            display_cols = ['Q', 'F', 'L', 'MIA'] + [c for c in ['qm', 'qp', 'k', 'p', 'lm', 'ls', 'lv'] if c in df_processed.columns]
-            st.dataframe(df_processed.style.format({col: "{:.2f}" for col in display_cols}), use_container_width=True)
+            display_cols = ['Q', 'F', 'L', 'MIA'] + [c for c in qfl_engine.MINERAL_COLUMNS if c in df_processed.columns]
+            with instrumentation.span("qfl.results_table", rows=len(df_processed)):
+                st.dataframe(df_processed.style.format({col: "{:.2f}" for col in display_cols}), use_container_width=True)
            
-            avg_mia = df_processed['MIA'].mean()
+            summary = st.session_state.processed_summary
+            avg_mia = summary['average_mia'] if summary else df_processed['MIA'].mean()
             st.metric(label="Average Maturity Index (MIA)", value=f"{avg_mia:.2f}%")
 
         with tab2:
             st.markdown("#### Interactive QFL Plot")
-            qfl_fig = create_qfl_mia_plot(df_processed)
-            st.plotly_chart(qfl_fig, use_container_width=True)
+            density_threshold = st.number_input("Density mode above (samples)", min_value=0,
+                                                value=ternary_density.DENSITY_THRESHOLD, step=1000,
+                                                help="Larger datasets are binned into hexagonal cells instead of plotting every point.")
+            def build_qfl_fig():
+                with instrumentation.span("qfl.figure", rows=len(df_processed)):
+                    return create_qfl_mia_plot(df_processed, density_threshold=density_threshold)
+            qfl_fig = cache.artifact(key, ('qfl_fig', density_threshold), build_qfl_fig)
+            with instrumentation.span("qfl.plotly_chart"):
+                st.plotly_chart(qfl_fig, use_container_width=True)
+            st.markdown("#### Provenance Field Summary")
+            st.dataframe(provenance.field_summary(df_processed['Provenance']).style.format({'Percent': "{:.1f}%"}),
+                         use_container_width=True)
 
         with tab3:
             st.markdown("#### Maturity Index (MIA) by Sample")
-            mia_fig = px.bar(df_processed, y='MIA', title="Maturity Index of Arenites (MIA)",
-                             labels={'index': 'Sample', 'MIA': 'MIA (%)'},
-                             text=df_processed['MIA'].apply(lambda x: f'{x:.1f}%'))
-            mia_fig.update_layout(yaxis_range=[0,100])
-            st.plotly_chart(mia_fig, use_container_width=True)
+            def build_mia_fig():
+                with instrumentation.span("qfl.mia_figure", rows=len(df_processed)):
+                    return create_mia_bar_chart(df_processed)
+            mia_fig = cache.artifact(key, 'mia_fig', build_mia_fig)
+            with instrumentation.span("qfl.mia_plotly_chart"):
+                st.plotly_chart(mia_fig, use_container_width=True)
             st.info("""
             **MIA Interpretation:** The MIA index (Quartz / (Quartz + Feldspar)) reflects chemical weathering intensity.
             - **High MIA (>75%):** Suggests intense weathering, tectonically stable (passive margin) or humid climates.
             - **Low MIA (<75%):** Suggests less weathering, tectonically active (active margin) or arid/cold climates.
             """)
 
+        with tab6:
+            group_summary_section(df_processed, key)
+
+        with tab5:
+            uncertainty_section(df_processed, key)
+
         with tab4:
-            csv = df_processed.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📥 Download Results as CSV",
-                data=csv,
-                file_name="geolab_pro_results.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+            def encode(fmt):
+                with instrumentation.span("qfl.export", fmt=fmt, rows=len(df_processed)):
+                    return table_io.write_table(df_processed, fmt)
+            create_table_download(df_processed, "geolab_pro_results", key="qfl_results",
+                                  build=lambda fmt: cache.artifact(key, ('export', fmt), lambda: encode(fmt)))
 
 
 # --- Other UI Modules (Stereonet, etc.) ---
+def create_stereonet_axes(title="Lower-Hemisphere Equal-Area Stereonet"):
+    """Creates a polar Matplotlib axis oriented as an equal-area stereonet (N up, clockwise)."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw={'projection': 'polar'})
+    ax.set_theta_zero_location('N')
+    ax.set_theta_direction(-1)
+    ax.set_rlim(0, 1)
+    ax.set_yticklabels([])
+    ax.grid(True)
+    ax.set_title(title, pad=20)
+    return fig, ax
+
+def read_orientation_columns(df, names):
+    """Numeric arrays for `names` (case-insensitive) plus a mask of rows where all are valid angles."""
+    import numpy as np
+    import pandas as pd
+    columns = {str(c).strip().lower(): c for c in df.columns}
+    if not all(name in columns for name in names):
+        return None, None
+    values = [pd.to_numeric(df[columns[name]], errors='coerce').to_numpy(dtype=float) for name in names]
+    azimuth, inclination = values
+    valid = np.isfinite(azimuth) & np.isfinite(inclination) & (inclination >= 0) & (inclination <= 90)
+    return values, valid
+
+def plot_stereonet_batch(strike=None, dip=None, trend=None, plunge=None, show_great_circles=True,
+                         show_poles=True, density_method=None, sigma=3.0, density=None):
+    """Plots many planes/lines in one pass: great circles as a single LineCollection, optional pole density contours.
+
+    `density` is a precomputed stereonet.pole_density() grid (e.g. from a background job).
+    """
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    import stereonet
+
+    fig, ax = create_stereonet_axes()
+    if strike is not None and len(strike):
+        pole_trend, pole_plunge = stereonet.poles(strike, dip)
+        if density_method:
+            theta, r, _ = stereonet.density_grid()
+            if density is None:
+                density = stereonet.pole_density(pole_trend, pole_plunge, method=density_method, sigma=sigma)
+            contours = ax.contourf(theta, r, density, levels=10, cmap='Blues', alpha=0.8)
+            fig.colorbar(contours, ax=ax, shrink=0.6, pad=0.1, label='Pole density (σ)')
+        if show_great_circles:
+            gc_theta, gc_r = stereonet.great_circles(strike, dip)
+            segments = np.stack([gc_theta, gc_r], axis=-1)
+            ax.add_collection(LineCollection(segments, colors='b', linewidths=0.6,
+                                             alpha=max(0.05, min(1.0, 50 / len(strike))),
+                                             label=f'Planes (n={len(strike):,})'))
+        if show_poles:
+            p_theta, p_r = stereonet.project_lines(pole_trend, pole_plunge)
+            ax.scatter(p_theta, p_r, s=6, c='k', marker='.', label=f'Poles (n={len(strike):,})')
+    if trend is not None and len(trend):
+        l_theta, l_r = stereonet.project_lines(trend, plunge)
+        ax.scatter(l_theta, l_r, s=10, c='r', marker='o', label=f'Lines (n={len(trend):,})')
+    ax.set_rlim(0, 1)
+    ax.legend(loc='upper right', bbox_to_anchor=(1.15, 1.1))
+    return fig
+
+def pole_density_job(job, pole_trend, pole_plunge, method, sigma):
+    """Background job: counts pole density chunk by chunk (NumPy releases the GIL), reporting progress."""
+    import stereonet
+    message = f"Counting density of {len(pole_trend):,} poles"
+    with instrumentation.span("stereonet.background_density", rows=len(pole_trend), density=method):
+        return stereonet.pole_density(pole_trend, pole_plunge, method=method, sigma=sigma,
+                                      on_progress=lambda fraction: job.report(fraction, message))
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def fabric_table(dataset_key: str, kind: str, group_col, confidence: float, _azimuth, _inclination, _groups):
+    """Orientation tensor and Fisher statistics per group, cached per dataset/grouping (arrays are not hashed)."""
+    import fabric
+    with instrumentation.span("stereonet.fabric", rows=len(_azimuth), kind=kind):
+        return fabric.FabricAccumulator().update(kind, _azimuth, _inclination, _groups).results(confidence)
+
+def fabric_section(df, planes, lines, dataset_key):
+    """Fabric statistics of the uploaded planes (as poles) and lines, optionally per group."""
+    import fabric
+    with st.expander("📐 Fabric Statistics (orientation tensor & Fisher)", expanded=False):
+        orientation = {name for names in fabric.ORIENTATION_COLUMNS.values() for name in names}
+        candidates = [c for c in df.columns if str(c).strip().lower() not in orientation]
+        col1, col2 = st.columns(2)
+        with col1:
+            group_col = st.selectbox("Group by", ["(all measurements)"] + candidates, key="fabric_group")
+        with col2:
+            confidence = st.selectbox("Cone of confidence", [0.90, 0.95, 0.99], index=1, format_func="{:.0%}".format,
+                                      key="fabric_confidence")
+        group_col = None if group_col == "(all measurements)" else group_col
+        groups = df[group_col].to_numpy() if group_col is not None else None
+        for kind, values, label in ((fabric.PLANES, planes, "Planes (poles)"), (fabric.LINES, lines, "Lines")):
+            if values is None:
+                continue
+            table = fabric_table(dataset_key, kind, group_col, confidence, values[0], values[1], groups)
+            st.markdown(f"#### {label}")
+            st.dataframe(table.style.format(precision=3), use_container_width=True)
+            create_table_download(table.reset_index(), f"geolab_fabric_{kind}", key=f"fabric_{kind}")
+        st.caption("S1 ≥ S2 ≥ S3: orientation tensor eigenvalues (V1–V3 their axes). Woodcock K > 1 clusters, "
+                   "K < 1 girdles; C is fabric strength. Kappa and the cone of confidence follow Fisher (1953).")
+
 def stereonet_plotter_ui():
     """UI for the Stereonet Plotter."""
+    import stereonet
+    import table_io
+    import result_cache
+    import figure_export
+    import jobs
     st.header("🧭 Stereonet Plotter")
     st.markdown("Visualize planes and lines on an equal-area (Schmidt) lower-hemisphere stereonet.")
-    # ... (rest of the function is unchanged) ...
-    with st.form("stereonet_form"):
-        st.subheader("Plane")
-        col1, col2 = st.columns(2)
-        with col1:
-            strike = st.number_input("Strike of Plane (°)", 0.0, 360.0, value=30.0)
-        with col2:
-            dip = st.number_input("Dip of Plane (°)", 0.0, 90.0, value=45.0)
+    single_tab, batch_tab = st.tabs(["✏️ Single Measurement", "📁 Batch (CSV)"])
 
-        st.subheader("Lineation")
-        col3, col4 = st.columns(2)
-        with col3:
-            trend = st.number_input("Trend of Line (°)", 0.0, 360.0, value=150.0)
-        with col4:
-            plunge = st.number_input("Plunge of Line (°)", 0.0, 90.0, value=25.0)
+    with single_tab:
+        with st.form("stereonet_form"):
+            st.subheader("Plane")
+            col1, col2 = st.columns(2)
+            with col1:
+                strike = st.number_input("Strike of Plane (°)", 0.0, 360.0, value=30.0)
+            with col2:
+                dip = st.number_input("Dip of Plane (°)", 0.0, 90.0, value=45.0)
 
-        submitted = st.form_submit_button("🔍 Plot Stereonet")
+            st.subheader("Lineation")
+            col3, col4 = st.columns(2)
+            with col3:
+                trend = st.number_input("Trend of Line (°)", 0.0, 360.0, value=150.0)
+            with col4:
+                plunge = st.number_input("Plunge of Line (°)", 0.0, 90.0, value=25.0)
 
-    if submitted:
-        fig, ax = plt.subplots(figsize=(8, 8), subplot_kw={'projection': 'polar'})
-        ax.set_theta_zero_location('N')
-        ax.set_theta_direction(-1)
-        ax.set_rlim(0, 1)
-        ax.set_yticklabels([])
-        ax.grid(True)
-        ax.set_title("Lower-Hemisphere Equal-Area Stereonet", pad=20)
-
-        strike_rad, dip_rad = np.deg2rad(strike), np.deg2rad(dip)
-        dip_direction_rad = strike_rad + np.pi / 2
-        alpha = np.linspace(-np.pi/2, np.pi/2, 100)
-        trend_great_circle = dip_direction_rad + np.arctan(np.tan(alpha) / np.cos(dip_rad))
-        plunge_great_circle = np.arcsin(np.sin(alpha) * np.sin(dip_rad))
-        r_plane = np.sqrt(2) * np.sin(np.pi/4 - plunge_great_circle/2)
-        ax.plot(trend_great_circle, r_plane, label=f'Plane ({strike:.0f}/{dip:.0f})', color='b')
-
-        trend_rad, plunge_rad = np.deg2rad(trend), np.deg2rad(plunge)
-        r_line = np.sqrt(2) * np.sin(np.pi/4 - plunge_rad/2)
-        ax.plot(trend_rad, r_line, 'ro', markersize=8, label=f'Line ({trend:.0f}/{plunge:.0f})')
-
-        ax.legend()
-        st.pyplot(fig)
-        create_download_button(fig, "stereonet_plot.png")
+            submitted = st.form_submit_button("🔍 Plot Stereonet")
+
+        if submitted:
+            st.session_state.stereonet_single = (strike, dip, trend, plunge)
+
+        # The plot outlives the form submit so the export pickers can rerun the page.
+        if st.session_state.get('stereonet_single'):
+            def build_single():
+                strike, dip, trend, plunge = st.session_state.stereonet_single
+                with instrumentation.span("stereonet.figure"):
+                    fig, ax = create_stereonet_axes()
+                    gc_theta, gc_r = stereonet.great_circles([strike], [dip])
+                    ax.plot(gc_theta[0], gc_r[0], label=f'Plane ({strike:.0f}/{dip:.0f})', color='b')
+                    l_theta, l_r = stereonet.project_lines(trend, plunge)
+                    ax.plot(l_theta, l_r, 'ro', markersize=8, label=f'Line ({trend:.0f}/{plunge:.0f})')
+                    ax.legend()
+                return fig
+            key, fig = cached_figure(("stereonet_single",) + st.session_state.stereonet_single, build_single)
+            show_figure(key, fig)
+            create_download_button(fig, "stereonet_plot.png", key)
+
+    with batch_tab:
+        st.markdown("Upload a CSV with `Strike`, `Dip` columns for planes and/or `Trend`, `Plunge` columns for lines.")
+        with st.form("stereonet_batch_form"):
+            uploaded_file = st.file_uploader("Upload orientation table (CSV / Parquet / Arrow)", type=table_io.UPLOAD_TYPES)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                show_great_circles = st.checkbox("Great circles", value=True)
+                show_poles = st.checkbox("Poles", value=True)
+            with col2:
+                density_label = st.selectbox("Pole density contours", ["None", "Kamb", "Exponential (Vollmer)"])
+            with col3:
+                sigma = st.number_input("Counting σ", 1.0, 10.0, value=3.0)
+            batch_submitted = st.form_submit_button("🔍 Plot Measurements")
+
+        if batch_submitted:
+            if uploaded_file is None:
+                st.error("Please upload a CSV, Parquet or Arrow file.")
+                return
+            if st.session_state.get('stereonet_job') is not None:
+                st.session_state.stereonet_job.cancel()
+                st.session_state.stereonet_job = None
+            st.session_state.stereonet_batch = {
+                'raw': uploaded_file.getvalue(), 'name': uploaded_file.name,
+                'show_great_circles': show_great_circles, 'show_poles': show_poles,
+                'density_label': density_label, 'sigma': sigma,
+            }
+
+        batch = st.session_state.get('stereonet_batch')
+        if batch:
+            with instrumentation.span("stereonet.read_upload", bytes=len(batch['raw'])):
+                df = read_uploaded_table(batch['raw'], batch['name'])
+            planes, plane_mask = read_orientation_columns(df, ["strike", "dip"])
+            lines, line_mask = read_orientation_columns(df, ["trend", "plunge"])
+            if planes is None and lines is None:
+                st.error("The CSV needs Strike/Dip and/or Trend/Plunge columns.")
+                return
+            for label, mask in (("plane", plane_mask), ("line", line_mask)):
+                if mask is not None and (~mask).any():
+                    st.warning(f"Skipped {(~mask).sum():,} rows with missing or out-of-range {label} values.")
+            density_method = {"Kamb": "kamb", "Exponential (Vollmer)": "exponential"}.get(batch['density_label'])
+            params = ("stereonet_batch", result_cache.dataset_key(batch['raw'], batch['name']),
+                      batch['show_great_circles'], batch['show_poles'], density_method, batch['sigma'])
+
+            # Large density grids are counted in the background; reruns meanwhile only refresh the progress bar.
+            density = None
+            fig_key = figure_export.figure_key(*params)
+            if (density_method and planes and plane_mask.sum() >= BACKGROUND_DENSITY_POLES
+                    and fig_key not in get_figure_cache()):
+                job = st.session_state.get('stereonet_job')
+                if job is None or job.key != fig_key:
+                    pole_trend, pole_plunge = stereonet.poles(planes[0][plane_mask], planes[1][plane_mask])
+                    job = submit_job('stereonet_job', "stereonet.density", pole_density_job, pole_trend, pole_plunge,
+                                     density_method, batch['sigma'], key=fig_key)
+                    if job is None:
+                        return
+                if not job.done:
+                    job_status('stereonet_job')
+                    return
+                if job.status != jobs.DONE:
+                    st.warning(job.error or "Density counting was cancelled; plot again to restart it.")
+                    return
+                density = job.result
+
+            def build_batch():
+                with instrumentation.span("stereonet.batch_figure", rows=len(df), density=density_method):
+                    return plot_stereonet_batch(
+                        strike=planes[0][plane_mask] if planes else None, dip=planes[1][plane_mask] if planes else None,
+                        trend=lines[0][line_mask] if lines else None, plunge=lines[1][line_mask] if lines else None,
+                        show_great_circles=batch['show_great_circles'], show_poles=batch['show_poles'],
+                        density_method=density_method, sigma=batch['sigma'], density=density)
+            key, fig = cached_figure(params, build_batch)
+            show_figure(key, fig)
+            create_download_button(fig, "stereonet_batch_plot.png", key)
+            fabric_section(df, planes, lines, params[1])
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def read_uploaded_table(raw: bytes, filename: str):
+    """Parses an uploaded CSV/Parquet/Arrow file once per distinct upload."""
+    import table_io
+    return table_io.read_table(io.BytesIO(raw), filename=filename)
+
+def batch_calculator_section(calc_id: str):
+    """Upload-a-table batch mode shared by the scalar calculators: one vectorized pass over every row."""
+    with st.expander("📁 Batch Mode (upload a table)", expanded=False):
+        import table_io
+        uploaded_file = st.file_uploader("Upload CSV / Parquet / Arrow", type=table_io.UPLOAD_TYPES, key=f"batch_upload_{calc_id}")
+        if uploaded_file is None:
+            return
+        import numpy as np
+        import calculators
+        calc = calculators.CALCULATORS[calc_id]
+        df = read_uploaded_table(uploaded_file.getvalue(), uploaded_file.name)
+        guesses = calculators.guess_columns(calc_id, df.columns)
+        columns = list(df.columns)
+        column_map = {}
+        cols = st.columns(len(calc.inputs))
+        for col, (name, label) in zip(cols, calc.inputs):
+            default = columns.index(guesses[name]) if guesses[name] in columns else 0
+            column_map[name] = col.selectbox(f"Column for {label}", columns, index=default, key=f"batch_{calc_id}_{name}")
+        if st.button(f"🔍 Calculate {calc.name} for All Rows", key=f"batch_run_{calc_id}"):
+            result = calculators.run_batch(calc_id, df, column_map)
+            st.session_state[f"batch_result_{calc_id}"] = result
+        result = st.session_state.get(f"batch_result_{calc_id}")
+        if result is not None:
+            invalid = int(np.isnan(result[calc.output].to_numpy()).sum())
+            st.success(f"**Calculated {calc.name} for {len(result) - invalid:,} of {len(result):,} rows.**")
+            if invalid:
+                st.warning(f"{invalid:,} rows had missing or out-of-range inputs and were left blank.")
+            st.dataframe(result.head(1000), use_container_width=True)
+            create_table_download(result, f"geolab_pro_{calc_id}_results", key=f"batch_download_{calc_id}")
+
+def grain_size_distribution_section():
+    """Folk & Ward (1957) statistics for many sieve/laser-diffraction distributions at once."""
+    with st.expander("📊 Grain-Size Distribution Statistics (Folk & Ward)", expanded=False):
+        st.markdown("""
+        Upload a CSV with **one row per sample** and **one column per sieve size** holding the weight (or %) retained,
+        e.g. `Sample, 2, 1, 0.5, 0.25, 0.125, 0.0625, Pan`. An optional `Pan` column holds the fines.
+        """)
+        import table_io
+        uploaded_file = st.file_uploader("Upload sieve data (CSV / Parquet / Arrow)", type=table_io.UPLOAD_TYPES,
+                                         key="grain_size_distribution_upload")
+        if uploaded_file is None:
+            return
+        import grain_size
+        df = read_uploaded_table(uploaded_file.getvalue(), uploaded_file.name)
+        col1, col2 = st.columns(2)
+        with col1:
+            non_size = [c for c in df.columns if grain_size.parse_size(c) is None and str(c).strip().lower() != grain_size.PAN_COLUMN]
+            sample_col = st.selectbox("Sample ID column", ["(row number)"] + non_size, index=1 if non_size else 0)
+        with col2:
+            unit = st.radio("Column headers are", ["mm", "phi"], horizontal=True)
+        detected, _ = grain_size.size_columns(df)
+        sizes = st.multiselect("Sieve size columns", detected, default=detected, key="grain_size_columns")
+        try:
+            stats = grain_size.distribution_statistics(df, None if sample_col == "(row number)" else sample_col, unit=unit,
+                                                       sizes=sizes)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.success(f"**Computed Folk & Ward statistics for {len(stats):,} samples.**")
+        st.dataframe(stats.head(1000), use_container_width=True)
+        create_table_download(stats, "geolab_pro_grain_size_statistics", key="grain_size_distribution_download")
 
 def true_dip_calculator_ui():
     """UI for the True Dip Calculator."""
@@ -300,6 +1103,8 @@ def true_dip_calculator_ui():
         st.success(f"**Calculated True Dip: {true_dip:.2f}°**")
         st.latex(r"\text{True Dip} = \arctan\left(\frac{\tan(\text{Apparent Dip})}{\sin(\text{Angle Difference})}\right)")
 
+    batch_calculator_section("true_dip")
+
 def porosity_calculator_ui():
     """UI for the Porosity Calculator."""
     st.header("🪨 Rock Porosity Calculator")
@@ -315,6 +1120,8 @@ def porosity_calculator_ui():
             st.success(f"**Calculated Porosity: {porosity:.2f}%**")
             st.latex(r"\text{Porosity (\%)} = \left(\frac{\text{Pore Volume}}{\text{Total Volume}}\right) \times 100")
 
+    batch_calculator_section("porosity")
+
 def strat_thickness_ui():
     """UI for the Stratigraphic Thickness Estimator."""
     st.header("📏 Stratigraphic Thickness Estimator")
@@ -328,6 +1135,115 @@ def strat_thickness_ui():
         st.success(f"**True Stratigraphic Thickness: {true_thickness:.2f} units**")
         st.latex(r"\text{True Thickness} = \text{Measured Thickness} \times \sin(\text{Dip Angle})")
 
+    batch_calculator_section("strat_thickness")
+
+def dem_slope_job(job, src, destinations, dx, dy, nodata, workers, executor):
+    """Background job: tiled slope/aspect of a DEM file on the shared process pool, with progress per finished strip."""
+    import dem_slope
+    job.report(0.0, "Computing slope strip by strip")
+    with instrumentation.span("slope.dem", workers=workers) as s:
+        info = dem_slope.process_dem(src, destinations, dx=dx, dy=dy, nodata=nodata, workers=workers,
+                                     on_progress=lambda fraction: job.report(fraction, "Computing slope strip by strip"),
+                                     executor=executor)
+        s.set(cells=info["shape"][0] * info["shape"][1])
+    return info
+
+def colorize(values, cmap, vmin, vmax):
+    """RGBA uint8 image of a 2-D array through a Matplotlib colormap (NaN transparent)."""
+    import numpy as np
+    import matplotlib
+    return matplotlib.colormaps[cmap](np.ma.masked_invalid((values - vmin) / (vmax - vmin)), bytes=True)
+
+def dem_slope_section():
+    """Slope/aspect maps of an uploaded DEM grid, computed in memory-mapped strips by a background job."""
+    import os
+    import json
+    import shutil
+    import tempfile
+    import dem_slope
+    import jobs
+    with st.expander("🗺️ Slope Map from a DEM Raster", expanded=False):
+        st.markdown("Upload an elevation grid as **.npy**, or as a headerless **raw** grid (.raw/.bin/.dem) and give its size "
+                    "and data type. Rows are assumed to run north to south. Very large grids are better processed with "
+                    "`python geolab_cli.py slope`, which reads them from disk without uploading.")
+        with st.form("dem_slope_form"):
+            uploaded = st.file_uploader("DEM grid", type=["npy"] + [ext.lstrip('.') for ext in dem_slope.RAW_EXTENSIONS])
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                dx = st.number_input("Cell size east-west (dx)", min_value=0.0001, value=30.0)
+                dy = st.number_input("Cell size north-south (dy)", min_value=0.0001, value=30.0)
+            with col2:
+                use_nodata = st.checkbox("Grid has a nodata value")
+                nodata = st.number_input("Nodata value", value=-9999.0)
+            with col3:
+                rows = st.number_input("Rows (raw only)", min_value=0, value=0)
+                cols = st.number_input("Columns (raw only)", min_value=0, value=0)
+                dtype = st.selectbox("Data type (raw only)", ["<f4", "<f8", "<i2", "<i4", ">f4", ">i2"])
+            run = st.form_submit_button("⛰️ Compute Slope Map")
+
+        if run:
+            if uploaded is None:
+                st.error("Please upload a DEM grid.")
+                return
+            previous = st.session_state.get('dem_slope_dir')
+            if previous:
+                shutil.rmtree(previous, ignore_errors=True)
+            workdir = tempfile.mkdtemp(prefix="geolab_dem_")
+            st.session_state.dem_slope_dir = workdir
+            src = os.path.join(workdir, os.path.basename(uploaded.name))
+            with open(src, "wb") as fh:
+                fh.write(uploaded.getbuffer())
+            if not src.lower().endswith(".npy"):
+                if not rows or not cols:
+                    st.error("Raw grids need their number of rows and columns.")
+                    return
+                with open(dem_slope.sidecar_path(src), "w", encoding="utf-8") as fh:
+                    json.dump({"rows": int(rows), "cols": int(cols), "dtype": dtype}, fh)
+            destinations = {name: os.path.join(workdir, f"{name}.npy") for name in dem_slope.OUTPUTS}
+            runner = get_job_runner()
+            submit_job('dem_slope_job', "slope.dem", dem_slope_job, src, destinations, dx, dy,
+                       nodata if use_nodata else None, runner.max_processes, runner.process_pool(), key=destinations)
+
+        job = st.session_state.get('dem_slope_job')
+        if job is None:
+            return
+        if not job.done:
+            job_status('dem_slope_job')
+            return
+        if job.status != jobs.DONE:
+            st.error(job.error or "Slope computation was cancelled.")
+            return
+        info, destinations = job.result, job.key
+        if not all(os.path.exists(path) for path in destinations.values()):
+            st.info("The slope rasters of this session have been cleaned up; compute them again.")
+            return
+        rows, cols = info["shape"]
+        st.success(f"✅ {rows:,} × {cols:,} cells in {info['strips']} strips, {info['seconds']:.2f} s "
+                   f"({info['cells_per_second'] / 1e6:.1f} Mcells/s).")
+        stats = info["stats"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Mean slope", f"{stats[dem_slope.SLOPE_DEGREES]['mean']:.1f}°")
+        col2.metric("Max slope", f"{stats[dem_slope.SLOPE_DEGREES]['max']:.1f}°")
+        col3.metric("Mean slope (%)", f"{stats[dem_slope.SLOPE_PERCENT]['mean']:.1f}%")
+        view = st.radio("Show", ["Slope (°)", "Aspect (°)"], horizontal=True, key="dem_slope_view")
+        if view == "Slope (°)":
+            st.image(colorize(dem_slope.preview(destinations[dem_slope.SLOPE_DEGREES]), 'viridis', 0, 90),
+                     caption="Slope, 0–90° (display is subsampled)", use_container_width=True)
+        else:
+            st.image(colorize(dem_slope.preview(destinations[dem_slope.ASPECT]), 'twilight', 0, 360),
+                     caption="Aspect, degrees clockwise from north (display is subsampled)", use_container_width=True)
+        labels = {dem_slope.SLOPE_PERCENT: "Slope (%)", dem_slope.SLOPE_DEGREES: "Slope (°)", dem_slope.ASPECT: "Aspect (°)"}
+        def reader(path):
+            def read():
+                with open(path, "rb") as fh:
+                    return fh.read()
+            return read
+        for column, (name, path) in zip(st.columns(len(destinations)), destinations.items()):
+            with column:
+                st.download_button(f"📥 {labels[name]} (.npy)", data=reader(path),
+                                   file_name=f"{name}.npy", mime="application/octet-stream", key=f"dem_{name}_download",
+                                   use_container_width=True)
+
 def slope_gradient_ui():
     """UI for the Slope Gradient Calculator."""
     st.header("⛰️ Slope Gradient Calculator")
@@ -343,6 +1259,9 @@ def slope_gradient_ui():
             st.success(f"**Slope Gradient: {slope:.2f}%**")
             st.latex(r"\text{Slope Gradient (\%)} = \left(\frac{\text{Vertical Rise}}{\text{Horizontal Run}}\right) \times 100")
 
+    batch_calculator_section("slope_gradient")
+    dem_slope_section()
+
 def grain_size_to_phi_ui():
     """UI for the Grain Size to Phi converter."""
     st.header("🌾 Grain Size (mm) to Phi (φ) Converter")
@@ -355,9 +1274,13 @@ def grain_size_to_phi_ui():
         st.success(f"**Phi (φ) Value: {phi_value:.2f} φ**")
         st.latex(r"\phi = -\log_2(\text{Grain Size in mm})")
 
+    batch_calculator_section("grain_size_to_phi")
+    grain_size_distribution_section()
+
 # --- NAVIGATION & MAIN APP LAYOUT ---
 def display_homepage():
     """Displays the main welcome page of the application."""
+    from streamlit_lottie import st_lottie
     st.markdown("""
     <style>
         .home-title { font-size: 3.5rem; font-weight: 700; color: #1E90FF; text-align: center; }
@@ -383,13 +1306,42 @@ def display_homepage():
         Select a module from the sidebar to begin your analysis.
         """, unsafe_allow_html=True)
 
+ui_function_map = {
+    "qfl_mia_tool": qfl_mia_tool_ui,
+    "stereonet_plotter": stereonet_plotter_ui,
+    "true_dip_calculator": true_dip_calculator_ui,
+    "porosity_calculator": porosity_calculator_ui,
+    "strat_thickness_estimator": strat_thickness_ui,
+    "slope_gradient": slope_gradient_ui,
+    "grain_size_to_phi": grain_size_to_phi_ui,
+}
+
+def load_module_ui(mod_id):
+    """Imports a module's heavy dependencies (once per process) and returns its UI function."""
+    for name in MODULE_DEPENDENCIES.get(mod_id, ()):
+        importlib.import_module(name)
+    return ui_function_map.get(mod_id)
+
+def display_debug_panel(recorder):
+    """Sidebar table of the stage timings recorded during this script run."""
+    with st.sidebar.expander("⏱️ Stage Timings", expanded=True):
+        if not recorder.spans:
+            st.caption("No instrumented stages ran on this page load.")
+        else:
+            st.dataframe(recorder.rows(), hide_index=True, use_container_width=True)
+            st.caption(f"Instrumented total: {recorder.total_seconds * 1e3:.1f} ms")
+        with st.popover("Prometheus metrics (this process)"):
+            st.code(instrumentation.prometheus_text(), language="text")
+
 def main():
     """Main function to run the Streamlit app."""
     st.sidebar.title("GeoLab Pro")
     st.sidebar.markdown("---")
     if st.sidebar.button("🏠 Home", use_container_width=True):
         st.session_state.selected_module = None
-        st.session_state.processed_data = None
+        st.session_state.processed_key = None
+        st.session_state.stream_summary = None
+        st.session_state.multi_file_batch = None
         st.rerun()
 
     st.sidebar.subheader("Analysis Modules")
@@ -398,21 +1350,24 @@ def main():
             st.session_state.selected_module = mod_id
             st.rerun()
 
-    if st.session_state.selected_module is None:
-        display_homepage()
-    else:
-        ui_function_map = {
-            "qfl_mia_tool": qfl_mia_tool_ui,
-            "stereonet_plotter": stereonet_plotter_ui,
-            "true_dip_calculator": true_dip_calculator_ui,
-            "porosity_calculator": porosity_calculator_ui,
-            "strat_thickness_estimator": strat_thickness_ui,
-            "slope_gradient": slope_gradient_ui,
-            "grain_size_to_phi": grain_size_to_phi_ui,
-        }
-        selected_function = ui_function_map.get(st.session_state.selected_module)
-        if selected_function:
-            selected_function()
+    st.sidebar.markdown("---")
+    debug = st.sidebar.toggle("🐞 Debug timings", help="Times each processing and rendering stage of this page.")
+    recorder = instrumentation.start_recording() if debug else None
+    if not debug:
+        instrumentation.stop_recording()
+
+    with instrumentation.span("page", module=st.session_state.selected_module or "home"):
+        if st.session_state.selected_module is None:
+            display_homepage()
+        else:
+            selected_function = load_module_ui(st.session_state.selected_module)
+            if selected_function:
+                selected_function()
+
+    if recorder is not None:
+        display_debug_panel(recorder)
+    if instrumentation.ENABLED:
+        instrumentation.write_prometheus()
 
     st.markdown("---")
     st.markdown("""
@@ -0,0 +1,84 @@
+"""Process-wide cache of static assets shared by every session.
+
+Reference images are read from disk once, scaled down to a display width
+and kept as encoded PNG bytes, so a rerun hands st.image() ready-made
+bytes instead of re-reading and re-encoding the file. Entries are keyed
+by path, modification time and width: replacing a file on disk picks up
+the new version on the next request. shared() memoizes any other object
+that is built once and then only read, such as the static parts of a
+figure. Headless: no streamlit imports.
+"""
+import io
+import os
+import threading
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Display width images are scaled down to; fills a wide-layout column.
+DEFAULT_WIDTH = 960
+
+_images = {}
+_shared = {}
+_lock = threading.Lock()
+
+
+def static_path(name):
+    """Absolute path of `name` inside static/ (absolute paths are returned unchanged)."""
+    return os.path.join(STATIC_DIR, name)
+
+
+def _encode(path, width):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.load()
+        if width and image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def image_bytes(name, width=DEFAULT_WIDTH):
+    """PNG bytes of a static image scaled down (never up) to `width` pixels; None if missing or unreadable."""
+    path = static_path(name)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    key = (path, mtime, width)
+    with _lock:
+        if key in _images:
+            return _images[key]
+    try:
+        data = _encode(path, width)
+    except (OSError, ValueError):
+        data = None
+    with _lock:
+        # Drop entries for older versions of the same file and width.
+        for stale in [k for k in _images if k[0] == path and k[2] == width]:
+            del _images[stale]
+        _images[key] = data
+    return data
+
+
+def shared(name, build):
+    """build() once per process under `name`; every later call returns the same object, so treat it as read-only."""
+    with _lock:
+        if name in _shared:
+            return _shared[name]
+    value = build()
+    with _lock:
+        return _shared.setdefault(name, value)
+
+
+def stats():
+    with _lock:
+        return {"images": len(_images), "image_bytes": sum(len(d) for d in _images.values() if d),
+                "shared": len(_shared)}
+
+
+def clear():
+    with _lock:
+        _images.clear()
+        _shared.clear()
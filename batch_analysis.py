@@ -0,0 +1,176 @@
+"""QFL/MIA/provenance analysis of many point-count tables (or zip archives of them) at once.
+
+Each file is read and processed independently in a worker process, so a
+project of hundreds of per-well CSVs spreads across all cores. Every file
+yields one summary row (sample counts, Q/F/L totals, MIA statistics, MIA
+category and provenance field counts) and, optionally, its processed rows
+tagged with the source file name for a combined table. A file that fails
+(unreadable, missing columns) gets an Error entry instead of stopping
+the batch. Headless: no streamlit imports.
+"""
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import provenance
+import qfl_engine
+import table_io
+
+SOURCE_COLUMN = "Source"
+# forkserver/spawn workers never inherit the Streamlit server's threads and locks.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Count columns of the summary; kept as nullable integers when a file fails.
+COUNT_COLUMNS = ("Samples", "Dropped Rows")
+COUNT_PREFIXES = ("MIA ", "Provenance ")
+
+
+def iter_sources(files):
+    """Expands uploads into (name, bytes) pairs, unpacking .zip archives.
+
+    `files` holds paths, file-like objects with a .name, or (name, bytes)
+    pairs. Archive members that are not supported table files (folders,
+    __MACOSX metadata, READMEs) are skipped.
+    """
+    for item in files:
+        if isinstance(item, tuple):
+            name, data = item
+        elif isinstance(item, (str, os.PathLike)):
+            name = os.fspath(item)
+            with open(name, "rb") as fh:
+                data = fh.read()
+        else:
+            name = item.name
+            data = item.getvalue() if hasattr(item, "getvalue") else item.read()
+        if not name.lower().endswith(".zip"):
+            yield name, data
+            continue
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in archive.infolist():
+                base = os.path.basename(member.filename)
+                if member.is_dir() or member.filename.startswith("__MACOSX/") or base.startswith("."):
+                    continue
+                if os.path.splitext(base)[1].lower() in table_io.EXTENSIONS:
+                    yield f"{name}/{member.filename}", archive.read(member)
+
+
+def summarize_frame(df):
+    """One summary row (dict) for a processed frame with a Provenance column."""
+    summary = qfl_engine.summarize(df)
+    row = {
+        "Samples": summary["rows"],
+        "Total Q": summary["total_q"],
+        "Total F": summary["total_f"],
+        "Total L": summary["total_l"],
+        "Mean MIA": summary["average_mia"],
+        "Median MIA": float(np.median(df["MIA"])) if len(df) else np.nan,
+    }
+    row.update({f"MIA {name}": int(count) for name, count in summary["category_counts"].items()})
+    fields = provenance.field_summary(df["Provenance"])["Samples"]
+    row.update({f"Provenance {name}": int(count) for name, count in fields.items()})
+    row["Dominant Provenance"] = fields.idxmax() if fields.sum() else None
+    return row
+
+
+def process_table(name, data, input_type):
+    """Reads one table from bytes and returns its processed frame with Provenance (attrs["input_rows"] = rows read)."""
+    raw = table_io.read_table(io.BytesIO(data), filename=name)
+    df = qfl_engine.process_frame(raw, input_type)
+    df["Provenance"] = provenance.classify_frame(df)
+    df.attrs["input_rows"] = len(raw)
+    return df
+
+
+def analyze_file(name, data, input_type, keep_rows=True):
+    """Processes one table; returns (summary row, processed rows or None). Never raises."""
+    row = {SOURCE_COLUMN: name}
+    try:
+        df = process_table(name, data, input_type)
+    except qfl_engine.MissingColumnsError as e:
+        row["Error"] = f"Missing columns: {', '.join(e.missing)}"
+        return row, None
+    except Exception as e:
+        row["Error"] = f"{type(e).__name__}: {e}"
+        return row, None
+    row["Dropped Rows"] = df.attrs.pop("input_rows") - len(df)
+    row.update(summarize_frame(df))
+    row["Error"] = None
+    if not keep_rows:
+        return row, None
+    df.insert(0, SOURCE_COLUMN, name)
+    return row, df
+
+
+def analyze_files(files, input_type, max_workers=None, keep_rows=True, on_result=None, executor=None):
+    """Analyzes every table in `files` (see iter_sources) in a process pool.
+
+    Returns (summary, combined): one summary row per file in input order,
+    and all processed rows concatenated with a Source column (None when
+    `keep_rows` is False). `on_result(done, total, row)` is called as each
+    file finishes. Files run on `executor` when given (e.g. a shared
+    JobRunner pool), otherwise on a pool started for this call;
+    `max_workers` (default: the CPU count) bounds how many files are in
+    flight at once. Without an executor, a single file or worker runs
+    everything in this process.
+    """
+    sources = list(iter_sources(files))
+    total = len(sources)
+    max_workers = min(max_workers or os.cpu_count() or 1, total) if total else 1
+    results = [None] * total
+
+    def collect(index, result, done):
+        results[index] = result
+        if on_result:
+            on_result(done, total, result[0])
+
+    if executor is not None:
+        _run_on(executor, sources, input_type, keep_rows, max_workers, collect)
+    elif max_workers <= 1:
+        for index, (name, data) in enumerate(sources):
+            collect(index, analyze_file(name, data, input_type, keep_rows), index + 1)
+    else:
+        context = multiprocessing.get_context(START_METHOD)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            _run_on(pool, sources, input_type, keep_rows, max_workers, collect)
+
+    summary = pd.DataFrame([row for row, _ in results], columns=_summary_columns(results))
+    for col in summary.columns:
+        if col in COUNT_COLUMNS or col.startswith(COUNT_PREFIXES):
+            summary[col] = summary[col].astype("Int64")
+    frames = [df for _, df in results if df is not None]
+    combined = None
+    if keep_rows:
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[SOURCE_COLUMN])
+        combined[SOURCE_COLUMN] = combined[SOURCE_COLUMN].astype("category")
+        if "Provenance" in combined:
+            combined["Provenance"] = pd.Categorical(combined["Provenance"], categories=provenance.FIELD_NAMES)
+    return summary, combined
+
+
+def _run_on(pool, sources, input_type, keep_rows, in_flight, collect):
+    # At most `in_flight` files are queued on the pool at once, so a shared pool stays available to others.
+    pending = {}
+    queue = iter(enumerate(sources))
+    done = 0
+    while True:
+        for index, (name, data) in queue:
+            pending[pool.submit(analyze_file, name, data, input_type, keep_rows)] = index
+            if len(pending) >= in_flight:
+                break
+        if not pending:
+            return
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            done += 1
+            collect(pending.pop(future), future.result(), done)
+
+
+def _summary_columns(results):
+    columns = [SOURCE_COLUMN]
+    for row, _ in results:
+        columns += [c for c in row if c not in columns and c != "Error"]
+    return columns + ["Error"]
@@ -0,0 +1,90 @@
+"""Benchmark tiled, memory-mapped DEM slope/aspect against the whole-array computation.
+
+Usage: python benchmarks/bench_dem_slope.py [--workers N] [--tile-mb MB] [size ...]
+
+Each size is the side of a square synthetic float32 DEM written to a
+temporary .npy. "whole" loads the grid and computes every output in
+memory; "tiled" streams strips through dem_slope.process_dem with one
+process, then with --workers processes. Peak memory is NumPy allocations
+traced with tracemalloc (memory-mapped pages are not counted).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dem_slope  # noqa: E402
+
+
+def synthetic_dem(path, size, seed=42):
+    """Smooth random terrain written strip by strip, so building it never needs the whole grid in RAM."""
+    rng = np.random.default_rng(seed)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(size, size))
+    x = np.linspace(0, 8 * np.pi, size)
+    phase = rng.uniform(0, 2 * np.pi, 4)
+    step = dem_slope.tile_rows_for(size)
+    for start in range(0, size, step):
+        y = x[start:start + step, None]
+        out[start:start + step] = (300 * np.sin(x[None, :] + phase[0]) * np.cos(y + phase[1])
+                                   + 50 * np.sin(3 * x[None, :] + phase[2]) + 20 * np.cos(5 * y + phase[3]))
+    out.flush()
+    del out
+
+
+def timed(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=[1000, 2000, 4000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tile-mb", type=float, default=dem_slope.TILE_BYTES / 2 ** 20)
+    parser.add_argument("--dx", type=float, default=30.0)
+    args = parser.parse_args(argv)
+    tile_bytes = int(args.tile_mb * 2 ** 20)
+
+    tmp = tempfile.mkdtemp(prefix="geolab_dem_")
+    try:
+        print(f"{'size':>7} {'mode':>12} {'seconds':>9} {'Mcells/s':>9} {'peak MB':>9} {'max |diff|':>11}")
+        for size in args.sizes:
+            src = os.path.join(tmp, f"dem_{size}.npy")
+            synthetic_dem(src, size)
+            cells = size * size / 1e6
+
+            def whole():
+                grid = np.load(src)
+                result = dem_slope.whole_array(grid, args.dx, args.dx)
+                for name, values in result.items():
+                    np.save(os.path.join(tmp, f"whole_{name}.npy"), values.astype(dem_slope.OUTPUT_DTYPE))
+                return result[dem_slope.SLOPE_DEGREES]
+            reference, seconds, peak = timed(whole)
+            print(f"{size:>7} {'whole':>12} {seconds:>9.2f} {cells / seconds:>9.1f} {peak / 2 ** 20:>9.1f} {'':>11}")
+
+            runs = [("tiled x1", 1)] + ([(f"tiled x{args.workers}", args.workers)] if args.workers > 1 else [])
+            for label, workers in runs:
+                destinations = {name: os.path.join(tmp, f"tiled_{name}.npy") for name in dem_slope.OUTPUTS}
+                _, seconds, peak = timed(lambda: dem_slope.process_dem(
+                    src, destinations, dx=args.dx, workers=workers, tile_rows=dem_slope.tile_rows_for(size, tile_bytes)))
+                diff = float(np.nanmax(np.abs(np.load(destinations[dem_slope.SLOPE_DEGREES], mmap_mode="r") - reference)))
+                print(f"{size:>7} {label:>12} {seconds:>9.2f} {cells / seconds:>9.1f} {peak / 2 ** 20:>9.1f} {diff:>11.2e}")
+            del reference
+            os.remove(src)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Benchmark Dickinson provenance classification on synthetic QFL fractions.
+
+Usage: python benchmarks/bench_provenance.py [n_samples ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import provenance  # noqa: E402
+
+
+def best_of(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    start = time.perf_counter()
+    provenance.lookup_grid()
+    print(f"lookup grid build: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    rng = np.random.default_rng(42)
+    print(f"{'samples':>10} {'grid ms':>10} {'exact ms':>10} {'agreement':>10}")
+    for n in sizes:
+        qfl = rng.dirichlet([2, 1, 1], n)
+        q, f = qfl[:, 0], qfl[:, 1]
+        grid_t = best_of(lambda: provenance.classify(q, f))
+        exact_t = best_of(lambda: provenance.classify_exact(q, f))
+        agreement = (provenance.classify(q, f) == provenance.classify_exact(q, f)).mean()
+        print(f"{n:>10} {grid_t * 1e3:>10.2f} {exact_t * 1e3:>10.2f} {agreement:>10.4f}")
+
+
+if __name__ == "__main__":
+    main([int(float(a)) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
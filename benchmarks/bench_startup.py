@@ -0,0 +1,70 @@
+"""Cold-start cost of the app: import time and peak RSS for the home page and each module.
+
+Every measurement runs in a fresh interpreter so nothing is shared between
+modules. Usage: python benchmarks/bench_startup.py [--repeat N] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app
+app_import = time.perf_counter() - start
+target = {target!r}
+load_start = time.perf_counter()
+if target == "home":
+    for name in app.HOME_DEPENDENCIES:
+        __import__(name)
+else:
+    app.load_module_ui(target)
+module_load = time.perf_counter() - load_start
+print(json.dumps({{
+    "app_import_s": app_import,
+    "module_load_s": module_load,
+    "total_s": time.perf_counter() - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def probe(target):
+    code = PROBE.format(root=ROOT, target=target)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def module_ids():
+    out = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import app, json; print(json.dumps(list(app.MODULES.values())))"],
+                         capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per target (median is reported)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'target':<28} {'app import s':>12} {'module s':>10} {'total s':>9} {'RSS MB':>8}")
+    for target in ["home"] + module_ids():
+        runs = [probe(target) for _ in range(args.repeat)]
+        row = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        results[target] = row
+        print(f"{target:<28} {row['app_import_s']:>12.3f} {row['module_load_s']:>10.3f} {row['total_s']:>9.3f} {row['max_rss_mb']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
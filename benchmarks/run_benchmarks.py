@@ -0,0 +1,211 @@
+"""Headless benchmark suite for the QFL pipeline, plotting and stereonet maths.
+
+Every stage runs against synthetic data (fixed seed) at each requested
+size. Wall time is the median of --repeat runs; peak memory is measured
+in one extra run under tracemalloc (NumPy and pandas report their buffers
+to it), so tracing does not distort the timings. Setup work (building the
+input for a stage) is never timed.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 1e3,1e4,1e5,1e6,1e7] [--stages a,b]
+                                        [--repeat N] [--save baseline.json] [--compare baseline.json]
+
+--compare prints the time/memory ratio against a saved baseline and exits
+with status 1 when any stage is slower than --tolerance allows.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import provenance  # noqa: E402
+import qfl_engine  # noqa: E402
+import stereonet  # noqa: E402
+import table_io  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+SEED = 42
+
+# setup(n) builds the stage input (untimed); run(data) is the timed part.
+# Stages whose cost or memory is far above linear are capped at max_rows.
+Stage = namedtuple("Stage", ["setup", "run", "max_rows"])
+
+
+# --- SYNTHETIC DATA ---
+
+def raw_mineral_table(n):
+    """Full-mineral table with un-standardized headers, as users upload it."""
+    rng = np.random.default_rng(SEED)
+    counts = rng.dirichlet([6, 1, 1, 1, 1, 1, 0.5], n) * 100
+    df = pd.DataFrame(counts, columns=["Qm", "Qp", "Feldspar", "Mica", "Lm", "Ls", "Lithic Fragment"])
+    df.insert(0, "Sample", pd.RangeIndex(n).astype(str))
+    return df
+
+
+def processed_table(n):
+    df = qfl_engine.process_frame(raw_mineral_table(n), qfl_engine.FULL_MINERAL)
+    df["Provenance"] = provenance.classify_frame(df)
+    return df
+
+
+def orientations(n):
+    rng = np.random.default_rng(SEED)
+    return rng.uniform(0, 360, n), rng.uniform(0, 90, n)
+
+
+# --- STAGES ---
+
+def _plot_qfl_triangle(df):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import qfl_mia_tool
+
+    qfl_mia_tool.plot_qfl_triangle(df)
+    plt.close("all")
+
+
+def _create_qfl_mia_plot(df):
+    import app
+
+    app.create_qfl_mia_plot(df)
+
+
+def _pole_density(data):
+    trend, plunge = stereonet.poles(*data)
+    stereonet.pole_density(trend, plunge)
+
+
+STAGES = {
+    "standardize_columns": Stage(raw_mineral_table, qfl_engine.standardize_columns, None),
+    "qfl_mia": Stage(raw_mineral_table, lambda df: qfl_engine.process_frame(df, qfl_engine.FULL_MINERAL), None),
+    "plot_qfl_triangle": Stage(lambda n: processed_table(n)[["Q", "F", "L"]].rename(columns=str.lower),
+                               _plot_qfl_triangle, None),
+    "create_qfl_mia_plot": Stage(processed_table, _create_qfl_mia_plot, None),
+    "csv_export": Stage(processed_table, lambda df: table_io.write_table(df, table_io.CSV), None),
+    "stereonet_project": Stage(orientations, lambda data: stereonet.project_lines(*stereonet.poles(*data)), None),
+    "stereonet_great_circles": Stage(orientations, lambda data: stereonet.great_circles(*data), 100_000),
+    "stereonet_density": Stage(orientations, _pole_density, 100_000),
+}
+
+
+# --- MEASUREMENT ---
+
+def measure(stage, n, repeat):
+    data = stage.setup(n)
+    stage.run(data)  # warm-up: imports, lru caches, first-call allocations
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        stage.run(data)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage.run(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time_s": statistics.median(times), "peak_mb": peak / 2 ** 20}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance, min_time):
+    """Prints ratios against a baseline; returns the (stage, size) pairs slower than `tolerance`.
+
+    Stages that took less than `min_time` seconds in the baseline are too
+    noisy to fail on and are only reported.
+    """
+    regressions = []
+    print(f"\n{'stage':<26} {'rows':>10} {'time x':>8} {'peak x':>8}")
+    for name, by_size in results.items():
+        for size, row in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if not base:
+                continue
+            time_ratio = row["time_s"] / base["time_s"] if base["time_s"] else float("inf")
+            peak_ratio = row["peak_mb"] / base["peak_mb"] if base["peak_mb"] else float("nan")
+            flag = ""
+            if time_ratio > 1 + tolerance and base["time_s"] >= min_time:
+                regressions.append((name, size))
+                flag = "  <-- slower"
+            print(f"{name:<26} {size:>10} {time_ratio:>8.2f} {peak_ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated row counts (1e5 notation allowed)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage and size (median is reported)")
+    parser.add_argument("--save", help="write results and environment to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON written earlier with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs the baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.01,
+                        help="baseline stages faster than this (s) never fail the comparison")
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s]
+    names = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in names if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    results = {}
+    print(f"{'stage':<26} {'rows':>10} {'time s':>10} {'peak MB':>9}")
+    for name in names:
+        stage = STAGES[name]
+        results[name] = {}
+        for n in sizes:
+            if stage.max_rows and n > stage.max_rows:
+                continue
+            row = measure(stage, n, args.repeat)
+            results[name][str(n)] = row
+            print(f"{name:<26} {n:>10} {row['time_s']:>10.4f} {row['peak_mb']:>9.1f}", flush=True)
+
+    report = {"environment": environment(), "results": results}
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print(f"baseline: {baseline.get('environment', {}).get('commit')}  current: {report['environment']['commit']}")
+        if compare(results, baseline, args.tolerance, args.min_time):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
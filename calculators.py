@@ -0,0 +1,110 @@
+"""Vectorized versions of the scalar geology calculators.
+
+Each function takes array-likes (or scalars), validates them with boolean
+masks instead of per-row checks, and returns a float64 array with NaN
+wherever the inputs are missing or out of range. CALCULATORS describes the
+inputs/outputs of each so UIs and batch jobs can drive them generically.
+Headless: no streamlit imports.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Calculator = namedtuple("Calculator", ["name", "func", "inputs", "output"])
+
+
+def _arrays(*values):
+    return [np.asarray(v, dtype=np.float64) for v in values]
+
+
+def true_dip(apparent_dip, angle_diff):
+    """True dip (°) from an apparent dip (°) and the strike-to-traverse angle (°)."""
+    apparent_dip, angle_diff = _arrays(apparent_dip, angle_diff)
+    valid = (apparent_dip >= 0) & (apparent_dip <= 90) & (angle_diff > 0) & (angle_diff <= 90)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.degrees(np.arctan(np.tan(np.radians(apparent_dip)) / np.sin(np.radians(angle_diff))))
+    return np.where(valid, out, np.nan)
+
+
+def porosity(pore_volume, total_volume):
+    """Porosity (%) = pore volume / total bulk volume * 100."""
+    pore_volume, total_volume = _arrays(pore_volume, total_volume)
+    valid = (pore_volume >= 0) & (total_volume > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pore_volume / total_volume * 100
+    return np.where(valid, out, np.nan)
+
+
+def strat_thickness(measured_thickness, dip_angle):
+    """True stratigraphic thickness = measured thickness * sin(dip)."""
+    measured_thickness, dip_angle = _arrays(measured_thickness, dip_angle)
+    valid = (measured_thickness >= 0) & (dip_angle >= 0) & (dip_angle <= 90)
+    return np.where(valid, measured_thickness * np.sin(np.radians(dip_angle)), np.nan)
+
+
+def slope_gradient(rise, run):
+    """Slope gradient (%) = vertical rise / horizontal run * 100."""
+    rise, run = _arrays(rise, run)
+    valid = (rise >= 0) & (run > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = rise / run * 100
+    return np.where(valid, out, np.nan)
+
+
+def mm_to_phi(grain_size_mm):
+    """Krumbein phi = -log2(grain size in mm)."""
+    (grain_size_mm,) = _arrays(grain_size_mm)
+    valid = grain_size_mm > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = -np.log2(grain_size_mm)
+    return np.where(valid, out, np.nan)
+
+
+# inputs: (column name, label) pairs in argument order.
+CALCULATORS = {
+    "true_dip": Calculator("True Dip", true_dip,
+                           [("apparent_dip", "Apparent Dip (°)"), ("angle_diff", "Angle Between Strike and Traverse (°)")],
+                           "true_dip"),
+    "porosity": Calculator("Porosity", porosity,
+                           [("pore_volume", "Pore Volume"), ("total_volume", "Total Bulk Volume")],
+                           "porosity_pct"),
+    "strat_thickness": Calculator("Stratigraphic Thickness", strat_thickness,
+                                  [("measured_thickness", "Measured Thickness"), ("dip_angle", "Dip Angle (°)")],
+                                  "true_thickness"),
+    "slope_gradient": Calculator("Slope Gradient", slope_gradient,
+                                 [("rise", "Vertical Rise"), ("run", "Horizontal Run")],
+                                 "slope_gradient_pct"),
+    "grain_size_to_phi": Calculator("Grain Size to Phi", mm_to_phi,
+                                    [("grain_size_mm", "Grain Size (mm)")],
+                                    "phi"),
+}
+
+
+def guess_columns(calc_id, columns):
+    """Best-effort mapping of each calculator input to a column of `columns` (None if no match)."""
+    normalized = {str(c).strip().lower().replace(" ", "_"): c for c in columns}
+    mapping = {}
+    for name, label in CALCULATORS[calc_id].inputs:
+        label_key = label.split("(")[0].strip().lower().replace(" ", "_")
+        mapping[name] = normalized.get(name, normalized.get(label_key))
+    return mapping
+
+
+def run_batch(calc_id, df, column_map=None):
+    """Applies a calculator to every row of `df`.
+
+    `column_map` maps calculator input names to columns of `df` (defaults
+    to guess_columns()). Returns a copy of `df` with the output column
+    appended; rows with missing/invalid inputs get NaN.
+    """
+    calc = CALCULATORS[calc_id]
+    column_map = column_map or guess_columns(calc_id, df.columns)
+    missing = [name for name, _ in calc.inputs if column_map.get(name) not in df.columns]
+    if missing:
+        raise KeyError(f"No column mapped for: {', '.join(missing)}")
+    args = [pd.to_numeric(df[column_map[name]], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            for name, _ in calc.inputs]
+    out = df.copy(deep=False)
+    out[calc.output] = calc.func(*args)
+    return out
@@ -0,0 +1,257 @@
+"""Slope and aspect maps of DEM rasters, computed tile by tile from memory-mapped files.
+
+A DEM is a 2-D grid of elevations stored as .npy, or as a headerless raw
+binary file (.raw/.bin/.dem) described by a JSON sidecar next to it
+(dem.raw -> dem.raw.json) giving "rows", "cols" and "dtype", plus
+optionally "byteorder", "dx", "dy" and "nodata". A .npy file may have a
+sidecar too, for its spacing and nodata value.
+
+Rows are taken as running north to south. Slope uses Horn's (1981) 3x3
+finite differences, and edge cells reuse their nearest neighbours. The
+grid is processed in horizontal strips with a one-row halo above and
+below. Only a strip of input and output is in memory at once, so rasters
+larger than RAM work. Outputs are written the same way: .npy through
+np.lib.format.open_memmap, anything else as raw float32 plus a JSON
+sidecar. With workers > 1 the strips are spread over a process pool.
+Each worker opens the memory maps itself, so no pixels are pickled.
+Headless: no streamlit imports.
+"""
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+SLOPE_PERCENT = "slope_percent"
+SLOPE_DEGREES = "slope_degrees"
+ASPECT = "aspect"
+OUTPUTS = (SLOPE_PERCENT, SLOPE_DEGREES, ASPECT)
+OUTPUT_DTYPE = np.float32
+RAW_EXTENSIONS = (".raw", ".bin", ".dem")
+# Working set per strip: the float64 input window plus a few temporaries of the same size.
+TILE_BYTES = 64 * 1024 * 1024
+_TEMPORARIES = 8
+
+
+def sidecar_path(path):
+    return os.fspath(path) + ".json"
+
+
+def read_metadata(path):
+    """Contents of the JSON sidecar of `path`, or {} if there is none."""
+    try:
+        with open(sidecar_path(path), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def open_dem(path, mode="r"):
+    """(memory-mapped elevation array, metadata dict) of a .npy or sidecar-described raw DEM."""
+    meta = read_metadata(path)
+    if os.fspath(path).lower().endswith(".npy"):
+        grid = np.load(path, mmap_mode=mode)
+    else:
+        missing = [k for k in ("rows", "cols", "dtype") if k not in meta]
+        if missing:
+            raise ValueError(f"Raw DEM {path} needs a sidecar {sidecar_path(path)} with: {', '.join(missing)}")
+        dtype = np.dtype(meta["dtype"]).newbyteorder(meta.get("byteorder", "="))
+        grid = np.memmap(path, dtype=dtype, mode=mode, shape=(int(meta["rows"]), int(meta["cols"])))
+    if grid.ndim != 2:
+        raise ValueError(f"DEM must be a 2-D grid, got shape {grid.shape}")
+    return grid, meta
+
+
+def create_output(path, shape, meta=None):
+    """Writable memory-mapped float32 raster at `path` (.npy, else raw with a JSON sidecar)."""
+    if os.fspath(path).lower().endswith(".npy"):
+        return np.lib.format.open_memmap(path, mode="w+", dtype=OUTPUT_DTYPE, shape=shape)
+    out = np.memmap(path, dtype=OUTPUT_DTYPE, mode="w+", shape=shape)
+    sidecar = {**(meta or {}), "rows": shape[0], "cols": shape[1], "dtype": np.dtype(OUTPUT_DTYPE).str}
+    sidecar.pop("byteorder", None)
+    sidecar.pop("nodata", None)
+    with open(sidecar_path(path), "w", encoding="utf-8") as fh:
+        json.dump(sidecar, fh, indent=2)
+    return out
+
+
+def _open_output(path, shape):
+    if os.fspath(path).lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r+")
+    return np.memmap(path, dtype=OUTPUT_DTYPE, mode="r+", shape=shape)
+
+
+# --- KERNEL ---
+
+def horn_gradient(window, dx, dy):
+    """dz/dx (east) and dz/dy (south) of the interior of `window` (one-cell border), Horn's 3x3 weights."""
+    a, b, c = window[:-2, :-2], window[:-2, 1:-1], window[:-2, 2:]
+    d, f = window[1:-1, :-2], window[1:-1, 2:]
+    g, h, i = window[2:, :-2], window[2:, 1:-1], window[2:, 2:]
+    dz_dx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * dx)
+    dz_dy = ((g + 2 * h + i) - (a + 2 * b + c)) / (8 * dy)
+    return dz_dx, dz_dy
+
+
+def slope_aspect(window, dx, dy, outputs=OUTPUTS):
+    """Requested outputs for the interior of a padded window: slope in %/degrees, aspect in degrees from north.
+
+    Aspect is the downslope direction, clockwise from north; it is NaN on flat cells.
+    """
+    dz_dx, dz_dy = horn_gradient(window, dx, dy)
+    rise = np.hypot(dz_dx, dz_dy)
+    result = {}
+    if SLOPE_PERCENT in outputs:
+        result[SLOPE_PERCENT] = rise * 100
+    if SLOPE_DEGREES in outputs:
+        result[SLOPE_DEGREES] = np.degrees(np.arctan(rise))
+    if ASPECT in outputs:
+        # Downslope is -gradient: east component -dz/dx, north component +dz/dy (rows run south).
+        aspect = np.mod(np.degrees(np.arctan2(-dz_dx, dz_dy)), 360)
+        result[ASPECT] = np.where(rise > 0, aspect, np.nan)
+    return result
+
+
+def padded_window(grid, start, stop, nodata=None):
+    """Rows start..stop of `grid` as float64 with a one-cell border (edge cells repeated); nodata -> NaN."""
+    rows = grid.shape[0]
+    lo, hi = max(start - 1, 0), min(stop + 1, rows)
+    # Always a copy: nodata is masked in place, and `grid` may be a read-only memmap or the caller's array.
+    block = np.array(grid[lo:hi], dtype=np.float64, copy=True)
+    if nodata is not None:
+        block[block == nodata] = np.nan
+    top = 1 if start == 0 else 0
+    bottom = 1 if stop == rows else 0
+    return np.pad(block, ((top, bottom), (1, 1)), mode="edge")
+
+
+def whole_array(grid, dx, dy, nodata=None, outputs=OUTPUTS):
+    """Reference in-memory computation (the whole grid at once); used by the benchmark and for small grids."""
+    return slope_aspect(padded_window(grid, 0, grid.shape[0], nodata), dx, dy, outputs)
+
+
+# --- TILED DRIVER ---
+
+def tile_rows_for(cols, tile_bytes=TILE_BYTES):
+    """Strip height so one strip's working set stays near `tile_bytes`."""
+    return max(1, int(tile_bytes // (max(cols, 1) * 8 * _TEMPORARIES)))
+
+
+def strips(rows, tile_rows):
+    return [(start, min(start + tile_rows, rows)) for start in range(0, rows, tile_rows)]
+
+
+def _process_strip(src, destinations, start, stop, dx, dy, nodata):
+    """Computes one strip and writes it to the output memmaps; returns per-output (sum, count, min, max)."""
+    grid, _ = open_dem(src)
+    result = slope_aspect(padded_window(grid, start, stop, nodata), dx, dy, tuple(destinations))
+    stats = {}
+    for name, path in destinations.items():
+        values = result[name]
+        out = _open_output(path, grid.shape)
+        out[start:stop] = values
+        out.flush()
+        finite = values[np.isfinite(values)]
+        stats[name] = (float(finite.sum()), len(finite),
+                       float(finite.min()) if len(finite) else np.inf, float(finite.max()) if len(finite) else -np.inf)
+    return stop - start, stats
+
+
+def process_dem(src, destinations, dx=None, dy=None, nodata=None, tile_rows=None, workers=1, on_progress=None,
+                executor=None):
+    """Writes slope/aspect rasters for the DEM at `src`, strip by strip.
+
+    `destinations` maps output names (OUTPUTS) to file paths. Spacing and
+    nodata default to the DEM's sidecar (dx=dy=1 if absent). Strips run on
+    `executor` when given (e.g. a shared JobRunner pool), otherwise on a
+    pool of `workers` processes; either way at most `workers` strips are
+    queued at once. `on_progress(fraction)` is called as strips finish;
+    raise from it to stop. Returns a summary dict: shape, spacing, strip count, seconds,
+    cells per second and per-output mean/min/max.
+    """
+    unknown = set(destinations) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown outputs: {', '.join(sorted(unknown))}")
+    grid, meta = open_dem(src)
+    dx = float(dx or meta.get("dx", 1.0))
+    dy = float(dy or meta.get("dy", dx))
+    nodata = nodata if nodata is not None else meta.get("nodata")
+    if dx <= 0 or dy <= 0:
+        raise ValueError("Grid spacing must be positive.")
+    rows, cols = grid.shape
+    del grid
+    out_meta = {"dx": dx, "dy": dy}
+    for path in destinations.values():
+        create_output(path, (rows, cols), out_meta).flush()
+
+    tiles = strips(rows, tile_rows or tile_rows_for(cols))
+    totals = {name: [0.0, 0, np.inf, -np.inf] for name in destinations}
+    done_rows = 0
+
+    def collect(result):
+        nonlocal done_rows
+        n, stats = result
+        done_rows += n
+        for name, (total, count, low, high) in stats.items():
+            acc = totals[name]
+            acc[0] += total
+            acc[1] += count
+            acc[2] = min(acc[2], low)
+            acc[3] = max(acc[3], high)
+        if on_progress:
+            on_progress(done_rows / rows)
+
+    def run_on(pool):
+        pending = set()
+        queue = iter(tiles)
+        try:
+            while True:
+                for start, stop in queue:
+                    pending.add(pool.submit(_process_strip, src, destinations, start, stop, dx, dy, nodata))
+                    if len(pending) >= workers:
+                        break
+                if not pending:
+                    return
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(future.result())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    workers = max(1, workers)
+    started = time.perf_counter()
+    if executor is not None:
+        run_on(executor)
+    elif workers <= 1 or len(tiles) <= 1:
+        for start, stop in tiles:
+            collect(_process_strip(src, destinations, start, stop, dx, dy, nodata))
+    else:
+        import multiprocessing
+        import batch_analysis
+
+        context = multiprocessing.get_context(batch_analysis.START_METHOD)
+        with ProcessPoolExecutor(max_workers=min(workers, len(tiles)), mp_context=context) as pool:
+            run_on(pool)
+    seconds = time.perf_counter() - started
+
+    return {
+        "shape": (rows, cols),
+        "dx": dx,
+        "dy": dy,
+        "strips": len(tiles),
+        "seconds": seconds,
+        "cells_per_second": rows * cols / seconds if seconds else float("inf"),
+        "stats": {name: {"mean": acc[0] / acc[1] if acc[1] else np.nan,
+                         "min": acc[2] if acc[1] else np.nan, "max": acc[3] if acc[1] else np.nan}
+                  for name, acc in totals.items()},
+    }
+
+
+def preview(path, max_size=800):
+    """Strided (every k-th cell) float32 copy of a raster for display, at most `max_size` cells per side."""
+    grid, _ = open_dem(path)
+    step = max(1, int(np.ceil(max(grid.shape) / max_size)))
+    return np.asarray(grid[::step, ::step], dtype=np.float32)
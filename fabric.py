@@ -0,0 +1,237 @@
+"""Fabric statistics of planes and lines, accumulated chunk by chunk.
+
+For every group of measurements FabricAccumulator keeps only the count,
+the sum of unit vectors and the sum of their outer products (the
+unnormalized orientation tensor), so files of millions of rows stream
+through in constant memory, and all groups come out of a single pass.
+Orientations are axial (a line and its reverse are the same measurement),
+so before summing, each vector is flipped into the hemisphere of its
+group's reference axis: the principal axis of the first chunk the group
+appears in. Otherwise near-horizontal lines would cancel in the Fisher sums.
+results() then derives, per group:
+
+- the orientation (Woodcock, 1977) tensor eigenvalues S1 >= S2 >= S3 and
+  eigenvectors V1-V3 as trend/plunge, with Woodcock's shape K and
+  strength C;
+- the Fisher (1953) mean direction, resultant length, concentration
+  kappa and cone of confidence alpha.
+
+Planes (strike/dip, right-hand rule) are analysed through their poles,
+lines as trend/plunge, both in degrees, following stereonet.py.
+Headless: no streamlit/matplotlib imports.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+import stereonet
+
+PLANES = "planes"
+LINES = "lines"
+ORIENTATION_COLUMNS = {PLANES: ("strike", "dip"), LINES: ("trend", "plunge")}
+ALL = "All"
+DEFAULT_CHUNKSIZE = 500_000
+DEFAULT_CONFIDENCE = 0.95
+
+# Upper triangle of the 3x3 tensor, accumulated as six weighted bincounts.
+_PAIRS = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
+
+
+def to_trend_plunge(vectors):
+    """Trend/plunge in degrees of (n, 3) north/east/down vectors, flipped onto the lower hemisphere."""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    vectors = np.where(vectors[:, 2:3] < 0, -vectors, vectors)
+    norm = np.linalg.norm(vectors, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        plunge = np.rad2deg(np.arcsin(np.clip(vectors[:, 2] / norm, -1, 1)))
+    trend = np.mod(np.rad2deg(np.arctan2(vectors[:, 1], vectors[:, 0])), 360)
+    return trend, plunge
+
+
+class FabricAccumulator:
+    """Running per-group vector and orientation-tensor sums; feed it with update_lines()/update_planes()."""
+
+    def __init__(self):
+        self.labels = []
+        self._index = {}
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.vector_sums = np.zeros((0, 3))
+        self.tensor_sums = np.zeros((0, 3, 3))
+        # Per-group reference axis for the signs of summed vectors; NaN until the group has data.
+        self.references = np.zeros((0, 3))
+        self.dropped_rows = 0
+
+    def _group_codes(self, groups, n):
+        """Global group index per row; -1 for a missing group value."""
+        if groups is None:
+            local, uniques = np.zeros(n, dtype=np.int64), [ALL]
+        else:
+            local, uniques = pd.factorize(pd.Series(groups, copy=False), use_na_sentinel=True)
+        for label in uniques:
+            if label not in self._index:
+                self._index[label] = len(self.labels)
+                self.labels.append(label)
+        grow = len(self.labels) - len(self.counts)
+        if grow:
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+            self.vector_sums = np.concatenate([self.vector_sums, np.zeros((grow, 3))])
+            self.tensor_sums = np.concatenate([self.tensor_sums, np.zeros((grow, 3, 3))])
+            self.references = np.concatenate([self.references, np.full((grow, 3), np.nan)])
+        mapping = np.array([self._index[label] for label in uniques], dtype=np.int64)
+        return np.where(local >= 0, mapping[np.maximum(local, 0)] if len(mapping) else -1, -1)
+
+    def update_lines(self, trend, plunge, groups=None):
+        """Adds lines (trend/plunge in degrees); rows with missing or out-of-range angles are counted as dropped."""
+        trend = np.asarray(trend, dtype=np.float64)
+        plunge = np.asarray(plunge, dtype=np.float64)
+        codes = self._group_codes(groups, len(trend))
+        valid = np.isfinite(trend) & np.isfinite(plunge) & (plunge >= 0) & (plunge <= 90) & (codes >= 0)
+        self.dropped_rows += int(len(valid) - valid.sum())
+        g = codes[valid]
+        v = stereonet.to_vectors(trend[valid], plunge[valid])
+        size = len(self.labels)
+        counts = np.bincount(g, minlength=size)
+        tensor = np.zeros((size, 3, 3))
+        for i, j in _PAIRS:
+            tensor[:, i, j] = tensor[:, j, i] = np.bincount(g, weights=v[:, i] * v[:, j], minlength=size)
+        new = np.flatnonzero((counts > 0) & np.isnan(self.references[:, 0]))
+        if len(new):
+            axes = np.linalg.eigh(tensor[new])[1][:, :, -1]
+            self.references[new] = np.where(axes[:, 2:3] < 0, -axes, axes)
+        flip = np.einsum("ij,ij->i", v, self.references[g]) < 0
+        v = np.where(flip[:, None], -v, v)
+        self.counts += counts
+        self.tensor_sums += tensor
+        for i in range(3):
+            self.vector_sums[:, i] += np.bincount(g, weights=v[:, i], minlength=size)
+        return self
+
+    def update_planes(self, strike, dip, groups=None):
+        """Adds planes (strike/dip in degrees, right-hand rule) through their poles."""
+        dip = np.asarray(dip, dtype=np.float64)
+        # poles() would map an out-of-range dip to a valid-looking plunge.
+        dip = np.where((dip >= 0) & (dip <= 90), dip, np.nan)
+        pole_trend, pole_plunge = stereonet.poles(strike, dip)
+        return self.update_lines(pole_trend, pole_plunge, groups)
+
+    def update(self, kind, azimuth, inclination, groups=None):
+        """update_planes() or update_lines() depending on `kind`."""
+        if kind == PLANES:
+            return self.update_planes(azimuth, inclination, groups)
+        if kind == LINES:
+            return self.update_lines(azimuth, inclination, groups)
+        raise ValueError(f"Unknown measurement kind: {kind!r}")
+
+    def merge(self, other):
+        """Folds another accumulator (e.g. from another file or worker) into this one."""
+        codes = self._group_codes(pd.Series(other.labels, dtype=object), len(other.labels))
+        unset = np.isnan(self.references[codes, 0])
+        self.references[codes[unset]] = other.references[unset]
+        # The other accumulator's sums follow its own reference axes; align them with ours.
+        flip = np.einsum("ij,ij->i", self.references[codes], other.references) < 0
+        np.add.at(self.counts, codes, other.counts)
+        np.add.at(self.vector_sums, codes, np.where(flip[:, None], -other.vector_sums, other.vector_sums))
+        np.add.at(self.tensor_sums, codes, other.tensor_sums)
+        self.dropped_rows += other.dropped_rows
+        return self
+
+    def results(self, confidence=DEFAULT_CONFIDENCE):
+        """One row of tensor and Fisher statistics per group (groups in first-seen order)."""
+        return fabric_statistics(self.counts, self.vector_sums, self.tensor_sums, self.labels, confidence)
+
+
+def fabric_statistics(counts, vector_sums, tensor_sums, labels=None, confidence=DEFAULT_CONFIDENCE):
+    """Tensor eigen-analysis and Fisher statistics from per-group sums (see FabricAccumulator)."""
+    counts = np.asarray(counts, dtype=np.float64)
+    size = len(counts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tensor = np.nan_to_num(tensor_sums / counts[:, None, None])
+    # eigh returns ascending eigenvalues; reverse to S1 >= S2 >= S3.
+    values, vectors = np.linalg.eigh(tensor)
+    values, vectors = values[:, ::-1], vectors[:, :, ::-1]
+    table = {"n": counts.astype(np.int64)}
+    for i in range(3):
+        table[f"S{i + 1}"] = values[:, i]
+    for i in range(3):
+        trend, plunge = to_trend_plunge(vectors[:, :, i])
+        table[f"V{i + 1} Trend"] = trend
+        table[f"V{i + 1} Plunge"] = plunge
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s1, s2, s3 = (np.clip(values[:, i], 1e-12, None) for i in range(3))
+        table["Woodcock K"] = np.log(s1 / s2) / np.log(s2 / s3)
+        table["Woodcock C"] = np.log(s1 / s3)
+
+        resultant = np.linalg.norm(vector_sums, axis=1)
+        mean_trend, mean_plunge = to_trend_plunge(vector_sums)
+        table["Mean Trend"] = mean_trend
+        table["Mean Plunge"] = mean_plunge
+        table["R"] = resultant
+        table["R/n"] = resultant / counts
+        # Fisher (1953) estimates; undefined for fewer than two measurements.
+        kappa = (counts - 1) / (counts - resultant)
+        cos_alpha = 1 - (counts - resultant) / resultant * ((1 / (1 - confidence)) ** (1 / (counts - 1)) - 1)
+        alpha = np.rad2deg(np.arccos(np.clip(cos_alpha, -1, 1)))
+    few = counts < 2
+    kappa[few] = np.nan
+    alpha[few] = np.nan
+    table["Kappa"] = kappa
+    table[f"Alpha{round(confidence * 100)}"] = alpha
+
+    index = pd.Index(labels if labels is not None else range(size), name="Group")
+    result = pd.DataFrame(table, index=index)
+    empty = counts == 0
+    result.loc[empty, result.columns[1:]] = np.nan
+    return result
+
+
+def find_columns(header, kind, group_col=None):
+    """Raw header names of the azimuth/inclination columns for `kind` (case-insensitive) and the group column."""
+    lookup = {str(c).strip().lower(): c for c in header}
+    wanted = ORIENTATION_COLUMNS[kind]
+    missing = [name for name in wanted if name not in lookup]
+    if missing:
+        raise KeyError(f"Missing {kind} columns: {', '.join(missing)}")
+    columns = [lookup[name] for name in wanted]
+    if group_col is not None:
+        if str(group_col).strip().lower() not in lookup:
+            raise KeyError(f"Missing group column: {group_col}")
+        columns.append(lookup[str(group_col).strip().lower()])
+    return columns
+
+
+def iter_orientation_chunks(source, kind, fmt="csv", group_col=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Yields (azimuth, inclination, groups or None) arrays from a table read `chunksize` rows at a time."""
+    import table_io
+
+    if fmt == table_io.CSV:
+        names = None
+        if hasattr(source, "seekable") and not source.seekable():
+            # Pipes (stdin) cannot be rewound: parse the header line ourselves.
+            first = source.readline()
+            header = pd.read_csv(io.BytesIO(first) if isinstance(first, bytes) else io.StringIO(first), nrows=0).columns
+            names = list(header)
+        else:
+            header = pd.read_csv(source, nrows=0).columns
+            if hasattr(source, "seek"):
+                source.seek(0)
+        columns = find_columns(header, kind, group_col)
+        dtype = {columns[2]: str} if group_col is not None else None
+        chunks = pd.read_csv(source, usecols=columns, dtype=dtype, chunksize=chunksize,
+                             header=None if names else "infer", names=names)
+    else:
+        columns = find_columns(table_io.schema_names(source, fmt), kind, group_col)
+        chunks = table_io.iter_table_chunks(source, fmt, chunksize, columns=columns)
+    for chunk in chunks:
+        azimuth = pd.to_numeric(chunk[columns[0]], errors="coerce").to_numpy(dtype=np.float64)
+        inclination = pd.to_numeric(chunk[columns[1]], errors="coerce").to_numpy(dtype=np.float64)
+        yield azimuth, inclination, chunk[columns[2]] if group_col is not None else None
+
+
+def stream_fabric(source, kind, fmt="csv", group_col=None, chunksize=DEFAULT_CHUNKSIZE, accumulator=None):
+    """Accumulates a whole table chunk by chunk; returns the FabricAccumulator (call .results() for the table)."""
+    accumulator = accumulator if accumulator is not None else FabricAccumulator()
+    for azimuth, inclination, groups in iter_orientation_chunks(source, kind, fmt, group_col, chunksize):
+        accumulator.update(kind, azimuth, inclination, groups)
+    return accumulator
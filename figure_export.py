@@ -0,0 +1,85 @@
+"""On-demand export of Matplotlib figures to PNG, SVG or PDF bytes.
+
+Exports are rendered only when a download is requested (Streamlit calls
+the download button's data callable on a worker thread) and are meant to
+be cached per plot parameters, e.g. as ResultCache artifacts of the
+figure. A Matplotlib figure is not thread-safe, so renders of the same
+figure are serialized; different figures render concurrently.
+Headless: the figure is passed in, no streamlit imports.
+"""
+import hashlib
+import io
+import os
+import threading
+import weakref
+
+FORMATS = {
+    "png": {"label": "PNG", "extension": ".png", "mime": "image/png"},
+    "svg": {"label": "SVG", "extension": ".svg", "mime": "image/svg+xml"},
+    "pdf": {"label": "PDF", "extension": ".pdf", "mime": "application/pdf"},
+}
+# Only raster formats depend on resolution.
+RASTER_FORMATS = ("png",)
+DPI_CHOICES = (100, 150, 300, 600)
+DEFAULT_DPI = 300
+# Same as st.pyplot's default.
+DISPLAY_DPI = 200
+
+CACHE_MAX_BYTES = int(os.environ.get("GEOLAB_FIGURE_CACHE_MB", "128")) * 1024 * 1024
+# figure_nbytes(): fixed cost of a Figure (axes, ticks, text) and per-path object overhead.
+FIGURE_BASE_BYTES = 256 * 1024
+PATH_OVERHEAD_BYTES = 512
+
+_locks = weakref.WeakKeyDictionary()
+_locks_guard = threading.Lock()
+
+
+def figure_key(*params):
+    """Stable hex digest of the parameters a figure was built from."""
+    return hashlib.blake2b(repr(params).encode("utf-8"), digest_size=20).hexdigest()
+
+
+def export_name(fmt, dpi):
+    """Cache artifact name for an export; vector formats ignore `dpi`."""
+    return ("export", fmt, dpi if fmt in RASTER_FORMATS else None)
+
+
+def figure_nbytes(fig):
+    """Approximate memory held by a live Figure, from the data of its lines, collections and images.
+
+    Used as its cache size (rendered exports are measured exactly).
+    """
+    from matplotlib.collections import Collection
+    from matplotlib.image import AxesImage
+    from matplotlib.lines import Line2D
+
+    total = FIGURE_BASE_BYTES
+    for artist in fig.findobj():
+        if isinstance(artist, Line2D):
+            total += artist.get_xydata().nbytes
+        elif isinstance(artist, Collection):
+            paths = artist.get_paths()
+            total += sum(path.vertices.nbytes for path in paths) + PATH_OVERHEAD_BYTES * len(paths)
+            total += artist.get_offsets().nbytes
+        elif isinstance(artist, AxesImage):
+            array = artist.get_array()
+            total += array.nbytes if array is not None else 0
+    return int(total)
+
+
+def _figure_lock(fig):
+    with _locks_guard:
+        lock = _locks.get(fig)
+        if lock is None:
+            lock = _locks[fig] = threading.Lock()
+        return lock
+
+
+def render(fig, fmt="png", dpi=DEFAULT_DPI):
+    """Encodes `fig` as `fmt` bytes at `dpi` (PNG only)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown figure format: {fmt!r}")
+    buf = io.BytesIO()
+    with _figure_lock(fig):
+        fig.savefig(buf, format=fmt, bbox_inches="tight", dpi=dpi if fmt in RASTER_FORMATS else "figure")
+    return buf.getvalue()
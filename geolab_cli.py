@@ -0,0 +1,390 @@
+"""Command-line batch runner for the GeoLab Pro calculations (no Streamlit needed).
+
+Examples:
+    python geolab_cli.py qfl wells/ -o results.parquet --summary per_well.csv --jobs 16
+    cat counts.csv | python geolab_cli.py qfl - --stream > results.csv
+    python geolab_cli.py provenance wells/ --jobs 8
+    python geolab_cli.py calc true_dip dips.csv --map apparent_dip=app_dip -o out.csv
+    python geolab_cli.py grain-size sieves.csv --sample-col Sample --unit mm
+    python geolab_cli.py fabric bedding.csv --kind planes --group-col Well
+    python geolab_cli.py slope dem.npy --dx 30 --slope slope.npy --aspect aspect.npy --jobs 8
+    python geolab_cli.py report wells/ --group-col Well -o reports.zip --jobs 8
+
+Inputs are files, directories (searched recursively for CSV/Parquet/Arrow
+tables and .zip archives; .txt files only count when named explicitly, and
+the command's own output files are skipped) or "-" for stdin. Output goes to -o (format from
+its extension, or --format) or to stdout when -o is omitted or "-".
+Several input files are processed in parallel with --jobs worker processes.
+"""
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import table_io
+
+STDIO = "-"
+# Extensions picked up when scanning a directory; .txt is too often a README or log.
+SCAN_EXTENSIONS = {ext for ext in table_io.EXTENSIONS if ext != ".txt"} | {".zip"}
+
+
+# --- INPUT / OUTPUT ---
+
+def output_paths(args):
+    """Files this command writes (-o, --summary), so directory scans never read them back as inputs."""
+    paths = [getattr(args, name, None) for name in ("output", "summary")]
+    return [path for path in paths if path and path != STDIO]
+
+
+def collect_inputs(paths, exclude=()):
+    """Expands directories into the table files and zip archives they contain (sorted), skipping `exclude`."""
+    excluded = {os.path.realpath(path) for path in exclude}
+    for path in paths:
+        if path != STDIO and os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    if (os.path.splitext(name)[1].lower() in SCAN_EXTENSIONS and not name.startswith(".")
+                            and os.path.realpath(full) not in excluded):
+                        yield full
+        else:
+            yield path
+
+
+def read_sources(paths, input_format, exclude=()):
+    """(name, bytes) for each input; stdin is named after `input_format` so its format is detected."""
+    for path in collect_inputs(paths, exclude):
+        if path == STDIO:
+            yield "<stdin>" + table_io.FORMATS[input_format]["extension"], sys.stdin.buffer.read()
+        else:
+            with open(path, "rb") as fh:
+                yield path, fh.read()
+
+
+def output_format(args):
+    if args.format:
+        return args.format
+    if args.output and args.output != STDIO:
+        return table_io.detect_format(args.output)
+    return table_io.CSV
+
+
+def open_output(args):
+    """Path or stdout handle to write to (text for CSV, binary otherwise)."""
+    if args.output and args.output != STDIO:
+        return args.output
+    return sys.stdout if output_format(args) == table_io.CSV else sys.stdout.buffer
+
+
+def write_output(df, args, dest=None):
+    fmt = table_io.detect_format(dest) if dest else output_format(args)
+    dest = dest or open_output(args)
+    if isinstance(dest, str):
+        with open(dest, "wb") as fh:
+            fh.write(table_io.write_table(df, fmt))
+    elif fmt == table_io.CSV:
+        df.to_csv(dest, index=False)
+    else:
+        dest.write(table_io.write_table(df, fmt))
+        dest.flush()
+
+
+def map_files(func, sources, jobs, *args):
+    """Applies func(name, data, *args) to every source, in a process pool when jobs > 1; keeps input order."""
+    if jobs <= 1 or len(sources) <= 1:
+        return [func(name, data, *args) for name, data in sources]
+    import multiprocessing
+    import batch_analysis
+
+    context = multiprocessing.get_context(batch_analysis.START_METHOD)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(sources)), mp_context=context) as pool:
+        futures = [pool.submit(func, name, data, *args) for name, data in sources]
+        return [f.result() for f in futures]
+
+
+def report_errors(summary):
+    failed = summary[summary["Error"].notna()]
+    for source, error in zip(failed["Source"], failed["Error"]):
+        print(f"{source}: {error}", file=sys.stderr)
+    return 1 if len(failed) else 0
+
+
+# --- COMMANDS ---
+
+def run_qfl(args):
+    if args.stream:
+        return stream_qfl(args)
+    import batch_analysis
+
+    sources = read_sources(args.inputs, args.input_format, output_paths(args))
+    summary, combined = batch_analysis.analyze_files(sources, args.input_type, max_workers=args.jobs)
+    write_output(combined, args)
+    if args.summary:
+        write_output(summary, args, dest=args.summary)
+    if not len(summary):
+        print("No input tables found.", file=sys.stderr)
+        return 1
+    return report_errors(summary)
+
+
+def stream_qfl(args):
+    """Single input processed chunk by chunk: memory stays bounded however long stdin is."""
+    import provenance
+    import qfl_engine
+
+    inputs = list(collect_inputs(args.inputs, output_paths(args)))
+    if len(inputs) != 1:
+        raise SystemExit("--stream takes exactly one input file or '-'.")
+    path = inputs[0]
+    fmt = args.input_format if path == STDIO else table_io.detect_format(path)
+    source = sys.stdin.buffer if path == STDIO else path
+
+    with table_io.ChunkWriter(open_output(args), output_format(args)) as writer:
+        def write_chunk(frame):
+            frame["Provenance"] = provenance.classify_frame(frame)
+            writer.write(frame)
+        summary = qfl_engine.stream_table(source, args.input_type, fmt, chunksize=args.chunksize, on_chunk=write_chunk)
+    print(f"{summary.rows:,} samples, {summary.dropped_rows:,} dropped, average MIA {summary.average_mia:.2f}%",
+          file=sys.stderr)
+    return 0
+
+
+def run_provenance(args):
+    import batch_analysis
+    import provenance
+
+    sources = read_sources(args.inputs, args.input_format, output_paths(args))
+    summary, combined = batch_analysis.analyze_files(sources, args.input_type, max_workers=args.jobs)
+    if not len(combined):
+        print("No samples to classify.", file=sys.stderr)
+        return report_errors(summary) or 1
+    table = provenance.field_summary(combined["Provenance"]).reset_index()
+    if args.per_file:
+        columns = ["Source"] + [c for c in summary.columns if c.startswith("Provenance ")] + ["Dominant Provenance"]
+        table = summary[columns]
+    write_output(table, args)
+    return report_errors(summary)
+
+
+def _calc_file(name, data, calc_id, column_map):
+    import calculators
+
+    df = table_io.read_table(io.BytesIO(data), filename=name)
+    # Explicit --map entries override the header guesses for the other inputs.
+    column_map = {**calculators.guess_columns(calc_id, df.columns), **column_map}
+    out = calculators.run_batch(calc_id, df, column_map)
+    out.insert(0, "Source", name)
+    return out
+
+
+def run_calc(args):
+    column_map = parse_column_map(args.map)
+    sources = list(read_sources(args.inputs, args.input_format, output_paths(args)))
+    frames = map_files(_calc_file, sources, args.jobs, args.calculator, column_map)
+    write_output(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(), args)
+    return 0
+
+
+def _grain_size_file(name, data, sample_col, unit, size_cols=None):
+    import grain_size
+
+    df = table_io.read_table(io.BytesIO(data), filename=name)
+    out = grain_size.distribution_statistics(df, sample_col=sample_col, unit=unit, sizes=size_cols)
+    out.insert(0, "Source", name)
+    return out
+
+
+def run_grain_size(args):
+    sources = list(read_sources(args.inputs, args.input_format, output_paths(args)))
+    frames = map_files(_grain_size_file, sources, args.jobs, args.sample_col, args.unit, args.size_col)
+    write_output(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(), args)
+    return 0
+
+
+def run_fabric(args):
+    """One streaming pass over every input; memory stays constant however many measurements there are."""
+    import batch_analysis
+    import fabric
+
+    accumulator = fabric.FabricAccumulator()
+    for path in collect_inputs(args.inputs, output_paths(args)):
+        if path == STDIO:
+            sources = [(sys.stdin.buffer, args.input_format)]
+        elif path.lower().endswith(".zip"):
+            sources = [(io.BytesIO(data), table_io.detect_format(name)) for name, data in batch_analysis.iter_sources([path])]
+        else:
+            sources = [(path, table_io.detect_format(path))]
+        for source, fmt in sources:
+            fabric.stream_fabric(source, args.kind, fmt, args.group_col, args.chunksize, accumulator)
+    write_output(accumulator.results(args.confidence).reset_index(), args)
+    if accumulator.dropped_rows:
+        print(f"{accumulator.dropped_rows:,} rows with missing or out-of-range angles skipped.", file=sys.stderr)
+    return 0
+
+
+def run_slope(args):
+    """Tiled, memory-mapped slope/aspect rasters; the DEM is never loaded whole."""
+    import dem_slope
+
+    destinations = {}
+    if args.slope:
+        destinations[dem_slope.SLOPE_PERCENT if args.unit == "percent" else dem_slope.SLOPE_DEGREES] = args.slope
+    if args.aspect:
+        destinations[dem_slope.ASPECT] = args.aspect
+    if not destinations:
+        raise SystemExit("Nothing to write: give --slope and/or --aspect.")
+    tile_rows = None
+    if args.tile_mb:
+        tile_rows = dem_slope.tile_rows_for(dem_slope.open_dem(args.dem)[0].shape[1], int(args.tile_mb * 2 ** 20))
+    info = dem_slope.process_dem(args.dem, destinations, dx=args.dx, dy=args.dy, nodata=args.nodata,
+                                 tile_rows=tile_rows, workers=args.jobs)
+    rows, cols = info["shape"]
+    print(f"{rows:,} x {cols:,} cells in {info['strips']} strips, {info['seconds']:.2f} s "
+          f"({info['cells_per_second'] / 1e6:.1f} Mcells/s)", file=sys.stderr)
+    for name, stats in info["stats"].items():
+        print(f"{name}: mean {stats['mean']:.2f}, min {stats['min']:.2f}, max {stats['max']:.2f}", file=sys.stderr)
+    return 0
+
+
+def run_report(args):
+    """Per-group report archive; groups are rendered by --jobs worker processes and written as they finish."""
+    import batch_analysis
+    import grouping
+    import report_export
+
+    if not args.output or args.output == STDIO:
+        raise SystemExit("report needs an output file: -o reports.zip or -o reports.pdf")
+    fmt = args.format or (report_export.PDF if args.output.lower().endswith(".pdf") else report_export.ZIP)
+    sources = read_sources(args.inputs, args.input_format, output_paths(args))
+    summary, combined = batch_analysis.analyze_files(sources, args.input_type, max_workers=args.jobs)
+    if not len(combined):
+        print("No samples to report.", file=sys.stderr)
+        return report_errors(summary) or 1
+    lookup = {str(c).strip().lower(): c for c in combined.columns}
+    column = lookup.get(args.group_col.strip().lower(), args.group_col)
+    if column not in combined.columns:
+        raise SystemExit(f"No column {args.group_col!r} to group by; available: "
+                         f"{', '.join(map(str, grouping.key_columns(combined))) or 'none'}")
+    groups = grouping.summarize_groups(combined, column, args.mode, args.bin_width)
+    sample_column = lookup.get(args.sample_col.strip().lower()) if args.sample_col else None
+    info = report_export.export_reports(combined, groups, args.output, fmt=fmt, dpi=args.dpi, workers=args.jobs,
+                                        sample_column=sample_column, max_groups=args.max_groups)
+    print(f"{info['groups']:,} groups in {info['seconds']:.1f} s ({info['groups_per_second']:.1f} groups/s)",
+          file=sys.stderr)
+    return report_errors(summary)
+
+
+def parse_column_map(pairs):
+    column_map = {}
+    for pair in pairs or ():
+        name, sep, column = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"--map expects input=column, got {pair!r}")
+        column_map[name.strip()] = column.strip()
+    return column_map
+
+
+# --- ARGUMENTS ---
+
+def build_parser():
+    import calculators
+    import qfl_engine
+
+    parser = argparse.ArgumentParser(prog="geolab", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-o", "--output", help="output file (default: stdout)")
+    common.add_argument("--format", choices=list(table_io.FORMATS), help="output format (default: from -o, else csv)")
+    common.add_argument("--input-format", choices=list(table_io.FORMATS), default=table_io.CSV,
+                        help="format of stdin input (default: csv)")
+    common.add_argument("-j", "--jobs", type=int, default=1, help="worker processes for multiple inputs (default: 1)")
+
+    qfl_common = argparse.ArgumentParser(add_help=False)
+    qfl_common.add_argument("--input-type", choices=[qfl_engine.FULL_MINERAL, qfl_engine.DIRECT_QFL],
+                            default=qfl_engine.FULL_MINERAL, help="full mineral counts or direct Q/F/L values")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+    qfl = sub.add_parser("qfl", parents=[common, qfl_common], help="QFL, MIA and provenance for every sample")
+    qfl.add_argument("--summary", help="also write one summary row per input file here")
+    qfl.add_argument("--stream", action="store_true", help="process a single input in chunks (bounded memory)")
+    qfl.add_argument("--chunksize", type=int, default=qfl_engine.DEFAULT_CHUNKSIZE, help="rows per chunk with --stream")
+    qfl.add_argument("inputs", nargs="+", help="files, directories or '-' for stdin")
+    qfl.set_defaults(func=run_qfl)
+
+    prov = sub.add_parser("provenance", parents=[common, qfl_common], help="Dickinson provenance field counts")
+    prov.add_argument("--per-file", action="store_true", help="one row per input file instead of totals")
+    prov.add_argument("inputs", nargs="+", help="files, directories or '-' for stdin")
+    prov.set_defaults(func=run_provenance)
+
+    calc = sub.add_parser("calc", parents=[common], help="scalar calculators applied to every row")
+    calc.add_argument("calculator", choices=list(calculators.CALCULATORS))
+    calc.add_argument("inputs", nargs="+", help="files, directories or '-' for stdin")
+    calc.add_argument("--map", action="append", metavar="INPUT=COLUMN",
+                      help="map a calculator input to a column (default: guessed from headers)")
+    calc.set_defaults(func=run_calc)
+
+    grain = sub.add_parser("grain-size", parents=[common], help="Folk & Ward statistics of sieve weight tables")
+    grain.add_argument("--sample-col", help="sample ID column")
+    grain.add_argument("--unit", choices=["mm", "phi"], default="mm", help="unit of the size column headers")
+    grain.add_argument("--size-col", action="append",
+                       help="sieve size column (repeatable; default: every header that is a numeric size)")
+    grain.add_argument("inputs", nargs="+", help="files, directories or '-' for stdin")
+    grain.set_defaults(func=run_grain_size)
+
+    fab = sub.add_parser("fabric", parents=[common], help="orientation tensor and Fisher statistics of planes or lines")
+    fab.add_argument("--kind", choices=["planes", "lines"], default="planes",
+                     help="strike/dip planes (analysed as poles) or trend/plunge lines")
+    fab.add_argument("--group-col", help="one result row per value of this column (default: all together)")
+    fab.add_argument("--confidence", type=float, default=0.95, help="level of the Fisher cone of confidence")
+    fab.add_argument("--chunksize", type=int, default=500_000, help="rows read at a time")
+    fab.add_argument("inputs", nargs="+", help="files, directories or '-' for stdin")
+    fab.set_defaults(func=run_fabric)
+
+    slope = sub.add_parser("slope", help="slope/aspect rasters of a DEM (.npy, or raw with a .json sidecar)")
+    slope.add_argument("dem", help="elevation grid: .npy, or .raw/.bin/.dem described by <file>.json")
+    slope.add_argument("--slope", help="slope raster to write (.npy, else raw float32 + .json sidecar)")
+    slope.add_argument("--unit", choices=["degrees", "percent"], default="degrees", help="slope unit")
+    slope.add_argument("--aspect", help="aspect raster to write (degrees clockwise from north, downslope)")
+    slope.add_argument("--dx", type=float, help="cell size east-west (default: sidecar, else 1)")
+    slope.add_argument("--dy", type=float, help="cell size north-south (default: sidecar, else dx)")
+    slope.add_argument("--nodata", type=float, help="elevation marking missing cells (default: sidecar)")
+    slope.add_argument("--tile-mb", type=float, help="approximate working memory per strip")
+    slope.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (default: 1)")
+    slope.set_defaults(func=run_slope)
+
+    report = sub.add_parser("report", parents=[qfl_common], help="per-group QFL/MIA figures and tables as a zip or PDF")
+    report.add_argument("-o", "--output", required=True, help="archive to write (.zip, or .pdf for one page per group)")
+    report.add_argument("--format", choices=["zip", "pdf"], help="archive format (default: from -o)")
+    report.add_argument("--input-format", choices=list(table_io.FORMATS), default=table_io.CSV,
+                        help="format of stdin input (default: csv)")
+    report.add_argument("--group-col", required=True, help="column that defines the groups (e.g. Well, Formation)")
+    report.add_argument("--mode", choices=["column", "prefix", "bins"], default="column",
+                        help="group by each value, by sample-ID prefix, or by fixed-width bins of a numeric column")
+    report.add_argument("--bin-width", type=float, help="bin width with --mode bins")
+    report.add_argument("--sample-col", help="sample ID column used to label MIA bars")
+    report.add_argument("--dpi", type=int, default=100, help="PNG resolution in zip archives (default: 100)")
+    report.add_argument("--max-groups", type=int, help="only the largest N groups")
+    report.add_argument("-j", "--jobs", type=int, default=1, help="worker processes (default: 1)")
+    report.add_argument("inputs", nargs="+", help="files, directories or '-' for stdin")
+    report.set_defaults(func=run_report)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (KeyError, ValueError, ImportError, OSError) as e:
+        # str() of a KeyError is the repr of its message; show the message itself.
+        message = e.args[0] if isinstance(e, KeyError) and e.args else e
+        print(f"geolab: error: {message}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Grain-size distribution statistics (Folk & Ward, 1957) for many samples at once.
+
+Input is a weight table with one row per sample and one column per sieve
+(or laser-diffraction class). Cumulative curves, percentiles and the
+graphic measures are all computed as 2-D array operations over
+(samples x classes), so cost grows linearly with the number of samples.
+Headless: no streamlit imports.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from calculators import mm_to_phi
+
+PERCENTILES = (5, 16, 25, 50, 75, 84, 95)
+PAN_COLUMN = "pan"
+# The whole header must be a number with at most a unit: '0.25', '0.25 mm', '2φ', '-1 phi'.
+SIZE_HEADER = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(?:mm|phi|φ|ϕ)?\s*$", re.IGNORECASE)
+
+SORTING_CLASSES = ([0.35, 0.50, 0.71, 1.0, 2.0, 4.0],
+                   ["Very well sorted", "Well sorted", "Moderately well sorted", "Moderately sorted",
+                    "Poorly sorted", "Very poorly sorted", "Extremely poorly sorted"])
+SKEWNESS_CLASSES = ([-0.3, -0.1, 0.1, 0.3],
+                    ["Very coarse skewed", "Coarse skewed", "Near symmetrical", "Fine skewed", "Very fine skewed"])
+KURTOSIS_CLASSES = ([0.67, 0.90, 1.11, 1.50, 3.0],
+                    ["Very platykurtic", "Platykurtic", "Mesokurtic", "Leptokurtic",
+                     "Very leptokurtic", "Extremely leptokurtic"])
+# Wentworth classes by mean phi (upper bounds).
+SIZE_CLASSES = ([-1, 0, 1, 2, 3, 4, 8],
+                ["Gravel", "Very coarse sand", "Coarse sand", "Medium sand", "Fine sand", "Very fine sand",
+                 "Silt", "Clay"])
+
+
+def parse_size(label):
+    """Numeric sieve size from a column header such as '0.25', '0.25 mm' or '2φ' (None for 'Well_1' etc.)."""
+    match = SIZE_HEADER.match(str(label))
+    return float(match.group(1)) if match else None
+
+
+def size_columns(df, exclude=(), sizes=None):
+    """Sieve-size columns of `df` (`sizes`, else every header that parses as a size) plus the pan column if present."""
+    if sizes is None:
+        sizes = [c for c in df.columns if c not in exclude and parse_size(c) is not None]
+    else:
+        unknown = [c for c in sizes if c not in df.columns]
+        if unknown:
+            raise ValueError(f"Unknown size columns: {', '.join(map(str, unknown))}")
+        unparsed = [c for c in sizes if parse_size(c) is None]
+        if unparsed:
+            raise ValueError(f"Size column headers must be numeric sizes: {', '.join(map(str, unparsed))}")
+    pan = [c for c in df.columns if str(c).strip().lower() == PAN_COLUMN]
+    return sizes, (pan[0] if pan else None)
+
+
+def from_long(df, sample_col, size_col, weight_col):
+    """Pivots a long (sample, size, weight) table into the wide layout used here."""
+    return df.pivot_table(index=sample_col, columns=size_col, values=weight_col, aggfunc="sum", fill_value=0)
+
+
+def cumulative_curves(weights, phi):
+    """Sorts classes coarse->fine and returns (phi, cumulative percent coarser) of shape (classes,), (samples, classes)."""
+    weights = np.asarray(weights, dtype=np.float64)
+    phi = np.asarray(phi, dtype=np.float64)
+    order = np.argsort(phi)
+    weights = np.nan_to_num(weights[:, order], nan=0.0)
+    totals = weights.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cumulative = np.cumsum(weights, axis=1) / totals * 100
+    return phi[order], cumulative
+
+
+def interpolate_percentiles(phi, cumulative, percentiles=PERCENTILES):
+    """Phi value at each cumulative percentage, linearly interpolated per sample.
+
+    Returns an array of shape (samples, len(percentiles)). Percentiles
+    outside the measured curve are clamped to the end classes.
+    """
+    n_samples, n_classes = cumulative.shape
+    rows = np.arange(n_samples)
+    out = np.empty((n_samples, len(percentiles)))
+    for k, p in enumerate(percentiles):
+        # First class whose cumulative percentage reaches p.
+        hi = np.clip(np.count_nonzero(cumulative < p, axis=1), 0, n_classes - 1)
+        lo = np.clip(hi - 1, 0, n_classes - 1)
+        c_lo, c_hi = cumulative[rows, lo], cumulative[rows, hi]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.where(c_hi > c_lo, (p - c_lo) / (c_hi - c_lo), 0.0)
+        out[:, k] = phi[lo] + np.clip(frac, 0, 1) * (phi[hi] - phi[lo])
+    out[~np.isfinite(cumulative[:, -1])] = np.nan
+    return out
+
+
+def folk_ward(percentile_values):
+    """Graphic mean, inclusive sorting, skewness and kurtosis from (samples, 7) phi5..phi95 values."""
+    p5, p16, p25, p50, p75, p84, p95 = np.asarray(percentile_values, dtype=np.float64).T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (p16 + p50 + p84) / 3
+        sorting = (p84 - p16) / 4 + (p95 - p5) / 6.6
+        skewness = ((p16 + p84 - 2 * p50) / (2 * (p84 - p16))
+                    + (p5 + p95 - 2 * p50) / (2 * (p95 - p5)))
+        kurtosis = (p95 - p5) / (2.44 * (p75 - p25))
+    return mean, sorting, skewness, kurtosis
+
+
+def _classify(values, classes):
+    bins, labels = classes
+    codes = np.digitize(values, bins)
+    return pd.Categorical.from_codes(np.where(np.isfinite(values), codes, -1), categories=labels)
+
+
+def distribution_statistics(df, sample_col=None, unit="mm", sizes=None):
+    """Folk & Ward statistics for every sample (row) of a wide weight table.
+
+    Size columns are `sizes`, or detected from numeric headers (mm or phi per `unit`);
+    an optional 'Pan' column is treated as the class one phi finer than the
+    finest sieve. Returns one row per sample with phi percentiles, the four
+    graphic measures and their verbal classes.
+    """
+    exclude = (sample_col,) if sample_col else ()
+    sizes, pan = size_columns(df, exclude, sizes)
+    if not sizes:
+        raise ValueError("No sieve size columns found (headers must be numeric sizes).")
+    values = np.array([parse_size(c) for c in sizes])
+    phi = mm_to_phi(values) if unit == "mm" else values
+    if np.isnan(phi).any():
+        raise ValueError("Sieve sizes must be positive when given in mm.")
+    columns = list(sizes)
+    if pan is not None:
+        phi = np.append(phi, phi.max() + 1)
+        columns.append(pan)
+
+    weights = df[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    sorted_phi, cumulative = cumulative_curves(weights, phi)
+    pct = interpolate_percentiles(sorted_phi, cumulative)
+    mean, sorting, skewness, kurtosis = folk_ward(pct)
+
+    result = pd.DataFrame(pct, columns=[f"phi{p}" for p in PERCENTILES], index=df.index)
+    if sample_col:
+        result.insert(0, sample_col, df[sample_col].to_numpy())
+    result["Mean (phi)"] = mean
+    result["Sorting"] = sorting
+    result["Skewness"] = skewness
+    result["Kurtosis"] = kurtosis
+    result["Mean Class"] = _classify(mean, SIZE_CLASSES)
+    result["Sorting Class"] = _classify(sorting, SORTING_CLASSES)
+    result["Skewness Class"] = _classify(skewness, SKEWNESS_CLASSES)
+    result["Kurtosis Class"] = _classify(kurtosis, KURTOSIS_CLASSES)
+    return result
@@ -0,0 +1,146 @@
+"""Per-group QFL/MIA summaries (by well, formation, sample prefix or depth bin).
+
+A grouping turns one key column into integer group codes: its values as
+they are (COLUMN), the part of a sample ID before its last separator or
+trailing number (PREFIX, "W1-S03" -> "W1"), or fixed-width bins of a
+numeric column (BINS, e.g. depth). aggregate() then reduces every group
+in one vectorized pass over the codes (np.bincount): sample count, Q/F/L
+totals, mean/median/std MIA, MIA category and provenance field counts,
+and the compositional mean (closed geometric mean of the rows with no
+zero component, via the mean additive log-ratios ln Q/L, ln F/L).
+Headless: no streamlit imports.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import provenance
+import qfl_engine
+
+COLUMN = "column"
+PREFIX = "prefix"
+BINS = "bins"
+MODES = (COLUMN, PREFIX, BINS)
+
+Grouping = namedtuple("Grouping", ["codes", "labels", "table"])
+
+_SEPARATORS = r"[\s_\-/.:]"
+
+
+def sample_prefix(values):
+    """Text before the last separator of each ID, or before its trailing digits when it has none."""
+    text = pd.Series(values, copy=False).astype("string").str.strip()
+    has_separator = text.str.contains(_SEPARATORS + r".*\S", regex=True)
+    before_separator = text.str.replace(_SEPARATORS + r"+[^\s_\-/.:]*$", "", regex=True)
+    before_digits = text.str.replace(r"\d+$", "", regex=True)
+    prefix = before_separator.where(has_separator, before_digits)
+    prefix = prefix.where(prefix.str.len() > 0, text)
+    return prefix.mask(prefix == "")
+
+
+def bin_labels(values, width):
+    """Fixed-width bins of a numeric column as an ordered Categorical ("1000-1010", ...)."""
+    if not width or width <= 0:
+        raise ValueError("Bin width must be positive.")
+    numbers = pd.to_numeric(pd.Series(values, copy=False), errors="coerce").to_numpy(dtype=np.float64)
+    index = np.floor(numbers / width)
+    finite = np.isfinite(index)
+    edges = np.unique(index[finite])
+    codes = np.full(len(numbers), -1, dtype=np.int64)
+    codes[finite] = np.searchsorted(edges, index[finite])
+    labels = [f"{lo * width:g}-{(lo + 1) * width:g}" for lo in edges]
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def group_codes(df, column, mode=COLUMN, bin_width=None):
+    """(codes, labels): an integer group per row (-1 where the key is missing) and the group names."""
+    if column not in df.columns:
+        raise KeyError(column)
+    if mode == COLUMN:
+        keys = pd.Categorical(df[column])
+    elif mode == PREFIX:
+        keys = pd.Categorical(sample_prefix(df[column]))
+    elif mode == BINS:
+        keys = bin_labels(df[column], bin_width)
+    else:
+        raise ValueError(f"Unknown grouping mode: {mode!r}")
+    return np.asarray(keys.codes, dtype=np.int64), pd.Index(keys.categories, name=str(column))
+
+
+def aggregate(df, codes, labels):
+    """One summary row per group of a processed frame (rows with code -1 are left out)."""
+    n = len(labels)
+    valid = codes >= 0
+    g = codes[valid]
+
+    def column(name):
+        return df[name].to_numpy(dtype=np.float64)[valid]
+
+    def group_sum(weights):
+        return np.bincount(g, weights=weights, minlength=n)
+
+    counts = np.bincount(g, minlength=n)
+    q, f, l, mia = column("Q"), column("F"), column("L"), column("MIA")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_mia = group_sum(mia) / counts
+        # Two-pass variance: the deviations stay small, unlike sum(x^2) - n*mean^2.
+        std_mia = np.sqrt(group_sum((mia - mean_mia[g]) ** 2) / (counts - 1))
+    std_mia[counts < 2] = np.nan
+    median_mia = pd.Series(mia).groupby(g).median().reindex(range(n)).to_numpy()
+
+    table = pd.DataFrame({
+        "Samples": counts,
+        "Total Q": group_sum(q),
+        "Total F": group_sum(f),
+        "Total L": group_sum(l),
+        "Mean MIA": mean_mia,
+        "Median MIA": median_mia,
+        "Std MIA": std_mia,
+    }, index=labels)
+
+    categories = len(qfl_engine.MIA_CATEGORIES)
+    histogram = np.bincount(g * categories + qfl_engine.mia_category_codes(mia), minlength=n * categories)
+    for i, name in enumerate(qfl_engine.MIA_CATEGORIES):
+        table[f"MIA {name}"] = histogram.reshape(n, categories)[:, i]
+
+    if "Provenance" in df.columns:
+        fields = pd.Categorical(df["Provenance"], categories=provenance.FIELD_NAMES).codes[valid].astype(np.int64)
+        fields = np.where(fields >= 0, fields, provenance.UNCLASSIFIED_CODE)
+        width = len(provenance.FIELD_NAMES)
+        histogram = np.bincount(g * width + fields, minlength=n * width).reshape(n, width)
+        for i, name in enumerate(provenance.FIELD_NAMES):
+            table[f"Provenance {name}"] = histogram[:, i]
+        table["Dominant Provenance"] = np.where(histogram.sum(axis=1) > 0,
+                                                np.asarray(provenance.FIELD_NAMES, dtype=object)[histogram.argmax(axis=1)],
+                                                None)
+
+    # Log-ratios are undefined for zero components; those rows are left out of the compositional mean.
+    positive = (q > 0) & (f > 0) & (l > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_l = np.log(l[positive])
+        gp = g[positive]
+        n_positive = np.bincount(gp, minlength=n)
+        alr_q = np.bincount(gp, weights=np.log(q[positive]) - log_l, minlength=n) / n_positive
+        alr_f = np.bincount(gp, weights=np.log(f[positive]) - log_l, minlength=n) / n_positive
+        e_q, e_f = np.exp(alr_q), np.exp(alr_f)
+        denom = 1 + e_q + e_f
+    table["alr Q/L"] = alr_q
+    table["alr F/L"] = alr_f
+    table["Comp. Mean Q"] = e_q / denom
+    table["Comp. Mean F"] = e_f / denom
+    table["Comp. Mean L"] = 1 / denom
+    table["Comp. Mean Samples"] = n_positive
+    return table
+
+
+def summarize_groups(df, column, mode=COLUMN, bin_width=None):
+    """Grouping(codes, labels, table) of a processed frame; cache it per (column, mode, bin_width)."""
+    codes, labels = group_codes(df, column, mode, bin_width)
+    return Grouping(codes.astype(np.int32), labels, aggregate(df, codes, labels))
+
+
+def key_columns(df):
+    """Columns of a processed frame that can serve as grouping keys (everything but the QFL inputs/results)."""
+    excluded = set(qfl_engine.RESULT_COLUMNS + qfl_engine.MINERAL_COLUMNS + qfl_engine.QFL_COLUMNS + ["Provenance"])
+    return [c for c in df.columns if c not in excluded]
@@ -0,0 +1,180 @@
+"""Lightweight timing spans for the app's slow stages.
+
+    with instrumentation.span("qfl.parse_upload", fmt="csv") as s:
+        df = read(...)
+        s.set(rows=len(df))
+
+Spans are off unless GEOLAB_METRICS=1 or a Recorder is active for the
+current script run (the sidebar debug panel). While off, span() returns a
+shared no-op context manager, so spans can stay in production code. Each
+finished span:
+  - updates a process-wide histogram, exported as Prometheus text by
+    prometheus_text() / write_prometheus() (GEOLAB_METRICS_FILE is meant
+    for node_exporter's textfile collector);
+  - is appended to the active Recorder, if any;
+  - is logged as one JSON object on the "geolab.metrics" logger.
+Headless: no streamlit imports.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+ENABLED = os.environ.get("GEOLAB_METRICS", "") not in ("", "0")
+METRICS_FILE = os.environ.get("GEOLAB_METRICS_FILE") or None
+# Histogram bucket upper bounds in seconds.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("geolab.metrics")
+
+_recorder = contextvars.ContextVar("geolab_recorder", default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "labels", "recorder", "start", "duration", "error")
+
+    def __init__(self, name, labels, recorder):
+        self.name = name
+        self.labels = labels
+        self.recorder = recorder
+        self.duration = None
+        self.error = None
+
+    def set(self, **labels):
+        """Attaches labels only known once the stage has run (e.g. row counts)."""
+        self.labels.update(labels)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        self.error = exc_type.__name__ if exc_type else None
+        METRICS.observe(self.name, self.duration, self.error is not None)
+        if self.recorder is not None:
+            self.recorder.spans.append(self)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"event": "span", "span": self.name, "duration_ms": round(self.duration * 1e3, 3),
+                                    "error": self.error, **self.labels}, default=str))
+        return False
+
+
+def span(name, **labels):
+    """Context manager timing one stage; a no-op unless instrumentation is on for this run."""
+    recorder = _recorder.get()
+    if not ENABLED and recorder is None:
+        return _NULL_SPAN
+    return Span(name, labels, recorder)
+
+
+class Recorder:
+    """Spans finished in the current context (one Streamlit script run)."""
+
+    def __init__(self):
+        self.spans = []
+
+    def rows(self):
+        return [{"span": s.name, "ms": round(s.duration * 1e3, 2), "error": s.error,
+                 "labels": ", ".join(f"{k}={v}" for k, v in s.labels.items())} for s in self.spans]
+
+    @property
+    def total_seconds(self):
+        return sum(s.duration for s in self.spans)
+
+
+def start_recording():
+    """Activates a fresh Recorder for the current context and returns it."""
+    recorder = Recorder()
+    _recorder.set(recorder)
+    return recorder
+
+
+def stop_recording():
+    _recorder.set(None)
+
+
+class Metrics:
+    """Thread-safe per-span duration histograms."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name, seconds, error=False):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "errors": 0}
+            series["counts"][index] += 1
+            series["sum"] += seconds
+            series["errors"] += error
+
+    def snapshot(self):
+        """{span: {"count", "sum", "errors", "counts"}} copied under the lock."""
+        with self._lock:
+            return {name: {"count": sum(s["counts"]), "sum": s["sum"], "errors": s["errors"], "counts": list(s["counts"])}
+                    for name, s in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def prometheus_text(self):
+        lines = ["# HELP geolab_stage_duration_seconds Wall time of instrumented app stages.",
+                 "# TYPE geolab_stage_duration_seconds histogram"]
+        snapshot = self.snapshot()
+        for name, s in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, s["counts"]):
+                cumulative += count
+                lines.append(f'geolab_stage_duration_seconds_bucket{{stage="{name}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'geolab_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {s["count"]}')
+            lines.append(f'geolab_stage_duration_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+            lines.append(f'geolab_stage_duration_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines += ["# HELP geolab_stage_errors_total Instrumented stages that raised.",
+                  "# TYPE geolab_stage_errors_total counter"]
+        lines += [f'geolab_stage_errors_total{{stage="{name}"}} {s["errors"]}' for name, s in sorted(snapshot.items())]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def prometheus_text():
+    return METRICS.prometheus_text()
+
+
+def write_prometheus(path=None):
+    """Atomically writes the Prometheus text to `path` (default GEOLAB_METRICS_FILE); no-op without a path."""
+    path = path or METRICS_FILE
+    if not path:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        fh.write(prometheus_text())
+    os.replace(tmp, path)
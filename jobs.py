@@ -0,0 +1,224 @@
+"""Background jobs that keep running across Streamlit reruns.
+
+A JobRunner owns a bounded thread pool (job bodies, I/O, NumPy work that
+releases the GIL) and a lazily started process pool for CPU-bound
+pure-Python/pandas work. It is meant to be shared by every session in the
+process (st.cache_resource), and the Job objects it returns are kept in
+session state. A job body is func(job, *args): it reports progress with
+job.report(), which also raises JobCancelled once cancel() has been
+requested, and can hand work to the process pool with
+job.run_in_process(). Results are picked up by a later rerun from
+job.result.
+
+Fair sharing: each owner (session) may have at most MAX_JOBS_PER_OWNER
+unfinished jobs, resubmitting a job name replaces the owner's previous
+one, and process workers run at a lower priority than the server.
+Headless: no streamlit imports.
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+MAX_THREADS = int(os.environ.get("GEOLAB_JOB_THREADS", "4"))
+MAX_PROCESSES = int(os.environ.get("GEOLAB_JOB_PROCESSES", str(os.cpu_count() or 1)))
+MAX_JOBS_PER_OWNER = 2
+# Finished jobs are forgotten by the runner after this long (sessions may still hold them).
+KEEP_SECONDS = 15 * 60
+# How often run_in_process() checks for cancellation while it waits.
+POLL_SECONDS = 0.1
+WORKER_NICENESS = 5
+
+
+class JobCancelled(Exception):
+    """Raised inside a job body when its cancellation has been requested."""
+
+
+class JobLimitError(RuntimeError):
+    """Raised by submit() when the owner already has MAX_JOBS_PER_OWNER jobs running."""
+
+
+def _lower_priority():
+    # Process-pool initializer: the maths yields to the server's script threads.
+    try:
+        os.nice(WORKER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+class Job:
+    """Status, progress and result of one submitted function; safe to read from any thread."""
+
+    def __init__(self, runner, job_id, name, owner=None, key=None):
+        self._runner = runner
+        self.id = job_id
+        self.name = name
+        self.owner = owner
+        self.key = key
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.exception = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name} {self.status} {self.progress:.0%}>"
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def report(self, progress=None, message=None):
+        """Updates progress (0-1) and/or the status message; raises JobCancelled if cancellation was requested."""
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """Requests cancellation: a queued job never starts, a running one stops at its next report()."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def run_in_process(self, func, *args):
+        """Runs func(*args) in the runner's process pool and waits for it, honouring cancel().
+
+        `func` and its arguments must be picklable (module-level, headless).
+        A task that has already started cannot be interrupted; on
+        cancellation its result is discarded.
+        """
+        future = self._runner.process_pool().submit(func, *args)
+        while True:
+            if self._cancel.is_set():
+                future.cancel()
+                raise JobCancelled()
+            try:
+                return future.result(timeout=POLL_SECONDS)
+            except FutureTimeout:
+                continue
+
+    def _run(self, func, args, kwargs):
+        if self._cancel.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self.started = time.time()
+        try:
+            result = func(self, *args, **kwargs)
+        except JobCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            self.exception = e
+            self.error = f"{type(e).__name__}: {e}"
+            self._finish(FAILED)
+        else:
+            self.result = result
+            self.progress = 1.0
+            self._finish(DONE)
+
+    def _finish(self, status):
+        if self.started is None:
+            self.started = time.time()
+        self.finished = time.time()
+        self.status = status
+
+
+class JobRunner:
+    """Shared thread/process pools plus the registry of submitted jobs."""
+
+    def __init__(self, max_threads=MAX_THREADS, max_processes=MAX_PROCESSES, max_jobs_per_owner=MAX_JOBS_PER_OWNER):
+        self.max_processes = max(1, max_processes)
+        self.max_jobs_per_owner = max_jobs_per_owner
+        self._threads = ThreadPoolExecutor(max_workers=max(1, max_threads), thread_name_prefix="geolab-job")
+        self._processes = None
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                import batch_analysis
+                context = multiprocessing.get_context(batch_analysis.START_METHOD)
+                self._processes = ProcessPoolExecutor(max_workers=self.max_processes, mp_context=context,
+                                                      initializer=_lower_priority)
+            return self._processes
+
+    def submit(self, name, func, *args, owner=None, key=None, **kwargs):
+        """Starts func(job, *args, **kwargs) on the thread pool and returns its Job.
+
+        An unfinished job of the same `name` and `owner` is cancelled first
+        (a resubmitted analysis supersedes the old one). `key` is free-form,
+        e.g. the dataset/plot key the result belongs to.
+        """
+        with self._lock:
+            self._prune()
+            if owner is not None:
+                active = [job for job in self._jobs.values() if job.owner == owner and not job.done]
+                for job in active:
+                    if job.name == name:
+                        job.cancel()
+                active = [job for job in active if job.name != name]
+                if len(active) >= self.max_jobs_per_owner:
+                    raise JobLimitError(f"{len(active)} analyses are already running for this session; "
+                                        "wait for one to finish or cancel it.")
+            job = Job(self, next(self._ids), name, owner, key)
+            self._jobs[job.id] = job
+            job._future = self._threads.submit(job._run, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        """Known jobs (optionally of one owner), oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in (PENDING, RUNNING, DONE, FAILED, CANCELLED)}
+
+    def shutdown(self, cancel=True):
+        for job in self.jobs():
+            if cancel and not job.done:
+                job.cancel()
+        self._threads.shutdown(wait=False, cancel_futures=cancel)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=cancel)
+
+    def _prune(self):
+        cutoff = time.time() - KEEP_SECONDS
+        for job_id in [i for i, job in self._jobs.items() if job.done and job.finished < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,100 @@
+"""Offline-first loading of Lottie animations.
+
+Animations are served from an on-disk cache, falling back to a bundled
+asset when nothing is cached yet. Network fetches only ever happen on a
+background thread, so rendering never waits on (or fails because of) the
+network. Hits, misses and fetch latency are logged under "geolab.lottie".
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("geolab.lottie")
+
+CACHE_DIR = os.environ.get("GEOLAB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "geolab"))
+FALLBACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "lottie_earth.json")
+MAX_AGE_SECONDS = 7 * 24 * 3600
+FETCH_TIMEOUT = 10
+# Minimum gap between fetch attempts for the same URL, so an unreachable
+# host is not retried on every rerun.
+RETRY_SECONDS = 300
+# Set GEOLAB_OFFLINE=1 on air-gapped hosts to skip background refreshes entirely.
+OFFLINE = os.environ.get("GEOLAB_OFFLINE", "") not in ("", "0")
+
+_refreshing = set()
+_last_attempt = {}
+_refresh_lock = threading.Lock()
+
+
+def cache_path(url, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, "lottie", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _fetch(url, path):
+    """Downloads `url` into `path` atomically. Runs on a background thread."""
+    start = time.perf_counter()
+    try:
+        import requests
+
+        r = requests.get(url, timeout=FETCH_TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+        logger.info("lottie refresh ok url=%s latency_ms=%.1f", url, (time.perf_counter() - start) * 1e3)
+    except Exception as e:
+        logger.warning("lottie refresh failed url=%s latency_ms=%.1f error=%s", url, (time.perf_counter() - start) * 1e3, e)
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(path)
+
+
+def refresh_in_background(url, cache_dir=CACHE_DIR):
+    """Starts a daemon thread fetching `url` into the cache unless one is already running."""
+    path = cache_path(url, cache_dir)
+    with _refresh_lock:
+        now = time.monotonic()
+        if OFFLINE or path in _refreshing or now - _last_attempt.get(path, -RETRY_SECONDS) < RETRY_SECONDS:
+            return None
+        _refreshing.add(path)
+        _last_attempt[path] = now
+    thread = threading.Thread(target=_fetch, args=(url, path), name="lottie-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def load_lottie(url, cache_dir=CACHE_DIR, fallback_path=FALLBACK_PATH, max_age=MAX_AGE_SECONDS):
+    """Returns the Lottie JSON for `url` without blocking on the network.
+
+    Order: fresh cache entry -> stale cache entry (refresh scheduled) ->
+    bundled fallback (fetch scheduled) -> None.
+    """
+    start = time.perf_counter()
+    path = cache_path(url, cache_dir)
+    data = _read_json(path)
+    if data is not None:
+        age = time.time() - os.path.getmtime(path)
+        stale = age > max_age
+        if stale:
+            refresh_in_background(url, cache_dir)
+        logger.info("lottie cache hit url=%s stale=%s latency_ms=%.2f", url, stale, (time.perf_counter() - start) * 1e3)
+        return data
+
+    refresh_in_background(url, cache_dir)
+    data = _read_json(fallback_path) if fallback_path else None
+    logger.info("lottie cache miss url=%s fallback=%s latency_ms=%.2f", url, data is not None, (time.perf_counter() - start) * 1e3)
+    return data
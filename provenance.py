@@ -0,0 +1,151 @@
+"""Dickinson (1983) QFL provenance-field classification.
+
+Fields are polygons in ternary (Q, F, L) space. Because L = 1 - Q - F, a
+point-in-polygon test in the (Q, F) plane is enough; points on a field's
+edge belong to it. Classification goes through a precomputed lookup grid
+over the triangle so labelling N samples is a couple of array index
+operations rather than a per-row loop; the few samples whose grid cell
+straddles a field boundary are tested exactly, so the result always
+matches classify_exact().
+Headless: no streamlit/plotting imports.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Vertices as ternary a (Q), b (F), c (L) fractions.
+DICKINSON_FIELDS = {
+    'Craton Interior': {'a': [1, 0.85, 0.95], 'b': [0, 0.15, 0], 'c': [0, 0, 0.05]},
+    'Transitional Craton': {'a': [0.85, 0.60, 0.70, 0.95], 'b': [0.15, 0.40, 0.15, 0], 'c': [0, 0, 0.15, 0.05]},
+    'Basement Uplift': {'a': [0.60, 0.70, 0.25, 0], 'b': [0.40, 0.15, 0.75, 1], 'c': [0, 0.15, 0, 0]},
+    'Recycled Orogen': {'a': [0.75, 0.65, 0.55, 0.80], 'b': [0, 0.10, 0, 0], 'c': [0.25, 0.25, 0.45, 0.20]},
+    'Transitional Arc': {'a': [0.55, 0.65, 0.15, 0], 'b': [0, 0.10, 0.60, 0.45], 'c': [0.45, 0.25, 0.25, 0.55]},
+    'Dissected Arc': {'a': [0.25, 0.70, 0.15, 0], 'b': [0.75, 0.15, 0.60, 0.45], 'c': [0, 0.15, 0.25, 0.55]},
+}
+FIELD_COLORS = {
+    'Craton Interior': 'rgba(255, 228, 181, 0.6)', 'Transitional Craton': 'rgba(240, 230, 140, 0.6)',
+    'Basement Uplift': 'rgba(218, 112, 214, 0.6)', 'Recycled Orogen': 'rgba(173, 216, 230, 0.6)',
+    'Transitional Arc': 'rgba(144, 238, 144, 0.6)', 'Dissected Arc': 'rgba(255, 182, 193, 0.6)',
+}
+
+UNCLASSIFIED = "Unclassified"
+# Where polygons overlap, the first field in DICKINSON_FIELDS wins.
+FIELD_NAMES = list(DICKINSON_FIELDS) + [UNCLASSIFIED]
+UNCLASSIFIED_CODE = len(FIELD_NAMES) - 1
+# Lookup-grid entry of a node next to a field boundary: resolve with classify_exact().
+AMBIGUOUS_CODE = -1
+EDGE_TOLERANCE = 1e-9
+
+DEFAULT_RESOLUTION = 1000
+
+
+def points_in_polygon(x, y, vx, vy):
+    """Vectorized even-odd ray-casting test of points (x, y) against one polygon."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    inside = np.zeros(x.shape, dtype=bool)
+    n = len(vx)
+    for i in range(n):
+        x1, y1 = vx[i], vy[i]
+        x2, y2 = vx[(i + 1) % n], vy[(i + 1) % n]
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < x_cross)
+    return inside
+
+
+def points_on_polygon_edges(x, y, vx, vy, tol=EDGE_TOLERANCE):
+    """Points (x, y) lying on an edge of the polygon, within `tol`."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    on_edge = np.zeros(x.shape, dtype=bool)
+    n = len(vx)
+    for i in range(n):
+        x1, y1 = vx[i], vy[i]
+        x2, y2 = vx[(i + 1) % n], vy[(i + 1) % n]
+        cross = (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)
+        within = ((x >= min(x1, x2) - tol) & (x <= max(x1, x2) + tol)
+                  & (y >= min(y1, y2) - tol) & (y <= max(y1, y2) + tol))
+        on_edge |= within & (np.abs(cross) <= tol * np.hypot(x2 - x1, y2 - y1))
+    return on_edge
+
+
+def classify_exact(q_norm, f_norm):
+    """Field codes (into FIELD_NAMES) by testing every point against every polygon (edges included)."""
+    q_norm = np.asarray(q_norm, dtype=np.float64)
+    f_norm = np.asarray(f_norm, dtype=np.float64)
+    codes = np.full(q_norm.shape, UNCLASSIFIED_CODE, dtype=np.int8)
+    for code, coords in reversed(list(enumerate(DICKINSON_FIELDS.values()))):
+        inside = points_in_polygon(q_norm, f_norm, coords['a'], coords['b'])
+        inside |= points_on_polygon_edges(q_norm, f_norm, coords['a'], coords['b'])
+        codes[inside] = code
+    return codes
+
+
+@lru_cache(maxsize=4)
+def lookup_grid(resolution=DEFAULT_RESOLUTION):
+    """Flattened int8 table of field codes for a (resolution+1)^2 lattice over (Q, F).
+
+    Entry i * (resolution + 1) + j holds the field of Q = i/resolution,
+    F = j/resolution, or AMBIGUOUS_CODE where any of the eight neighbouring
+    nodes differs (a boundary passes within one cell); one extra trailing
+    Unclassified entry catches out-of-range and NaN lookups.
+    """
+    steps = np.arange(resolution + 1) / resolution
+    q, f = np.meshgrid(steps, steps, indexing="ij")
+    grid = classify_exact(q, f)
+    grid[q + f > 1 + 1e-9] = UNCLASSIFIED_CODE
+    padded = np.pad(grid, 1, mode="edge")
+    uniform = np.ones(grid.shape, dtype=bool)
+    for di in range(3):
+        for dj in range(3):
+            uniform &= padded[di:di + grid.shape[0], dj:dj + grid.shape[1]] == grid
+    # Samples on the L = 0 edge may round to a node just outside the triangle: test those exactly.
+    uniform &= np.abs(q + f - 1) > 1.5 / resolution
+    grid[~uniform] = AMBIGUOUS_CODE
+    grid = np.append(grid.ravel(), np.int8(UNCLASSIFIED_CODE))
+    grid.setflags(write=False)
+    return grid
+
+
+def classify(q_norm, f_norm, resolution=DEFAULT_RESOLUTION):
+    """Field codes (into FIELD_NAMES) for normalized Q/F via the lookup grid.
+
+    Samples in cells next to a field boundary fall back to classify_exact(),
+    so the result is the same as classifying every point exactly. NaN
+    inputs map to Unclassified.
+    """
+    grid = lookup_grid(resolution)
+    size = resolution + 1
+    q_norm = np.asarray(q_norm, dtype=np.float64)
+    f_norm = np.asarray(f_norm, dtype=np.float64)
+    i = q_norm * resolution + 0.5
+    j = f_norm * resolution + 0.5
+    # NaN fails every comparison, so it lands on the sentinel entry too.
+    valid = (i >= 0) & (i < size) & (j >= 0) & (j < size)
+    with np.errstate(invalid="ignore", over="ignore"):
+        index = i.astype(np.intp) * size + j.astype(np.intp)
+    codes = grid.take(np.where(valid, index, size * size))
+    ambiguous = codes == AMBIGUOUS_CODE
+    if ambiguous.any():
+        q_norm, f_norm = np.broadcast_arrays(q_norm, f_norm)
+        codes[ambiguous] = classify_exact(q_norm[ambiguous], f_norm[ambiguous])
+    return codes
+
+
+def classify_frame(df, resolution=DEFAULT_RESOLUTION):
+    """Provenance field of every row of a processed frame as a Categorical."""
+    codes = classify(df['Q_norm'].to_numpy(), df['F_norm'].to_numpy(), resolution)
+    return pd.Categorical.from_codes(codes, categories=FIELD_NAMES)
+
+
+def field_summary(labels):
+    """Per-field sample counts and percentages, in FIELD_NAMES order."""
+    labels = pd.Categorical(labels, categories=FIELD_NAMES)
+    counts = np.bincount(labels.codes[labels.codes >= 0], minlength=len(FIELD_NAMES))
+    total = counts.sum()
+    percent = counts / total * 100 if total else np.zeros(len(FIELD_NAMES))
+    return pd.DataFrame({"Samples": counts, "Percent": percent}, index=pd.Index(FIELD_NAMES, name="Provenance Field"))
@@ -0,0 +1,361 @@
+"""Headless QFL & MIA compute engine.
+
+Everything here works on plain DataFrames / NumPy arrays so it can be used
+from batch jobs without starting a Streamlit session. Do not import
+streamlit, matplotlib or plotly in this module.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+# --- INPUT TYPES & COLUMNS ---
+FULL_MINERAL = "full_mineral"
+DIRECT_QFL = "direct_qfl"
+
+MINERAL_COLUMNS = ["qm", "qp", "k", "p", "lm", "ls", "lv"]
+QFL_COLUMNS = ["q", "f", "l"]
+EXPECTED_COLUMNS = {FULL_MINERAL: MINERAL_COLUMNS, DIRECT_QFL: QFL_COLUMNS}
+
+RENAME_MAP = {"feldspar": "k", "mica": "p", "lithic fragment": "lv"}
+
+MIA_BINS = [25, 50, 75]
+MIA_CATEGORIES = ["Very Low", "Low", "Moderate", "High"]
+
+RESULT_COLUMNS = ["Q", "F", "L", "Q_norm", "F_norm", "L_norm", "MIA", "MIA_category"]
+
+
+class MissingColumnsError(ValueError):
+    """Raised when an input table lacks the columns required for its input type."""
+
+    def __init__(self, input_type, missing):
+        self.input_type = input_type
+        self.missing = list(missing)
+        super().__init__(f"Missing required columns: {', '.join(self.missing)}")
+
+    def __reduce__(self):
+        # Keeps the error picklable, e.g. when raised in a worker process.
+        return type(self), (self.input_type, self.missing)
+
+
+def standardize_columns(df):
+    """Lower-cases/strips headers and maps common aliases (Feldspar, Mica, ...) to k/p/lv."""
+    df = df.copy(deep=False)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    for old, new in RENAME_MAP.items():
+        if old in df.columns and new not in df.columns:
+            df = df.rename(columns={old: new})
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def missing_columns(df, input_type):
+    """Returns the required columns for `input_type` that are absent from `df`."""
+    return [col for col in EXPECTED_COLUMNS[input_type] if col not in df.columns]
+
+
+def coerce_numeric(df, columns):
+    """Returns a float64 2-D array of `columns`; non-numeric cells become NaN."""
+    values = np.empty((len(df), len(columns)), dtype=np.float64)
+    for i, col in enumerate(columns):
+        series = df[col]
+        if not pd.api.types.is_numeric_dtype(series):
+            series = pd.to_numeric(series, errors="coerce")
+        values[:, i] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return values
+
+
+# --- ARRAY KERNELS ---
+
+def qfl_from_components(qm, qp, k, p, lm, ls, lv):
+    """Sums detrital modes into Q (Qm+Qp), F (K+P) and L (Lm+Ls+Lv)."""
+    return np.add(qm, qp), np.add(k, p), np.add(np.add(lm, ls), lv)
+
+
+def normalize_qfl(q, f, l):
+    """Closes Q, F, L to fractions summing to 1 (NaN where the total is 0)."""
+    q, f, l = (np.asarray(a, dtype=np.float64) for a in (q, f, l))
+    total = q + f + l
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = np.where(total != 0, 1.0 / total, np.nan)
+    return q * inv, f * inv, l * inv
+
+
+def mia(q, f):
+    """Maturity Index of Arenites, Q / (Q + F) * 100, with 0 where Q + F is 0."""
+    q = np.asarray(q, dtype=np.float64)
+    f = np.asarray(f, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = q / (q + f) * 100
+    return np.where(np.isnan(out), 0.0, out)
+
+
+def mia_category_codes(mia_values):
+    """Integer index into MIA_CATEGORIES for each MIA value (>75 High, >50 Moderate, >25 Low)."""
+    return np.searchsorted(MIA_BINS, np.asarray(mia_values), side="left").astype(np.int8)
+
+
+def categorize_mia(mia_values):
+    """MIA values as a pandas Categorical over MIA_CATEGORIES."""
+    return pd.Categorical.from_codes(mia_category_codes(mia_values), categories=MIA_CATEGORIES, ordered=True)
+
+
+# --- BATCH API ---
+
+def compute_qfl_mia(q, f, l):
+    """Vectorized Q/F/L -> normalized fractions, MIA and MIA category.
+
+    Returns a dict of equally sized NumPy arrays keyed by RESULT_COLUMNS
+    (the category is returned as integer codes into MIA_CATEGORIES).
+    """
+    q = np.asarray(q, dtype=np.float64)
+    f = np.asarray(f, dtype=np.float64)
+    l = np.asarray(l, dtype=np.float64)
+    q_norm, f_norm, l_norm = normalize_qfl(q, f, l)
+    mia_values = mia(q, f)
+    return {
+        "Q": q, "F": f, "L": l,
+        "Q_norm": q_norm, "F_norm": f_norm, "L_norm": l_norm,
+        "MIA": mia_values,
+        "MIA_category": mia_category_codes(mia_values),
+    }
+
+
+def compute_from_components(values):
+    """Runs compute_qfl_mia on an (n, 7) array ordered as MINERAL_COLUMNS."""
+    values = np.asarray(values, dtype=np.float64)
+    q, f, l = qfl_from_components(*values.T)
+    return compute_qfl_mia(q, f, l)
+
+
+def process_frame(df, input_type):
+    """Standardizes, coerces and computes QFL/MIA for a raw input table.
+
+    Rows with a missing or non-numeric required value are dropped. The
+    returned frame keeps the original (standardized) columns, with the
+    required columns as float64, followed by RESULT_COLUMNS. Raises
+    MissingColumnsError if required columns are absent.
+    """
+    df = standardize_columns(df)
+    missing = missing_columns(df, input_type)
+    if missing:
+        raise MissingColumnsError(input_type, missing)
+
+    expected = EXPECTED_COLUMNS[input_type]
+    with instrumentation.span("qfl.coerce", rows=len(df)):
+        values = coerce_numeric(df, expected)
+    valid = ~np.isnan(values).any(axis=1)
+    if not valid.all():
+        df = df.loc[valid]
+        values = values[valid]
+
+    with instrumentation.span("qfl.compute", rows=len(values)):
+        if input_type == FULL_MINERAL:
+            results = compute_from_components(values)
+        else:
+            results = compute_qfl_mia(values[:, 0], values[:, 1], values[:, 2])
+
+    data = {col: df[col] for col in df.columns if col not in expected and col not in RESULT_COLUMNS}
+    data.update({col: values[:, i] for i, col in enumerate(expected)})
+    data.update(results)
+    data["MIA_category"] = pd.Categorical.from_codes(results["MIA_category"], categories=MIA_CATEGORIES, ordered=True)
+    return pd.DataFrame(data, index=df.index)
+
+
+# --- STREAMING INGEST ---
+
+DEFAULT_CHUNKSIZE = 100_000
+# Placeholders read as missing in numeric columns besides pandas' defaults (below detection limit etc.).
+NA_TOKENS = ["-", "--", "?", "nd", "ND", "n.d.", "bdl", "BDL", "<dl", "tr"]
+
+
+def _category_codes(categories):
+    codes = np.asarray(categories)
+    if codes.dtype.kind not in "iu":
+        codes = np.asarray(pd.Categorical(categories, categories=MIA_CATEGORIES).codes)
+    return codes
+
+
+class RunningSummary:
+    """Accumulates totals, mean MIA and MIA category counts chunk by chunk."""
+
+    def __init__(self):
+        self.rows = 0
+        self.dropped_rows = 0
+        self.total_q = 0.0
+        self.total_f = 0.0
+        self.total_l = 0.0
+        self.mia_sum = 0.0
+        self.category_counts = np.zeros(len(MIA_CATEGORIES), dtype=np.int64)
+
+    def update(self, results):
+        """Adds a compute_qfl_mia() result dict (or a processed frame) to the totals."""
+        codes = _category_codes(results["MIA_category"])
+        self.rows += len(codes)
+        self.total_q += float(np.sum(results["Q"]))
+        self.total_f += float(np.sum(results["F"]))
+        self.total_l += float(np.sum(results["L"]))
+        self.mia_sum += float(np.sum(results["MIA"]))
+        self.category_counts += np.bincount(codes, minlength=len(MIA_CATEGORIES))
+        if isinstance(results, pd.DataFrame):
+            self.dropped_rows += results.attrs.get("dropped_rows", 0)
+        return self
+
+    def subtract(self, results):
+        """Removes rows previously added with update() (for incremental edits)."""
+        codes = _category_codes(results["MIA_category"])
+        self.rows -= len(codes)
+        self.total_q -= float(np.sum(results["Q"]))
+        self.total_f -= float(np.sum(results["F"]))
+        self.total_l -= float(np.sum(results["L"]))
+        self.mia_sum -= float(np.sum(results["MIA"]))
+        self.category_counts -= np.bincount(codes, minlength=len(MIA_CATEGORIES))
+        return self
+
+    def merge(self, other):
+        """Folds another RunningSummary into this one."""
+        self.rows += other.rows
+        self.dropped_rows += other.dropped_rows
+        self.total_q += other.total_q
+        self.total_f += other.total_f
+        self.total_l += other.total_l
+        self.mia_sum += other.mia_sum
+        self.category_counts += other.category_counts
+        return self
+
+    @property
+    def average_mia(self):
+        return self.mia_sum / self.rows if self.rows else float("nan")
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "total_q": self.total_q,
+            "total_f": self.total_f,
+            "total_l": self.total_l,
+            "average_mia": self.average_mia,
+            "dropped_rows": self.dropped_rows,
+            "category_counts": pd.Series(self.category_counts, index=MIA_CATEGORIES),
+        }
+
+
+def summarize(df):
+    """Totals, average MIA and MIA category counts for a processed frame."""
+    return RunningSummary().update(df).as_dict()
+
+
+def _stream_columns(header, input_type):
+    """Maps raw header names to standardized ones; returns (usecols, rename) for chunked reads."""
+    standardized = [str(c).strip().lower() for c in header]
+    rename = {}
+    for raw, std in zip(header, standardized):
+        alias = RENAME_MAP.get(std)
+        if alias and alias not in standardized:
+            std = alias
+        if std not in rename.values():
+            rename[raw] = std
+
+    missing = [col for col in EXPECTED_COLUMNS[input_type] if col not in rename.values()]
+    if missing:
+        raise MissingColumnsError(input_type, missing)
+    return list(rename), rename
+
+
+def _to_float(text):
+    """CSV converter: float of a cell, NaN for anything non-numeric."""
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def _process_chunks(chunks, rename, input_type):
+    for chunk in chunks:
+        frame = process_frame(chunk.rename(columns=rename), input_type)
+        frame.attrs["dropped_rows"] = len(chunk) - len(frame)
+        yield frame
+
+
+def iter_csv_chunks(source, input_type, chunksize=DEFAULT_CHUNKSIZE):
+    """Yields processed frames for a CSV read `chunksize` rows at a time.
+
+    Only the header plus one chunk is held in memory at once, so this works
+    on files far larger than RAM. Each yielded frame has the same layout as
+    process_frame(); its `attrs["dropped_rows"]` counts the invalid rows
+    removed from that chunk.
+    """
+    names = None
+    if hasattr(source, "seekable") and not source.seekable():
+        # Pipes (stdin) cannot be rewound: parse the header line ourselves.
+        first = source.readline()
+        header = pd.read_csv(io.BytesIO(first) if isinstance(first, bytes) else io.StringIO(first), nrows=0).columns
+        names = list(header)
+    else:
+        header = pd.read_csv(source, nrows=0).columns
+        if hasattr(source, "seek"):
+            source.seek(0)
+    usecols, rename = _stream_columns(header, input_type)
+    # Duplicate (aliased) columns are the only ones left out.
+    usecols = usecols if len(usecols) < len(header) else None
+    required = [raw for raw, std in rename.items() if std in EXPECTED_COLUMNS[input_type]]
+    # Every column's dtype is fixed up front, so no chunk re-infers its types:
+    # required columns are float64, the rest (sample IDs etc.) str.
+    dtype = {raw: str for raw in rename if raw not in required}
+    options = dict(usecols=usecols, chunksize=chunksize, low_memory=False, na_values=NA_TOKENS,
+                   header=None if names else "infer", names=names)
+    # Paths and seekable files can be reread; pipes go straight to the tolerant converter.
+    rewindable = names is None and (isinstance(source, (str, os.PathLike)) or hasattr(source, "seek"))
+    done = 0
+    if rewindable:
+        start = source.tell() if hasattr(source, "tell") else None
+        try:
+            # Fast path: the C parser converts straight to float64.
+            with pd.read_csv(source, dtype={**dtype, **{raw: np.float64 for raw in required}}, **options) as reader:
+                for frame in _process_chunks(reader, rename, input_type):
+                    done += 1
+                    yield frame
+            return
+        except ValueError as e:
+            if "could not convert" not in str(e):
+                raise
+        # A token outside NA_TOKENS: reparse with the tolerant converter and skip the chunks already yielded.
+        if start is not None:
+            source.seek(start)
+    converters = {raw: _to_float for raw in required}
+    with pd.read_csv(source, dtype=dtype, converters=converters, **options) as reader:
+        for i, frame in enumerate(_process_chunks(reader, rename, input_type)):
+            if i >= done:
+                yield frame
+
+
+def iter_table_chunks(source, input_type, fmt, chunksize=DEFAULT_CHUNKSIZE):
+    """Like iter_csv_chunks() for any table_io format (Parquet/Arrow read batch by batch)."""
+    import table_io
+
+    if fmt == table_io.CSV:
+        yield from iter_csv_chunks(source, input_type, chunksize)
+        return
+    header = table_io.schema_names(source, fmt)
+    usecols, rename = _stream_columns(header, input_type)
+    yield from _process_chunks(table_io.iter_table_chunks(source, fmt, chunksize, columns=usecols), rename, input_type)
+
+
+def stream_table(source, input_type, fmt="csv", chunksize=DEFAULT_CHUNKSIZE, on_chunk=None):
+    """Computes QFL/MIA over a table in fixed-size chunks and returns a RunningSummary.
+
+    `on_chunk(frame)` is called with every processed chunk, e.g. to append
+    it to an output file; the chunks themselves are not retained.
+    """
+    summary = RunningSummary()
+    for frame in iter_table_chunks(source, input_type, fmt, chunksize):
+        summary.update(frame)
+        if on_chunk is not None:
+            on_chunk(frame)
+    return summary
+
+
+def stream_csv(source, input_type, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None):
+    """stream_table() for CSV input."""
+    return stream_table(source, input_type, "csv", chunksize, on_chunk)
@@ -1,7 +1,13 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
 import ternary
+import asset_cache
+import qfl_engine
+import ternary_density
+
+SQRT3_OVER_2 = np.sqrt(3) / 2
 
 def inject_css():
     st.markdown("""
@@ -21,26 +27,14 @@ def inject_css():
     """, unsafe_allow_html=True)
 
 def standardize_columns(df):
-    df.columns = [c.strip().lower() for c in df.columns]
-    rename_map = {
-        "feldspar": "k",
-        "mica": "p",
-        "lithic fragment": "lv",
-    }
-    for old, new in rename_map.items():
-        if old in df.columns and new not in df.columns:
-            df = df.rename(columns={old: new})
-    df = df.loc[:, ~df.columns.duplicated()]
-    return df
+    return qfl_engine.standardize_columns(df)
 
 def calculate_qfl_components(df):
-    df["q"] = df["qm"] + df["qp"]
-    df["f"] = df["k"] + df["p"]
-    df["l"] = df["lm"] + df["ls"] + df["lv"]
+    df["q"], df["f"], df["l"] = qfl_engine.qfl_from_components(*(df[c] for c in qfl_engine.MINERAL_COLUMNS))
     return df
 
 def calculate_mia(df):
-    df["mia"] = (df["q"] / (df["q"] + df["k"] + df["p"])) * 100 if "k" in df.columns and "p" in df.columns else (df["q"] / (df["q"] + df["f"])) * 100
+    df["mia"] = qfl_engine.mia(df["q"], df["f"])
     return df
 
 def interpret_mia(value):
@@ -53,7 +47,15 @@ def interpret_mia(value):
     else:
         return "Low MIA indicates immature sediments, likely arid climates or tectonically active areas."
 
-def plot_qfl_triangle(data):
+def _project(points, scale=100):
+    """Maps (..., 3) ternary fractions to python-ternary's planar (..., 2) x/y coordinates."""
+    return np.stack([points[..., 0] + points[..., 1] / 2, points[..., 1] * SQRT3_OVER_2], axis=-1) * scale
+
+def _plot_density(tax, q, f, l, scale=100, divisions=ternary_density.DEFAULT_DIVISIONS):
+    """Draws per-cell sample counts as a single hexagon PolyCollection."""
+    ternary_density.draw_density_cells(tax.get_axes(), q, f, l, lambda points: _project(points, scale), divisions)
+
+def plot_qfl_triangle(data, density_threshold=ternary_density.DENSITY_THRESHOLD):
     fig, tax = ternary.figure(scale=100)
     fig.set_size_inches(6, 6)
     tax.set_title("QFL Triangle", fontsize=15)
@@ -63,13 +65,14 @@ def plot_qfl_triangle(data):
     tax.right_axis_label("L", fontsize=12)
     tax.bottom_axis_label("Q", fontsize=12)
 
-    for _, row in data.iterrows():
-        total = row["q"] + row["f"] + row["l"]
-        if total > 0:
-            q = row["q"] / total * 100
-            f = row["f"] / total * 100
-            l = row["l"] / total * 100
-            tax.scatter([(q, f, l)], marker="o", color="blue", s=30)
+    q, f, l = qfl_engine.normalize_qfl(data["q"], data["f"], data["l"])
+    valid = np.isfinite(q)
+    q, f, l = q[valid], f[valid], l[valid]
+    if ternary_density.use_density(len(q), density_threshold):
+        _plot_density(tax, q, f, l)
+    else:
+        xy = _project(np.column_stack([q, f, l]))
+        tax.get_axes().scatter(xy[:, 0], xy[:, 1], marker="o", color="blue", s=30)
 
     tax.ticks(axis='lbr', multiple=10, linewidth=1)
     tax.clear_matplotlib_ticks()
@@ -77,11 +80,16 @@ def plot_qfl_triangle(data):
 
 def show_reference_diagram(selection):
     diagram_paths = {
-        "QFL Provenance Diagram": "static/qfl_provenance.png",
-        "Weathering Climate Diagram": "static/weathering_diagram.png",
-        "Sandstone Classification Diagram": "static/sandstone_classification.png"
+        "QFL Provenance Diagram": "qfl_provenance.png",
+        "Weathering Climate Diagram": "weathering_diagram.png",
+        "Sandstone Classification Diagram": "sandstone_classification.png"
     }
-    st.image(diagram_paths[selection], caption=selection, use_column_width=True)
+    # Decoded and resized once per process, then shared by every session.
+    data = asset_cache.image_bytes(diagram_paths[selection])
+    if data is None:
+        st.info(f"{selection} is not available (static/{diagram_paths[selection]} is missing).")
+        return
+    st.image(data, caption=selection, use_container_width=True)
 
 def qfl_and_mia_tool():
     inject_css()
@@ -186,26 +194,16 @@ def qfl_and_mia_tool():
 
         # 🔸 Q, F, L Percent per Sample
         st.markdown("### 📌 QFL Percentage Breakdown")
-        qfl_total = df[["q", "f", "l"]].sum(axis=1)
-        df["Q %"] = df["q"] / qfl_total * 100
-        df["F %"] = df["f"] / qfl_total * 100
-        df["L %"] = df["l"] / qfl_total * 100
+        q_norm, f_norm, l_norm = qfl_engine.normalize_qfl(df["q"], df["f"], df["l"])
+        df["Q %"] = q_norm * 100
+        df["F %"] = f_norm * 100
+        df["L %"] = l_norm * 100
         st.dataframe(df[["Q %", "F %", "L %"]])
 
         # 🔸 MIA Bar Chart with Visual Grade
         st.markdown("### 📊 MIA Values by Sample")
 
-        def categorize_mia(val):
-            if val > 75:
-                return "High"
-            elif val > 50:
-                return "Moderate"
-            elif val > 25:
-                return "Low"
-            else:
-                return "Very Low"
-
-        df["category"] = df["mia"].apply(categorize_mia)
+        df["category"] = qfl_engine.categorize_mia(df["mia"])
         colors = df["category"].map({
             "Very Low": "#ff6666",
             "Low": "#ffcc66",
@@ -0,0 +1,303 @@
+"""Per-group QFL/MIA reports rendered in parallel and streamed into one archive.
+
+For every group of a grouping.Grouping, a QFL ternary plot with the
+Dickinson (1983) fields, an MIA chart and a summary table are rendered
+with Matplotlib (Figure objects only, no pyplot, so renders need no lock).
+ZIP exports render groups in a process pool. At most IN_FLIGHT_PER_WORKER
+groups per worker are queued or waiting to be written, and each finished
+group is written to the archive and dropped right away. Memory therefore
+depends on the group size and worker count, not on how many groups there
+are. PDF exports produce one page per group through PdfPages. Pages are
+written in order, so they are rendered in the calling process one at a
+time. The archive is written to a path or binary file; nothing else is
+kept in memory. Headless: no streamlit imports.
+"""
+import io
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import provenance
+import ternary_density
+
+ZIP = "zip"
+PDF = "pdf"
+FORMATS = {
+    ZIP: {"label": "ZIP (PNG figures + CSV tables)", "extension": ".zip", "mime": "application/zip"},
+    PDF: {"label": "PDF (one page per group)", "extension": ".pdf", "mime": "application/pdf"},
+}
+DPI_CHOICES = (100, 150, 300)
+DEFAULT_DPI = 100
+IN_FLIGHT_PER_WORKER = 2
+# Above this many samples the MIA chart is a histogram instead of one bar per sample.
+MAX_BARS = 60
+# Bars are labelled with sample names up to this many samples; tick text dominates render time.
+MAX_BAR_LABELS = 30
+SQRT3_OVER_2 = np.sqrt(3) / 2
+# Summary columns shown on each report (when present in the grouping table).
+SUMMARY_COLUMNS = ["Samples", "Mean MIA", "Median MIA", "Std MIA", "Comp. Mean Q", "Comp. Mean F", "Comp. Mean L",
+                   "Dominant Provenance"]
+
+
+def safe_names(labels):
+    """File-system safe, unique archive folder names for group labels."""
+    names, seen = [], set()
+    for label in labels:
+        base = re.sub(r"[^\w.\-]+", "_", str(label)).strip("._") or "group"
+        name, n = base, 1
+        while name.lower() in seen:
+            n += 1
+            name = f"{base}_{n}"
+        seen.add(name.lower())
+        names.append(name)
+    return names
+
+
+def iter_groups(df, grouping, order=None):
+    """(position, label, rows of that group) in `order` (default: group order), one slice at a time."""
+    codes = np.asarray(grouping.codes)
+    rows = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[rows], np.arange(len(grouping.labels) + 1))
+    for g in range(len(grouping.labels)) if order is None else order:
+        yield g, grouping.labels[g], df.iloc[rows[bounds[g]:bounds[g + 1]]]
+
+
+# --- FIGURES ---
+
+def _project(q, f, l):
+    """Planar x/y of Q (top), F (bottom left), L (bottom right) fractions."""
+    total = q + f + l
+    return (l + q / 2) / total, q * SQRT3_OVER_2 / total
+
+
+def _rgba(css):
+    """Matplotlib RGBA tuple of an 'rgba(r, g, b, a)' string."""
+    r, g, b, a = (float(v) for v in re.findall(r"[\d.]+", css))
+    return r / 255, g / 255, b / 255, a
+
+
+def draw_ternary(ax, frame, title=None, density_threshold=ternary_density.DENSITY_THRESHOLD):
+    """QFL ternary plot of a processed frame on `ax`, over the Dickinson fields."""
+    from matplotlib.collections import PolyCollection
+
+    polygons = [np.column_stack(_project(*(np.asarray(coords[k], dtype=np.float64) for k in "abc")))
+                for coords in provenance.DICKINSON_FIELDS.values()]
+    colors = [_rgba(provenance.FIELD_COLORS[name]) for name in provenance.DICKINSON_FIELDS]
+    ax.add_collection(PolyCollection(polygons, facecolors=colors, edgecolors=(0, 0, 0, 0.3), linewidths=0.8))
+    ax.plot([0, 1, 0.5, 0], [0, 0, SQRT3_OVER_2, 0], color="black", linewidth=1.5)
+
+    q, f, l = (frame[c].to_numpy(dtype=np.float64) for c in ("Q_norm", "F_norm", "L_norm"))
+    valid = np.isfinite(q) & np.isfinite(f) & np.isfinite(l)
+    q, f, l = q[valid], f[valid], l[valid]
+    if ternary_density.use_density(len(q), density_threshold):
+        ternary_density.draw_density_cells(
+            ax, q, f, l, lambda points: np.stack(_project(points[..., 0], points[..., 1], points[..., 2]), axis=-1))
+    elif len(q):
+        x, y = _project(q, f, l)
+        ax.scatter(x, y, s=18, color="black", edgecolors="white", linewidths=0.5, zorder=3)
+
+    ax.text(0.5, SQRT3_OVER_2 + 0.03, "Q", ha="center", va="bottom", fontsize=11)
+    ax.text(-0.03, -0.03, "F", ha="right", va="top", fontsize=11)
+    ax.text(1.03, -0.03, "L", ha="left", va="top", fontsize=11)
+    ax.set_xlim(-0.08, 1.08)
+    ax.set_ylim(-0.08, SQRT3_OVER_2 + 0.1)
+    ax.set_aspect("equal")
+    ax.axis("off")
+    ax.set_title(title or f"QFL (n={len(q):,})", fontsize=11)
+
+
+def draw_mia(ax, frame, sample_column=None):
+    """MIA per sample as bars, or as a histogram for groups of more than MAX_BARS samples."""
+    mia = frame["MIA"].to_numpy(dtype=np.float64)
+    if len(mia) > MAX_BARS:
+        ax.hist(mia[np.isfinite(mia)], bins=np.arange(0, 105, 5), color="#009999")
+        ax.set_xlabel("MIA (%)")
+        ax.set_ylabel("Samples")
+        ax.set_xlim(0, 100)
+        guide = ax.axvline
+    else:
+        positions = np.arange(len(mia))
+        ax.bar(positions, mia, color="#009999")
+        if len(mia) <= MAX_BAR_LABELS:
+            names = frame[sample_column] if sample_column in frame.columns else frame.index
+            ax.set_xticks(positions, [str(n) for n in names], rotation=90, fontsize=7)
+        else:
+            ax.set_xlabel("Sample")
+        ax.set_ylabel("MIA (%)")
+        ax.set_ylim(0, 100)
+        guide = ax.axhline
+    # MIA category boundaries (qfl_engine.MIA_CATEGORIES).
+    for edge in (25, 50, 75):
+        guide(edge, color="gray", linewidth=0.5, linestyle=":")
+    ax.set_title("Maturity Index of Arenites (MIA)", fontsize=11)
+
+
+def summary_rows(summary):
+    """(name, formatted value) pairs of a grouping-table row for the report table."""
+    rows = []
+    for column in SUMMARY_COLUMNS:
+        if column not in summary.index:
+            continue
+        value = summary[column]
+        if value is None or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+            text = "–"
+        elif column.startswith("Comp. Mean "):
+            text = f"{value:.1%}"
+        elif isinstance(value, (float, np.floating)):
+            text = f"{value:.2f}"
+        else:
+            text = str(value)
+        rows.append((column, text))
+    return rows
+
+
+def _save(fig, fmt, dpi):
+    # Fixed margins instead of bbox_inches="tight", which draws every figure twice.
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi)
+    return buf.getvalue()
+
+
+def render_group_files(label, frame, summary, dpi=DEFAULT_DPI, sample_column=None):
+    """{file name: bytes} of one group's report: qfl.png, mia.png, samples.csv and summary.csv."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6, 5.4))
+    fig.subplots_adjust(left=0.02, right=0.98, bottom=0.02, top=0.92)
+    draw_ternary(fig.add_subplot(), frame, title=f"{label}: QFL (n={len(frame):,})")
+    files = {"qfl.png": _save(fig, "png", dpi)}
+    fig = Figure(figsize=(8, 4))
+    fig.subplots_adjust(left=0.09, right=0.98, bottom=0.25, top=0.9)
+    draw_mia(fig.add_subplot(), frame, sample_column)
+    files["mia.png"] = _save(fig, "png", dpi)
+    files["samples.csv"] = frame.to_csv(index=sample_column is None).encode("utf-8")
+    files["summary.csv"] = pd.DataFrame(summary_rows(summary), columns=["Statistic", "Value"]).to_csv(
+        index=False).encode("utf-8")
+    return files
+
+
+def group_page(label, frame, summary, sample_column=None):
+    """One A4-landscape Figure with a group's ternary plot, MIA chart and summary table."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(11.69, 8.27))
+    fig.suptitle(str(label), fontsize=15, fontweight="bold")
+    grid = fig.add_gridspec(2, 2, width_ratios=[1, 1.2], height_ratios=[1.4, 1], left=0.03, right=0.97,
+                            bottom=0.05, top=0.9, wspace=0.15, hspace=0.45)
+    draw_ternary(fig.add_subplot(grid[:, 0]), frame)
+    draw_mia(fig.add_subplot(grid[0, 1]), frame, sample_column)
+    ax = fig.add_subplot(grid[1, 1])
+    ax.axis("off")
+    rows = summary_rows(summary)
+    if rows:
+        table = ax.table(cellText=[[v] for _, v in rows], rowLabels=[n for n, _ in rows], colLabels=["Value"],
+                         loc="center", cellLoc="left", colWidths=[0.5])
+        table.auto_set_font_size(False)
+        table.set_fontsize(9)
+    return fig
+
+
+# --- EXPORT ---
+
+def _largest_first(grouping, max_groups=None):
+    counts = np.bincount(np.asarray(grouping.codes)[np.asarray(grouping.codes) >= 0], minlength=len(grouping.labels))
+    order = [g for g in np.argsort(-counts, kind="stable") if counts[g] > 0]
+    return order[:max_groups] if max_groups else order
+
+
+def export_reports(df, grouping, dest, fmt=ZIP, dpi=DEFAULT_DPI, workers=1, sample_column=None, max_groups=None,
+                   on_progress=None, executor=None):
+    """Writes the per-group reports of a processed frame to `dest` (path or binary file).
+
+    Groups are written largest first, empty ones skipped, at most
+    `max_groups`. ZIP archives hold a groups.csv with the whole grouping
+    table plus a folder per group; their groups render on `executor` when
+    given (e.g. a shared JobRunner pool), otherwise on a pool of `workers`
+    processes, with about `workers` groups in flight either way. `on_progress(fraction)` is called as
+    groups are written; raise from it to stop. Returns a summary dict:
+    groups, seconds and groups per second.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown report format: {fmt!r}")
+    order = _largest_first(grouping, max_groups)
+    started = time.perf_counter()
+    if fmt == PDF:
+        _write_pdf(df, grouping, dest, order, sample_column, on_progress)
+    else:
+        _write_zip(df, grouping, dest, order, dpi, workers, sample_column, on_progress, executor)
+    seconds = time.perf_counter() - started
+    return {"groups": len(order), "seconds": seconds, "groups_per_second": len(order) / seconds if seconds else float("inf")}
+
+
+def _write_pdf(df, grouping, dest, order, sample_column, on_progress):
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(dest) as pdf:
+        for done, (g, label, frame) in enumerate(iter_groups(df, grouping, order), 1):
+            pdf.savefig(group_page(label, frame, grouping.table.iloc[g], sample_column))
+            if on_progress:
+                on_progress(done / len(order))
+
+
+def _write_zip(df, grouping, dest, order, dpi, workers, sample_column, on_progress, executor=None):
+    names = safe_names(grouping.labels)
+    with zipfile.ZipFile(dest, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("groups.csv", grouping.table.reset_index().to_csv(index=False))
+
+        def write(g, files):
+            for name, data in files.items():
+                # PNGs are already compressed.
+                compression = zipfile.ZIP_STORED if name.endswith(".png") else zipfile.ZIP_DEFLATED
+                archive.writestr(f"{names[g]}/{name}", data, compress_type=compression)
+
+        groups = iter_groups(df, grouping, order)
+        done = 0
+        workers = max(1, workers)
+        if executor is None and (workers <= 1 or len(order) <= 1):
+            for g, label, frame in groups:
+                write(g, render_group_files(label, frame, grouping.table.iloc[g], dpi, sample_column))
+                done += 1
+                if on_progress:
+                    on_progress(done / len(order))
+            return
+
+        def render_on(pool):
+            nonlocal done
+            pending = {}
+
+            def submit_next():
+                for g, label, frame in groups:
+                    pending[pool.submit(render_group_files, label, frame, grouping.table.iloc[g], dpi,
+                                        sample_column)] = g
+                    return True
+                return False
+
+            try:
+                while len(pending) < workers * IN_FLIGHT_PER_WORKER and submit_next():
+                    pass
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(pending.pop(future), future.result())
+                        done += 1
+                        submit_next()
+                    if on_progress:
+                        on_progress(done / len(order))
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        if executor is not None:
+            render_on(executor)
+            return
+        import multiprocessing
+        import batch_analysis
+
+        context = multiprocessing.get_context(batch_analysis.START_METHOD)
+        with ProcessPoolExecutor(max_workers=min(workers, len(order)), mp_context=context) as pool:
+            render_on(pool)
@@ -0,0 +1,155 @@
+"""Content-addressed LRU cache for processed QFL datasets.
+
+Entries are keyed on a hash of the raw input (uploaded bytes or an edited
+table) plus the input type, and hold the processed frame together with
+lazily built artifacts (CSV bytes, figures, ...). Total size is capped and
+least-recently-used entries are evicted first. One instance is meant to be
+shared by every session in the process, so cached objects must be treated
+as read-only. Headless: no streamlit imports.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.environ.get("GEOLAB_CACHE_MB", "512")) * 1024 * 1024
+
+
+def dataset_key(data, input_type):
+    """Stable hex digest of `data` (bytes or DataFrame) and the input type."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(input_type).encode("utf-8"))
+    if isinstance(data, pd.DataFrame):
+        h.update(repr(list(data.columns)).encode("utf-8"))
+        h.update(repr([str(t) for t in data.dtypes]).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    else:
+        h.update(b"bytes:")
+        h.update(memoryview(data))
+    return h.hexdigest()
+
+
+def estimate_size(obj):
+    """Approximate in-memory size of a cached object in bytes."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj)
+    if isinstance(obj, str):
+        return len(obj.encode("utf-8"))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, tuple):
+        return sum(estimate_size(item) for item in obj)
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 64 * 1024
+
+
+class CacheEntry:
+    def __init__(self, frame, size=None):
+        self.frame = frame
+        self.artifacts = {}
+        self.size = estimate_size(frame) if size is None else size
+
+
+class ResultCache:
+    """Thread-safe LRU of CacheEntry objects bounded by total estimated bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Processed frame for `key`, or None if not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.frame
+
+    def put(self, key, frame, size=None):
+        """Stores a processed frame, replacing any previous entry for `key`.
+
+        `size` overrides estimate_size() for objects it cannot measure cheaply (e.g. figures).
+        """
+        entry = CacheEntry(frame, size)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.size
+            self._entries[key] = entry
+            self.current_bytes += entry.size
+            self._evict()
+        return frame
+
+    def get_or_compute(self, key, compute):
+        """Cached frame for `key`, computing and storing it with `compute()` on a miss."""
+        frame = self.get(key)
+        if frame is None:
+            frame = self.put(key, compute())
+        return frame
+
+    def artifact(self, key, name, build):
+        """Artifact `name` derived from entry `key`, built once with `build()`.
+
+        If the entry has been evicted the artifact is built but not stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and name in entry.artifacts:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.artifacts[name]
+            self.misses += 1
+        value = build()
+        size = estimate_size(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and name not in entry.artifacts:
+                entry.artifacts[name] = value
+                entry.size += size
+                self._entries.move_to_end(key)
+                self.current_bytes += size
+                self._evict()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict(self):
+        # Caller holds the lock. The newest entry is kept even if it alone exceeds the cap.
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry.size
@@ -0,0 +1,159 @@
+"""Compact, budgeted storage of processed QFL results for one user session.
+
+Processed frames are stored in a compact form: text columns as
+categoricals and every column that can be recomputed (Q/F/L sums,
+fractions, MIA, MIA category) dropped. Numeric columns keep their dtype,
+so expand() rebuilds the full process_frame() layout on demand with the
+same values. Each SessionStore has
+a byte budget; the least recently used results beyond it are spilled to
+a temporary pickle file or dropped.
+Headless: no streamlit imports.
+"""
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import provenance
+import qfl_engine
+
+DEFAULT_BUDGET_BYTES = int(os.environ.get("GEOLAB_SESSION_MB", "64")) * 1024 * 1024
+# Results over budget are pickled here when set; otherwise they are evicted.
+SPILL_DIR = os.environ.get("GEOLAB_SPILL_DIR") or None
+# Text columns with at most this fraction of unique values become categoricals.
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Everything expand() can recompute from the raw input columns.
+DERIVED_COLUMNS = qfl_engine.RESULT_COLUMNS
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compact(df, input_type):
+    """Compact copy of a processed frame; reverse with expand()."""
+    out = df.drop(columns=[c for c in DERIVED_COLUMNS if c in df.columns])
+    for col in out.columns:
+        series = out[col]
+        if col in qfl_engine.EXPECTED_COLUMNS[input_type] or col == "Provenance":
+            continue
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if series.dtype == object or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(series):
+                out[col] = series.astype("category")
+    out.attrs["input_type"] = input_type
+    return out
+
+
+def expand(compact_df):
+    """Recomputes the derived columns dropped by compact(), in float64."""
+    input_type = compact_df.attrs["input_type"]
+    expected = qfl_engine.EXPECTED_COLUMNS[input_type]
+    values = compact_df[expected].to_numpy(dtype=np.float64)
+    if input_type == qfl_engine.FULL_MINERAL:
+        results = qfl_engine.compute_from_components(values)
+    else:
+        results = qfl_engine.compute_qfl_mia(values[:, 0], values[:, 1], values[:, 2])
+
+    data = {col: compact_df[col] for col in compact_df.columns if col not in expected and col != "Provenance"}
+    data.update({col: values[:, i] for i, col in enumerate(expected)})
+    data.update(results)
+    data["MIA_category"] = pd.Categorical.from_codes(results["MIA_category"], categories=qfl_engine.MIA_CATEGORIES, ordered=True)
+    if "Provenance" in compact_df.columns:
+        data["Provenance"] = compact_df["Provenance"]
+    else:
+        data["Provenance"] = pd.Categorical.from_codes(provenance.classify(results["Q_norm"], results["F_norm"]),
+                                                       categories=provenance.FIELD_NAMES)
+    return pd.DataFrame(data, index=compact_df.index)
+
+
+class _StoredResult:
+    def __init__(self, frame):
+        self.frame = frame
+        self.nbytes = frame_nbytes(frame)
+        self.spill_path = None
+
+
+class SessionStore:
+    """Per-session LRU of compact results bounded by `budget_bytes`.
+
+    Over budget, the least recently used results are spilled to
+    `spill_dir` (when given) or evicted. The most recent result always
+    stays in memory.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, spill_dir=SPILL_DIR):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self._results = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+    @property
+    def memory_bytes(self):
+        return sum(r.nbytes for r in self._results.values() if r.frame is not None)
+
+    def put(self, key, df, input_type):
+        """Stores the compact form of processed frame `df` under `key`."""
+        self.discard(key)
+        self._results[key] = _StoredResult(compact(df, input_type))
+        self._enforce_budget()
+
+    def get(self, key):
+        """Full (expanded) processed frame for `key`, or None if unknown/evicted."""
+        result = self._results.get(key)
+        if result is None:
+            return None
+        self._results.move_to_end(key)
+        if result.frame is None:
+            result.frame = self._load_spilled(result)
+            self._enforce_budget()
+        return expand(result.frame)
+
+    def discard(self, key):
+        result = self._results.pop(key, None)
+        if result is not None and result.spill_path:
+            try:
+                os.remove(result.spill_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for key in list(self._results):
+            self.discard(key)
+
+    def _enforce_budget(self):
+        for key in list(self._results)[:-1]:
+            if self.memory_bytes <= self.budget_bytes:
+                break
+            result = self._results[key]
+            if result.frame is None:
+                continue
+            if self.spill_dir:
+                self._spill(result)
+            else:
+                del self._results[key]
+
+    def _spill(self, result):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="geolab-result-", suffix=".pkl", dir=self.spill_dir)
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(result.frame, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        result.spill_path = path
+        result.frame = None
+
+    def _load_spilled(self, result):
+        with open(result.spill_path, "rb") as fh:
+            frame = pickle.load(fh)
+        os.remove(result.spill_path)
+        result.spill_path = None
+        return frame
@@ -0,0 +1,117 @@
+"""Vectorized lower-hemisphere equal-area (Schmidt) stereonet maths.
+
+Conventions follow the Stereonet Plotter page: planes are strike/dip with
+the dip direction 90° clockwise of strike (right-hand rule), lines are
+trend/plunge, all in degrees. Projected positions are returned as polar
+(theta, r) with theta in radians clockwise from north and r in [0, 1],
+ready for a matplotlib polar axis set up with theta zero at N and
+clockwise direction. Headless: no streamlit/matplotlib imports.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+GREAT_CIRCLE_POINTS = 100
+# Measurements per density chunk: the working buffer is chunk x grid nodes float64 (~18 MB for the default grid).
+DENSITY_CHUNK = 256
+
+
+def equal_area_radius(plunge_rad):
+    """Schmidt-net radius for a line plunging `plunge_rad` radians."""
+    return np.sqrt(2) * np.sin(np.pi / 4 - np.asarray(plunge_rad) / 2)
+
+
+def project_lines(trend, plunge):
+    """Polar (theta, r) of lines given trend/plunge in degrees."""
+    trend = np.deg2rad(np.asarray(trend, dtype=np.float64))
+    plunge = np.deg2rad(np.asarray(plunge, dtype=np.float64))
+    return np.mod(trend, 2 * np.pi), equal_area_radius(plunge)
+
+
+def poles(strike, dip):
+    """Trend/plunge in degrees of the poles to planes given strike/dip."""
+    strike = np.asarray(strike, dtype=np.float64)
+    dip = np.asarray(dip, dtype=np.float64)
+    return np.mod(strike - 90, 360), 90 - dip
+
+
+def great_circles(strike, dip, n_points=GREAT_CIRCLE_POINTS):
+    """Polar (theta, r) arrays of shape (n_planes, n_points) tracing each plane.
+
+    Points are lines within the plane at rakes 0..180° from strike:
+    plunge = asin(sin(rake) sin(dip)), trend = strike + atan2(sin(rake) cos(dip), cos(rake)).
+    """
+    strike = np.deg2rad(np.asarray(strike, dtype=np.float64))[:, None]
+    dip = np.deg2rad(np.asarray(dip, dtype=np.float64))[:, None]
+    rake = np.linspace(0, np.pi, n_points)[None, :]
+    sin_rake = np.sin(rake)
+    plunge = np.arcsin(sin_rake * np.sin(dip))
+    trend = strike + np.arctan2(sin_rake * np.cos(dip), np.cos(rake))
+    return trend, equal_area_radius(plunge)
+
+
+def to_vectors(trend, plunge):
+    """(n, 3) unit vectors (north, east, down) for trend/plunge in degrees."""
+    trend = np.deg2rad(np.asarray(trend, dtype=np.float64))
+    plunge = np.deg2rad(np.asarray(plunge, dtype=np.float64))
+    cos_p = np.cos(plunge)
+    return np.column_stack([cos_p * np.cos(trend), cos_p * np.sin(trend), np.sin(plunge)])
+
+
+@lru_cache(maxsize=4)
+def density_grid(n_theta=181, n_r=50):
+    """Precomputed polar counting grid: (theta, r, unit vectors) with shapes (n_r, n_theta), (n_r, n_theta), (n_r*n_theta, 3)."""
+    theta, r = np.meshgrid(np.linspace(0, 2 * np.pi, n_theta), np.linspace(0, 1, n_r))
+    plunge = np.pi / 2 - 2 * np.arcsin(np.clip(r / np.sqrt(2), 0, 1))
+    vectors = to_vectors(np.rad2deg(theta).ravel(), np.rad2deg(plunge).ravel())
+    for arr in (theta, r, vectors):
+        arr.setflags(write=False)
+    return theta, r, vectors
+
+
+def pole_density(trend, plunge, method="kamb", sigma=3.0, grid=None, chunk=DENSITY_CHUNK, on_progress=None):
+    """Axial density of lines (e.g. poles) on the precomputed grid, in multiples of the expected standard deviation.
+
+    `method` is "kamb" (counting cone sized for `sigma`) or "exponential"
+    (Vollmer's exponential Kamb kernel). Measurements are processed in
+    chunks of `chunk` into one reused buffer of chunk * grid_size floats;
+    `on_progress(fraction)` is called after each chunk (raise from it to
+    abort). Returns an array shaped like the grid's theta/r.
+    """
+    theta, r, grid_vectors = grid if grid is not None else density_grid()
+    vectors = to_vectors(trend, plunge)
+    n = len(vectors)
+    counts = np.zeros(len(grid_vectors))
+    if n == 0:
+        return counts.reshape(theta.shape)
+    if method not in ("kamb", "exponential"):
+        raise ValueError(f"Unknown density method: {method!r}")
+
+    grid_t = np.ascontiguousarray(grid_vectors.T)
+    buffer = np.empty((min(chunk, n), len(grid_vectors)))
+    if method == "kamb":
+        inside = np.empty(buffer.shape, dtype=bool)
+        area = sigma ** 2 / (n + sigma ** 2)
+        cos_limit = 1 - area
+        units = np.sqrt(n * area * (1 - area))
+    else:
+        k = 2 * (1 + n / sigma ** 2)
+        units = np.sqrt(n * (k / 2 - 1) / k ** 2)
+    for start in range(0, n, chunk):
+        block = vectors[start:start + chunk]
+        cos_dist = buffer[:len(block)]
+        # Every step writes into the preallocated buffers: no chunk-sized temporaries.
+        np.matmul(block, grid_t, out=cos_dist)
+        np.abs(cos_dist, out=cos_dist)
+        if method == "kamb":
+            mask = inside[:len(block)]
+            np.greater_equal(cos_dist, cos_limit, out=mask)
+            counts += np.count_nonzero(mask, axis=0)
+        else:
+            cos_dist -= 1
+            cos_dist *= k
+            np.exp(cos_dist, out=cos_dist)
+            counts += cos_dist.sum(axis=0)
+        if on_progress:
+            on_progress(min(start + chunk, n) / n)
+    return (counts / units).reshape(theta.shape)
@@ -0,0 +1,182 @@
+"""Reading and writing result tables as CSV, Parquet or Arrow IPC.
+
+Parquet and Arrow keep column types (including categoricals) and are
+compressed, so they are much smaller and faster to round-trip than CSV.
+Both need pyarrow, which is imported lazily so CSV-only use does not pay
+for it. Headless: no streamlit imports.
+"""
+import io
+import os
+
+import pandas as pd
+
+CSV = "csv"
+PARQUET = "parquet"
+ARROW = "arrow"
+
+FORMATS = {
+    CSV: {"label": "CSV", "extension": ".csv", "mime": "text/csv"},
+    PARQUET: {"label": "Parquet", "extension": ".parquet", "mime": "application/vnd.apache.parquet"},
+    ARROW: {"label": "Arrow IPC (Feather)", "extension": ".arrow", "mime": "application/vnd.apache.arrow.file"},
+}
+EXTENSIONS = {
+    ".csv": CSV, ".txt": CSV,
+    ".parquet": PARQUET, ".pq": PARQUET,
+    ".arrow": ARROW, ".feather": ARROW, ".ipc": ARROW,
+}
+UPLOAD_TYPES = [ext.lstrip(".") for ext in EXTENSIONS]
+COMPRESSION = "zstd"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Arrow support needs pyarrow (pip install pyarrow).") from e
+
+
+def detect_format(filename, default=CSV):
+    """Table format implied by a file name's extension."""
+    return EXTENSIONS.get(os.path.splitext(str(filename))[1].lower(), default)
+
+
+def read_table(source, fmt=None, filename=None, columns=None):
+    """Reads a CSV/Parquet/Arrow table from a path or file-like object."""
+    fmt = fmt or detect_format(filename or getattr(source, "name", None) or source)
+    if fmt == CSV:
+        return pd.read_csv(source, usecols=columns)
+    _require_pyarrow()
+    if fmt == PARQUET:
+        return pd.read_parquet(source, columns=columns)
+    return _read_arrow(source, columns)
+
+
+def _read_arrow(source, columns=None):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    try:
+        return feather.read_table(source, columns=columns).to_pandas()
+    except pa.ArrowInvalid:
+        # Not an IPC file; try the streaming IPC format.
+        if hasattr(source, "seek"):
+            source.seek(0)
+        table = pa.ipc.open_stream(source).read_all()
+        return (table.select(columns) if columns else table).to_pandas()
+
+
+def _open_arrow_batches(source):
+    """(schema, record-batch iterator) of an Arrow IPC file, falling back to the IPC stream format like _read_arrow()."""
+    import pyarrow as pa
+
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        reader = pa.ipc.open_stream(pa.OSFile(source) if isinstance(source, (str, os.PathLike)) else source)
+        return reader.schema, iter(reader)
+
+
+def schema_names(source, fmt):
+    """Column names of a Parquet/Arrow table, read from its metadata only."""
+    _require_pyarrow()
+
+    if fmt == PARQUET:
+        import pyarrow.parquet as pq
+
+        names = pq.ParquetFile(source).schema_arrow.names
+    else:
+        names = _open_arrow_batches(source)[0].names
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return names
+
+
+def iter_table_chunks(source, fmt, chunksize, columns=None):
+    """Yields DataFrames of at most `chunksize` rows from a Parquet or Arrow table without loading it whole."""
+    _require_pyarrow()
+
+    if fmt == PARQUET:
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        batches = _open_arrow_batches(source)[1]
+    for batch in batches:
+        if columns and fmt != PARQUET:
+            batch = batch.select(columns)
+        for start in range(0, batch.num_rows, chunksize):
+            yield batch.slice(start, chunksize).to_pandas()
+
+
+def write_table(df, fmt=CSV, compression=COMPRESSION):
+    """Serializes `df` to bytes in the given format."""
+    if fmt == CSV:
+        return df.to_csv(index=False).encode("utf-8")
+    _require_pyarrow()
+    buf = io.BytesIO()
+    if fmt == PARQUET:
+        df.to_parquet(buf, index=False, compression=compression)
+    elif fmt == ARROW:
+        df.reset_index(drop=True).to_feather(buf, compression=compression)
+    else:
+        raise ValueError(f"Unknown table format: {fmt!r}")
+    return buf.getvalue()
+
+
+class ChunkWriter:
+    """Writes a table chunk by chunk to a path or binary stream (e.g. stdout).
+
+    CSV writes the header once; Parquet uses one row group per chunk; Arrow
+    writes the IPC file format to paths and the IPC stream format to
+    streams, which cannot be seeked. Later chunks are cast to the first
+    chunk's schema. Use as a context manager.
+    """
+
+    def __init__(self, dest, fmt=CSV, compression=COMPRESSION):
+        self.dest = dest
+        self.fmt = fmt
+        self.compression = compression
+        self._writer = None
+        self._schema = None
+        self._header = True
+
+    def write(self, df):
+        if self.fmt == CSV:
+            df.to_csv(self.dest, index=False, header=self._header, mode="w" if self._header else "a")
+            self._header = False
+            return
+        _require_pyarrow()
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._open(pa)
+        self._writer.write_table(table)
+
+    def _open(self, pa):
+        if self.fmt == PARQUET:
+            import pyarrow.parquet as pq
+
+            return pq.ParquetWriter(self.dest, self._schema, compression=self.compression)
+        if self.fmt != ARROW:
+            raise ValueError(f"Unknown table format: {self.fmt!r}")
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        if isinstance(self.dest, (str, os.PathLike)):
+            return pa.ipc.new_file(self.dest, self._schema, options=options)
+        return pa.ipc.new_stream(self.dest, self._schema, options=options)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,89 @@
+"""Server-side density binning of ternary compositions.
+
+Points are snapped to the nearest node of a triangular lattice with
+`divisions` steps per side, which gives hexagonal cells, and only the
+per-cell counts are sent to the plotting layer. Figure size and browser
+payload then depend on `divisions`, not on the number of samples.
+Headless: no streamlit imports; matplotlib is imported only by
+draw_density_cells(), the one Matplotlib renderer of the cells.
+"""
+import numpy as np
+
+# Above this many samples the QFL plots switch from markers to density cells.
+DENSITY_THRESHOLD = 20_000
+DEFAULT_DIVISIONS = 50
+
+
+def use_density(n_samples, threshold=DENSITY_THRESHOLD):
+    """True when `n_samples` is large enough that density rendering should be used."""
+    return threshold is not None and n_samples > threshold
+
+
+def lattice_round(a, b, c, divisions=DEFAULT_DIVISIONS):
+    """Snaps closed compositions to integer lattice coordinates (i, j, k), i + j + k == divisions.
+
+    Each coordinate is rounded, then the one with the largest rounding error
+    is recomputed from the other two (cube-coordinate rounding), so every
+    point falls in the hexagonal cell around its nearest lattice node.
+    Rows with a NaN component are dropped.
+    """
+    abc = np.column_stack([a, b, c]).astype(np.float64)
+    abc = abc[np.isfinite(abc).all(axis=1)]
+    scaled = abc * divisions
+    rounded = np.rint(scaled)
+    error = np.abs(rounded - scaled)
+    worst = np.argmax(error, axis=1)
+    rows = np.arange(len(rounded))
+    rounded[rows, worst] = 0
+    rounded[rows, worst] = divisions - rounded.sum(axis=1)
+    return np.clip(rounded, 0, divisions).astype(np.int64)
+
+
+def bin_counts(a, b, c, divisions=DEFAULT_DIVISIONS):
+    """Counts per occupied lattice cell.
+
+    Returns (i, j, k, counts) arrays with one entry per non-empty cell;
+    divide i/j/k by `divisions` for the cell-centre fractions.
+    """
+    ijk = lattice_round(a, b, c, divisions)
+    flat = ijk[:, 0] * (divisions + 1) + ijk[:, 1]
+    counts = np.bincount(flat, minlength=(divisions + 1) ** 2)
+    occupied = np.flatnonzero(counts)
+    i, j = np.divmod(occupied, divisions + 1)
+    return i, j, divisions - i - j, counts[occupied]
+
+
+# Offsets from a lattice node to the centroids of its six surrounding
+# triangles, in lattice units; together they outline the node's hexagon.
+_HEX_OFFSETS = np.array([
+    [2, -1, -1], [1, 1, -2], [-1, 2, -1],
+    [-2, 1, 1], [-1, -1, 2], [1, -2, 1],
+]) / 3.0
+
+
+def hexagon_vertices(i, j, k, divisions=DEFAULT_DIVISIONS):
+    """(n, 6, 3) ternary fractions outlining the cell of each lattice node.
+
+    Cells on the triangle edges extend past it; clip them to the triangle
+    when drawing.
+    """
+    nodes = np.column_stack([i, j, k]).astype(np.float64)
+    return (nodes[:, None, :] + _HEX_OFFSETS[None, :, :]) / divisions
+
+
+def draw_density_cells(ax, a, b, c, project, divisions=DEFAULT_DIVISIONS, label="Samples per cell"):
+    """Draws per-cell counts on a Matplotlib `ax` as one hexagon PolyCollection clipped to the triangle.
+
+    `project` maps (..., 3) ternary fractions (in a, b, c order) to (..., 2)
+    planar coordinates of the axes. Adds a colorbar; returns the collection.
+    """
+    from matplotlib.collections import PolyCollection
+    from matplotlib.patches import Polygon
+
+    i, j, k, counts = bin_counts(a, b, c, divisions)
+    cells = PolyCollection(project(hexagon_vertices(i, j, k, divisions)), array=counts, cmap="viridis",
+                           edgecolors="face", linewidths=0.2)
+    cells.set_clip_path(Polygon(project(np.eye(3)), closed=True, transform=ax.transData))
+    ax.add_collection(cells)
+    ax.figure.colorbar(cells, ax=ax, shrink=0.6, label=label)
+    return cells
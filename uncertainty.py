@@ -0,0 +1,184 @@
+"""Monte Carlo counting uncertainty for point-counted Q/F/L compositions.
+
+Each sample's counts are resampled `replicates` times, either from a
+multinomial with the observed proportions (the sampling distribution of
+the count) or from the Dirichlet posterior of the proportions (gamma
+draws with a Jeffreys prior). Percentile confidence intervals are
+reported for the Q/F/L fractions and MIA, together with the mean and
+covariance of the additive log-ratios alr = (ln Q/L, ln F/L), from which
+confidence_region() traces an ellipse on the ternary diagram.
+
+Samples are processed in chunks sized so the draws of one chunk stay
+under `chunk_bytes`; memory does not grow with the number of samples.
+Headless: no streamlit imports.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+MULTINOMIAL = "multinomial"
+DIRICHLET = "dirichlet"
+METHODS = (MULTINOMIAL, DIRICHLET)
+
+DEFAULT_REPLICATES = 2000
+DEFAULT_LEVEL = 0.95
+# Jeffreys prior for the Dirichlet posterior; also the pseudo-count that keeps
+# multinomial draws with a zero component finite in log-ratio space (only there:
+# fractions and MIA come from the raw counts).
+PRIOR = 0.5
+CHUNK_BYTES = 64 * 1024 * 1024
+# More outlines than this make the ternary plot unreadable (and heavy to ship).
+MAX_REGIONS = 500
+
+FRACTIONS = ("Q_norm", "F_norm", "L_norm")
+
+
+def counts_from_values(q, f, l, total_points=None):
+    """(n, 3) counts: the values themselves, or fractions scaled to `total_points` points per sample."""
+    counts = np.column_stack([np.asarray(v, dtype=np.float64) for v in (q, f, l)])
+    if total_points:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            counts = counts / counts.sum(axis=1, keepdims=True) * total_points
+    return np.nan_to_num(counts, nan=0.0)
+
+
+def draw_components(counts, replicates, method, rng):
+    """(n, replicates, 3) unnormalized Q/F/L draws for (n, 3) counts (divide by the row sum for fractions)."""
+    n = len(counts)
+    if method == MULTINOMIAL:
+        totals = np.rint(counts.sum(axis=1)).astype(np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p = np.nan_to_num(counts / counts.sum(axis=1, keepdims=True))
+            p_f = np.nan_to_num(np.where(p[:, 0] < 1, p[:, 1] / (1 - p[:, 0]), 0.0))
+        # Multinomial as two chained binomials: Q ~ Bin(N, pQ), F ~ Bin(N - Q, pF / (1 - pQ)).
+        q = rng.binomial(totals[:, None], p[:, 0:1], size=(n, replicates))
+        f = rng.binomial(totals[:, None] - q, np.clip(p_f, 0, 1)[:, None])
+        draws = np.empty((n, replicates, 3))
+        draws[..., 0] = q
+        draws[..., 1] = f
+        draws[..., 2] = totals[:, None] - q - f
+        return draws
+    if method == DIRICHLET:
+        return rng.standard_gamma(counts[:, None, :] + PRIOR, size=(n, replicates, 3))
+    raise ValueError(f"Unknown resampling method: {method!r}")
+
+
+def draw_fractions(counts, replicates, method, rng):
+    """(n, replicates, 3) resampled Q/F/L fractions for (n, 3) counts."""
+    draws = draw_components(counts, replicates, method, rng)
+    draws /= draws.sum(axis=-1, keepdims=True)
+    return draws
+
+
+def _chunk_rows(replicates, chunk_bytes):
+    # Components (x3), fractions, MIA, log-ratios and partition buffers: ~10 float64 per replicate.
+    return max(1, chunk_bytes // (replicates * 8 * 10))
+
+
+def _interval(values, ranks):
+    """Order statistics at `ranks` along axis 1 (a selection, cheaper than np.quantile's full interpolation)."""
+    part = np.partition(values, ranks, axis=1)
+    return part[:, ranks[0]], part[:, ranks[1]]
+
+
+def _nan_interval(values, level):
+    """Like _interval() for rows with NaN draws: the same order statistics among each row's finite values."""
+    ordered = np.sort(values, axis=1)  # NaN sorts last
+    valid = np.isfinite(values).sum(axis=1)
+    last = np.maximum(valid - 1, 0)
+    lo = np.floor((1 - level) / 2 * last).astype(np.intp)
+    hi = np.ceil((1 + level) / 2 * last).astype(np.intp)
+    bounds = np.take_along_axis(ordered, np.stack([lo, hi], axis=1), axis=1).astype(np.float64)
+    bounds[valid == 0] = np.nan
+    return bounds[:, 0], bounds[:, 1]
+
+
+def simulate(q, f, l, replicates=DEFAULT_REPLICATES, method=MULTINOMIAL, level=DEFAULT_LEVEL,
+             total_points=None, seed=0, chunk_bytes=CHUNK_BYTES):
+    """Confidence intervals of the Q/F/L fractions and MIA for every sample.
+
+    `q`, `f`, `l` are counts, or any values proportional to them when
+    `total_points` (points counted per sample) is given. Returns a
+    DataFrame with `<col>_lo`/`<col>_hi` bounds at `level` (the outer
+    order statistics, so slightly conservative), MIA_std, and the alr
+    mean/covariance columns used by confidence_region(). Multinomial
+    intervals come from the resampled counts as drawn, so they always
+    contain the point estimate; replicates with no Q or F grains are left
+    out of the MIA interval. Only the log-ratios add a PRIOR pseudo-count
+    to multinomial draws, to stay finite when a component is zero.
+    """
+    counts = counts_from_values(q, f, l, total_points)
+    n = len(counts)
+    rng = np.random.default_rng(seed)
+    ranks = [int(np.floor((1 - level) / 2 * (replicates - 1))), int(np.ceil((1 + level) / 2 * (replicates - 1)))]
+    names = [f"{c}_{b}" for c in FRACTIONS + ("MIA",) for b in ("lo", "hi")]
+    names += ["MIA_std", "alr_mean_q", "alr_mean_f", "alr_cov_qq", "alr_cov_qf", "alr_cov_ff"]
+    out = {name: np.empty(n) for name in names}
+
+    step = _chunk_rows(replicates, chunk_bytes)
+    for start in range(0, n, step):
+        rows = slice(start, min(start + step, n))
+        draws = draw_components(counts[rows], replicates, method, rng)
+        # Component-major float32 copies: contiguous rows make the selections below much cheaper.
+        q, f, l = np.moveaxis(draws, -1, 0).astype(np.float32)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            inv_total = 1 / (q + f + l)
+            for col, component in zip(FRACTIONS, (q, f, l)):
+                out[f"{col}_lo"][rows], out[f"{col}_hi"][rows] = _interval(component * inv_total, ranks)
+            mia = q / (q + f) * 100
+        out["MIA_lo"][rows], out["MIA_hi"][rows] = _interval(mia, ranks)
+        out["MIA_std"][rows] = mia.std(axis=1, dtype=np.float64)
+        undefined = np.isnan(mia).any(axis=1)
+        if undefined.any():
+            # Replicates that drew no Q or F grains have no MIA.
+            bad = np.flatnonzero(undefined)
+            lo, hi = _nan_interval(mia[bad], level)
+            out["MIA_lo"][start + bad], out["MIA_hi"][start + bad] = lo, hi
+            with np.errstate(invalid="ignore"), warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                out["MIA_std"][start + bad] = np.nanstd(mia[bad], axis=1, dtype=np.float64)
+
+        # Log-ratios do not depend on normalization, so they come straight from the draws.
+        if method == MULTINOMIAL:
+            q, f, l = q + PRIOR, f + PRIOR, l + PRIOR
+        tiny = np.finfo(np.float32).tiny
+        log_l = np.log(np.maximum(l, tiny))
+        alr_q = np.log(np.maximum(q, tiny)) - log_l
+        alr_f = np.log(np.maximum(f, tiny)) - log_l
+        mean_q, mean_f = alr_q.mean(axis=1, dtype=np.float64), alr_f.mean(axis=1, dtype=np.float64)
+        alr_q -= mean_q[:, None].astype(np.float32)
+        alr_f -= mean_f[:, None].astype(np.float32)
+        ddof = max(replicates - 1, 1)
+        out["alr_mean_q"][rows], out["alr_mean_f"][rows] = mean_q, mean_f
+        out["alr_cov_qq"][rows] = np.einsum("nr,nr->n", alr_q, alr_q, dtype=np.float64) / ddof
+        out["alr_cov_qf"][rows] = np.einsum("nr,nr->n", alr_q, alr_f, dtype=np.float64) / ddof
+        out["alr_cov_ff"][rows] = np.einsum("nr,nr->n", alr_f, alr_f, dtype=np.float64) / ddof
+
+    result = pd.DataFrame(out)
+    result.loc[counts.sum(axis=1) <= 0, :] = np.nan
+    return result
+
+
+def confidence_region(result, level=DEFAULT_LEVEL, n_points=72):
+    """Closed (q, f, l) ellipse outlines, shape (n, n_points + 1) each, from simulate() output.
+
+    The ellipse is the `level` region of a bivariate normal fitted to the
+    alr draws, mapped back to the simplex (so it bends with the triangle).
+    """
+    mean = result[["alr_mean_q", "alr_mean_f"]].to_numpy()
+    cov = np.empty((len(result), 2, 2))
+    cov[:, 0, 0] = result["alr_cov_qq"].to_numpy()
+    cov[:, 0, 1] = cov[:, 1, 0] = result["alr_cov_qf"].to_numpy()
+    cov[:, 1, 1] = result["alr_cov_ff"].to_numpy()
+    cov = np.nan_to_num(cov)
+    # Chi-square quantile with 2 degrees of freedom.
+    radius = np.sqrt(-2 * np.log(1 - level))
+    values, vectors = np.linalg.eigh(cov)
+    scale = vectors * np.sqrt(np.clip(values, 0, None))[:, None, :]
+    angle = np.linspace(0, 2 * np.pi, n_points + 1)
+    circle = np.stack([np.cos(angle), np.sin(angle)])
+    z = mean[:, :, None] + radius * scale @ circle
+    e = np.exp(np.clip(z, -700, 700))
+    denom = 1 + e[:, 0] + e[:, 1]
+    return e[:, 0] / denom, e[:, 1] / denom, 1 / denom